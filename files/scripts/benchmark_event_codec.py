@@ -0,0 +1,74 @@
+"""
+Compare the old way of getting the event dict (copy.deepcopy of the event attributes)
+with the event codec (Event.to_dict/from_dict) over the fixture events.
+
+Run from the root of the repository:
+
+    $ python3 files/scripts/benchmark_event_codec.py
+"""
+import copy
+import json
+import timeit
+from pathlib import Path
+
+import click
+
+from packit_service.service.events import NOT_SERIALIZED_EVENT_ATTRIBUTES
+from packit_service.worker.parser import Parser, CentosEventParser
+
+DATA_DIR = Path(__file__).parent.parent.parent / "tests" / "data"
+
+
+def deepcopy_dict(event) -> dict:
+    """ Event.get_dict before the codec was introduced """
+    d = copy.deepcopy(
+        {
+            k: v
+            for k, v in event.get_attributes().items()
+            if k not in NOT_SERIALIZED_EVENT_ATTRIBUTES
+        }
+    )
+    d["trigger"] = d["trigger"].value
+    d["created_at"] = int(d["created_at"].timestamp())
+    return d
+
+
+def load_events():
+    for path in sorted((DATA_DIR / "webhooks").glob("*/*.json")) + sorted(
+        (DATA_DIR / "fedmsg").glob("distgit_*.json")
+    ):
+        event = Parser.parse_event(json.loads(path.read_text()))
+        if event:
+            yield path.name, event
+    for path in sorted((DATA_DIR / "centosmsg").glob("*.json")):
+        event = CentosEventParser().parse_event(json.loads(path.read_text()))
+        if event:
+            yield path.name, event
+
+
+@click.command()
+@click.option("--number", default=10000, help="Number of runs for every event.")
+def benchmark(number: int):
+    total_deepcopy = total_codec = 0.0
+    for name, event in load_events():
+        event_dict = event.to_dict()
+        t_deepcopy = timeit.timeit(lambda: deepcopy_dict(event), number=number)
+        t_to_dict = timeit.timeit(event.to_dict, number=number)
+        t_from_dict = timeit.timeit(
+            lambda: type(event).from_dict(event_dict), number=number
+        )
+        total_deepcopy += t_deepcopy
+        total_codec += t_to_dict
+        click.echo(
+            f"{name:45} {type(event).__name__:32} "
+            f"deepcopy: {t_deepcopy:.3f}s  to_dict: {t_to_dict:.3f}s  "
+            f"from_dict: {t_from_dict:.3f}s"
+        )
+    click.echo(
+        f"total for {number} runs: deepcopy {total_deepcopy:.3f}s, "
+        f"to_dict {total_codec:.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    benchmark()
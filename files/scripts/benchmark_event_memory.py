@@ -0,0 +1,71 @@
+"""
+Measure memory and allocations of the parsed events.
+
+Parses the fixture messages (repeated up to the requested count),
+keeps the events alive and reports the memory allocated by them.
+Run it on two revisions to compare the event representations.
+
+Run from the root of the repository:
+
+    $ python3 files/scripts/benchmark_event_memory.py --count 100000
+"""
+import json
+import time
+import tracemalloc
+from itertools import cycle, islice
+from pathlib import Path
+
+import click
+
+from packit_service.worker.parser import Parser, CentosEventParser
+
+DATA_DIR = Path(__file__).parent.parent.parent / "tests" / "data"
+
+
+def load_messages():
+    messages = []
+    for path in sorted((DATA_DIR / "webhooks").glob("*/*.json")) + sorted(
+        (DATA_DIR / "fedmsg").glob("distgit_*.json")
+    ):
+        messages.append((None, json.loads(path.read_text())))
+    for path in sorted((DATA_DIR / "centosmsg").glob("*.json")):
+        messages.append(("centosmsg", json.loads(path.read_text())))
+    return messages
+
+
+@click.command()
+@click.option("--count", default=100000, help="Number of messages to parse.")
+def benchmark(count: int):
+    messages = load_messages()
+    centos_parser = CentosEventParser()
+    # parsing mutates the centos messages, so parse copies
+    raw = [(source, json.dumps(message)) for source, message in messages]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    events = []
+    for source, message in islice(cycle(raw), count):
+        if source == "centosmsg":
+            event = centos_parser.parse_event(json.loads(message))
+        else:
+            event = Parser.parse_event(json.loads(message))
+        if event:
+            events.append(event)
+    duration = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    allocations = sum(stat.count for stat in snapshot.statistics("filename"))
+    click.echo(f"messages parsed: {count}, events kept: {len(events)}")
+    click.echo(f"time: {duration:.2f}s")
+    click.echo(
+        f"memory: current {current / 2 ** 20:.1f} MiB, "
+        f"peak {peak / 2 ** 20:.1f} MiB"
+    )
+    click.echo(f"per event: {current / max(len(events), 1):.0f} B")
+    click.echo(f"live allocations: {allocations}")
+
+
+if __name__ == "__main__":
+    benchmark()
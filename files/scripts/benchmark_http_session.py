@@ -0,0 +1,107 @@
+"""
+Compare a new connection per request (what `requests.request` does)
+with the pooled session from `packit_service.http_client`
+against a local TLS stub server.
+
+Needs the `openssl` binary to create a self-signed certificate.
+
+Run from the root of the repository:
+
+    $ python3 files/scripts/benchmark_http_session.py --requests 200
+"""
+import ssl
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import click
+import requests
+import urllib3
+
+from packit_service.http_client import PooledSession
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep the connections alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_tls_stub(directory: Path) -> ThreadingHTTPServer:
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-subj",
+            "/CN=localhost",
+            "-days",
+            "1",
+            "-keyout",
+            str(key),
+            "-out",
+            str(cert),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    server = ThreadingHTTPServer(("localhost", 0), StubHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile=cert, keyfile=key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(get, url: str, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        get(url, verify=False).raise_for_status()
+    return time.perf_counter() - start
+
+
+@click.command()
+@click.option("--requests", "count", default=200, help="Number of requests.")
+def benchmark(count: int):
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    with TemporaryDirectory() as tmp:
+        server = start_tls_stub(Path(tmp))
+        url = f"https://localhost:{server.server_address[1]}/"
+        try:
+            t_new = measure(requests.get, url, count)
+            session = PooledSession()
+            t_pooled = measure(session.get, url, count)
+            session.close()
+        finally:
+            server.shutdown()
+
+    click.echo(
+        f"new connection per request: {t_new:.3f}s "
+        f"({t_new / count * 1000:.2f} ms/request)"
+    )
+    click.echo(
+        f"pooled session:             {t_pooled:.3f}s "
+        f"({t_pooled / count * 1000:.2f} ms/request)"
+    )
+    click.echo(f"speedup: {t_new / t_pooled:.1f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
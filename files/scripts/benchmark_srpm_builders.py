@@ -0,0 +1,81 @@
+"""
+Compare the throughput of the SRPM creation backends on a local clone
+of an upstream project with a packit config.
+
+* local: worker processes of `packit_service.worker.build.local_srpm`
+* sandcastle: a sandbox pod per SRPM (needs to be run in the cluster,
+  uses the `command_handler_*` options of the service config)
+
+Every build gets its own copy of the project, the SRPMs are removed afterwards.
+
+Run from the root of the repository:
+
+    $ python3 files/scripts/benchmark_srpm_builders.py --backend local \\
+        --builds 20 --concurrency 4 ~/git/ogr
+"""
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import click
+from packit.api import PackitAPI
+from packit.config import RunCommandType
+from packit.config.package_config import get_local_package_config
+from packit.local_project import LocalProject
+
+from packit_service.config import ServiceConfig
+from packit_service.worker.build.local_srpm import LocalSRPMBuilder
+
+
+@click.command()
+@click.option("--backend", type=click.Choice(["local", "sandcastle"]), required=True)
+@click.option("--builds", default=20, help="Number of SRPMs to create.")
+@click.option("--concurrency", default=4, help="Number of SRPMs created at once.")
+@click.argument("project", type=click.Path(exists=True, file_okay=False))
+def benchmark(backend: str, builds: int, concurrency: int, project: str):
+    package_config = get_local_package_config(project)
+    config = ServiceConfig.get_service_config()
+    builder = None
+    if backend == "local":
+        builder = LocalSRPMBuilder(
+            workers=concurrency, timeout=600, max_log_size=1024 * 1024
+        )
+    else:
+        config.command_handler = RunCommandType.sandcastle
+
+    def build(index: int) -> float:
+        start = time.perf_counter()
+        with TemporaryDirectory(prefix=f"srpm-{index}-") as tmp_dir:
+            working_dir = Path(tmp_dir) / "project"
+            shutil.copytree(project, working_dir, symlinks=True)
+            if builder:
+                builder.create_srpm(
+                    working_dir=str(working_dir),
+                    package_config=package_config,
+                    srpm_dir=str(working_dir),
+                )
+            else:
+                PackitAPI(
+                    config, package_config, LocalProject(working_dir=working_dir)
+                ).create_srpm(srpm_dir=str(working_dir))
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        durations = sorted(executor.map(build, range(builds)))
+    total = time.perf_counter() - start
+    if builder:
+        builder.close()
+
+    click.echo(f"{backend}: {builds} SRPMs in {total:.1f}s")
+    click.echo(f"throughput: {builds / total * 60:.1f} SRPMs/min")
+    click.echo(
+        f"per SRPM: p50 {durations[len(durations) // 2]:.1f}s, "
+        f"max {durations[-1]:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    benchmark()
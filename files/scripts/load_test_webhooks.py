@@ -0,0 +1,90 @@
+"""
+Send a burst of signed Github webhooks and report the latency and throughput.
+
+Run it against the Flask API and against the ASGI front end
+(packit_service/service/asgi.py) with the same webhook secret to compare them:
+
+    $ python3 files/scripts/load_test_webhooks.py \
+        --url https://localhost:8443/api/webhooks/github \
+        --secret <webhook_secret> --requests 2000 --concurrency 50
+"""
+import hmac
+import time
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha1
+from pathlib import Path
+from threading import local
+from typing import List
+
+import click
+import requests
+import urllib3
+
+DATA_DIR = Path(__file__).parent.parent.parent / "tests" / "data"
+DEFAULT_PAYLOAD = DATA_DIR / "webhooks" / "github" / "pr.json"
+
+thread_data = local()
+
+
+def get_session() -> requests.Session:
+    if not hasattr(thread_data, "session"):
+        thread_data.session = requests.Session()
+    return thread_data.session
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
+
+
+@click.command()
+@click.option("--url", required=True, help="URL of the Github webhook endpoint.")
+@click.option("--secret", default="", help="Webhook secret used for the signature.")
+@click.option(
+    "--payload",
+    type=click.Path(exists=True, dir_okay=False),
+    default=str(DEFAULT_PAYLOAD),
+    help="JSON file with the webhook payload.",
+)
+@click.option("--requests", "count", default=1000, help="Number of requests.")
+@click.option("--concurrency", default=20, help="Number of concurrent clients.")
+@click.option("--insecure", is_flag=True, help="Don't verify the TLS certificate.")
+def load_test(url, secret, payload, count, concurrency, insecure):
+    body = Path(payload).read_bytes()
+    headers = {
+        "Content-Type": "application/json",
+        "X-GitHub-Event": "pull_request",
+        "X-Hub-Signature": "sha1=" + hmac.new(secret.encode(), body, sha1).hexdigest(),
+    }
+    if insecure:
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    def send(_) -> (float, int):
+        start = time.perf_counter()
+        response = get_session().post(
+            url, data=body, headers=headers, verify=not insecure
+        )
+        return time.perf_counter() - start, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, range(count)))
+    duration = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    statuses = {}
+    for _, status in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    click.echo(f"requests: {count}, concurrency: {concurrency}")
+    click.echo(f"statuses: {statuses}")
+    click.echo(f"requests per second: {count / duration:.1f}")
+    click.echo(
+        f"latency p50: {percentile(latencies, 50) * 1000:.1f} ms, "
+        f"p99: {percentile(latencies, 99) * 1000:.1f} ms, "
+        f"max: {latencies[-1] * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    load_test()
@@ -0,0 +1,90 @@
+"""
+Inspect the webhook spool and replay the spooled webhooks.
+
+The path of the spool is taken from `webhook_spool_path` in the service config
+unless --path is given, e.g.:
+
+    $ python3 files/scripts/webhook_spool.py status
+    $ python3 files/scripts/webhook_spool.py replay --since "2020-05-12 10:00:00"
+"""
+from datetime import datetime
+
+import click
+
+from packit_service.config import ServiceConfig
+from packit_service.service.publisher import publish_batch
+from packit_service.service.spool import WebhookSpool
+
+
+def get_spool(path: str) -> WebhookSpool:
+    path = path or ServiceConfig.get_service_config().webhook_spool_path
+    if not path:
+        raise click.UsageError("No --path given and no webhook_spool_path in config.")
+    return WebhookSpool(path)
+
+
+@click.group()
+@click.option("--path", help="Path to the spool database.")
+@click.pass_context
+def cli(ctx, path):
+    ctx.obj = get_spool(path)
+
+
+@click.command("status")
+@click.pass_obj
+def status(spool: WebhookSpool):
+    """
+    Show how many events wait to be published.
+    """
+    count, oldest, newest = spool.get_summary()
+    click.echo(f"Events in the spool: {count}")
+    click.echo(f"Waiting to be published: {spool.count_unpublished()}")
+    if count:
+        click.echo(f"Oldest: {oldest}, newest: {newest}")
+
+
+@click.command("replay")
+@click.option("--since", type=click.DateTime(), help="Local time, inclusive.")
+@click.option("--until", type=click.DateTime(), help="Local time, exclusive.")
+@click.option("--batch-size", default=100, help="Events sent in one message.")
+@click.option("--dry-run", is_flag=True, help="Only list the events.")
+@click.pass_obj
+def replay(
+    spool: WebhookSpool, since: datetime, until: datetime, batch_size: int, dry_run
+):
+    """
+    Send the events received in the time range to the workers again.
+    """
+    batch = []
+    count = 0
+    for id_, received_at, event in spool.get_events(since=since, until=until):
+        click.echo(f"{id_} {received_at} {event.get('action', '')}")
+        count += 1
+        if dry_run:
+            continue
+        batch.append(event)
+        if len(batch) == batch_size:
+            publish_batch(batch)
+            batch = []
+    if batch:
+        publish_batch(batch)
+    click.echo(f"{'Would replay' if dry_run else 'Replayed'} {count} events.")
+
+
+@click.command("purge")
+@click.option("--older-than", type=click.DateTime(), help="Local time.")
+@click.pass_obj
+def purge(spool: WebhookSpool, older_than: datetime):
+    """
+    Remove the published events (by default older than the retention period).
+    """
+    removed = spool.purge(older_than.timestamp() if older_than else None)
+    click.echo(f"Removed {removed} events.")
+
+
+cli.add_command(status)
+cli.add_command(replay)
+cli.add_command(purge)
+
+if __name__ == "__main__":
+    cli()
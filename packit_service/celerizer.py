@@ -20,15 +20,39 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from functools import lru_cache
 from os import getenv
 
 from celery import Celery
 from lazy_object_proxy import Proxy
+from redis import Redis
 
 from packit_service.models import get_pg_url
 from packit_service.sentry_integration import configure_sentry
 
 
+def get_redis_url() -> str:
+    """ create redis connection string """
+    redis_host = getenv("REDIS_SERVICE_HOST", "localhost")
+    redis_port = getenv("REDIS_SERVICE_PORT", "6379")
+    redis_db = getenv("REDIS_SERVICE_DB", "0")
+    return "redis://{host}:{port}/{db}".format(
+        host=redis_host, port=redis_port, db=redis_db
+    )
+
+
+@lru_cache(maxsize=None)
+def get_redis() -> Redis:
+    """
+    Redis client shared by the registries and caches of the service.
+
+    They are all only optimizations, so they catch the redis errors
+    and fall back to the slower path instead of failing.
+    The client connects lazily and reconnects after a fork.
+    """
+    return Redis.from_url(get_redis_url())
+
+
 class Celerizer:
     def __init__(self):
         self._celery_app = None
@@ -36,12 +60,7 @@ class Celerizer:
     @property
     def celery_app(self):
         if self._celery_app is None:
-            redis_host = getenv("REDIS_SERVICE_HOST", "localhost")
-            redis_port = getenv("REDIS_SERVICE_PORT", "6379")
-            redis_db = getenv("REDIS_SERVICE_DB", "0")
-            redis_url = "redis://{host}:{port}/{db}".format(
-                host=redis_host, port=redis_port, db=redis_db
-            )
+            redis_url = get_redis_url()
             # https://docs.celeryproject.org/en/stable/userguide/configuration.html#database-url-examples
             postgres_url = f"db+{get_pg_url()}"
 
@@ -65,6 +65,24 @@ class ServiceConfig(Config):
         bugzilla_url: str = "",
         bugzilla_api_key: str = "",
         pr_accepted_labels: List[str] = None,
+        handler_concurrency: int = 1,
+        fan_out_handlers: bool = False,
+        webhook_buffer_size: int = 1000,
+        webhook_batch_size: int = 1,
+        webhook_batch_delay: float = 0.05,
+        webhook_spool_path: Optional[str] = None,
+        srpm_log_max_size: int = 1024 * 1024,
+        srpm_cache_dir: Optional[str] = None,
+        srpm_cache_max_size: int = 10 * 1024 ** 3,
+        git_mirror_cache_dir: Optional[str] = None,
+        git_mirror_cache_max_size: int = 50 * 1024 ** 3,
+        sandbox_pool_size: int = 0,
+        sandbox_pool_max_size: int = 10,
+        local_srpm_namespaces: List[str] = None,
+        local_srpm_workers: int = 2,
+        local_srpm_timeout: int = 600,
+        srpm_cache_url: Optional[str] = None,
+        copr_build_end_window: float = 0,
         **kwargs,
     ):
         super().__init__(**kwargs)
@@ -89,6 +107,64 @@ class ServiceConfig(Config):
         # for flask SERVER_NAME so we can create links to logs
         self.server_name: str = ""
 
+        # How many handlers can run in parallel when processing one event.
+        # Each of them gets its own directory in the `command_handler_work_dir`.
+        self.handler_concurrency: int = handler_concurrency
+
+        # Run each handler as a separate celery task
+        # (`process_message` only parses the event and schedules the handlers).
+        self.fan_out_handlers: bool = fan_out_handlers
+
+        # How many accepted webhooks can the ASGI front end keep
+        # before they are published to the broker.
+        self.webhook_buffer_size: int = webhook_buffer_size
+
+        # The web tier publishes the webhooks in batches of up to this size,
+        # the batch is sent at latest `webhook_batch_delay` seconds
+        # after its first event came. 1 = publish every webhook right away.
+        self.webhook_batch_size: int = webhook_batch_size
+        self.webhook_batch_delay: float = webhook_batch_delay
+        # SQLite database where the webhooks are stored before they are published,
+        # see packit_service/service/spool.py.
+        self.webhook_spool_path: Optional[str] = webhook_spool_path
+
+        # How many characters of the SRPM build logs we keep,
+        # the middle of longer logs is truncated.
+        self.srpm_log_max_size: int = srpm_log_max_size
+
+        # Directory (persistent volume) to cache the built SRPMs in
+        # and max size of the cache in bytes, no caching if not set.
+        self.srpm_cache_dir: Optional[str] = srpm_cache_dir
+        self.srpm_cache_max_size: int = srpm_cache_max_size
+
+        # Directory (persistent volume) with bare mirrors of the upstream repos
+        # the build helpers clone from and its disk quota in bytes.
+        self.git_mirror_cache_dir: Optional[str] = git_mirror_cache_dir
+        self.git_mirror_cache_max_size: int = git_mirror_cache_max_size
+
+        # Number of the sandbox pods kept running for the SRPM creation (0 disables
+        # the pool) and the maximum they can scale to when the tasks are waiting.
+        # Both are per celery worker process: with the concurrency N,
+        # there are N times as many pods.
+        self.sandbox_pool_size: int = sandbox_pool_size
+        self.sandbox_pool_max_size: int = sandbox_pool_max_size
+
+        # Trusted namespaces (or namespace/repo) whose SRPMs are created
+        # by local worker processes instead of the sandbox,
+        # number of the worker processes and the timeout of the build in seconds.
+        self.local_srpm_namespaces: Set[str] = set(local_srpm_namespaces or [])
+        self.local_srpm_workers: int = local_srpm_workers
+        self.local_srpm_timeout: int = local_srpm_timeout
+
+        # URL the `srpm_cache_dir` is published on (e.g. by a web server sharing
+        # the volume), Copr downloads the cached SRPMs instead of our upload.
+        self.srpm_cache_url: Optional[str] = srpm_cache_url
+
+        # Copr sends a message for every chroot, the chroots of one build finished
+        # within this many seconds are processed together (0 = one by one),
+        # only the build status of the chroot is reported right away.
+        self.copr_build_end_window: float = copr_build_end_window
+
     def __repr__(self):
         def hide(token: str) -> str:
             return f"{token[:1]}***{token[-1:]}" if token else ""
@@ -104,7 +180,25 @@ class ServiceConfig(Config):
             f"fas_password='{hide(self.fas_password)}', "
             f"bugzilla_url='{self.bugzilla_url}', "
             f"bugzilla_api_key='{hide(self.bugzilla_api_key)}', "
-            f"server_name='{self.server_name}')"
+            f"server_name='{self.server_name}', "
+            f"handler_concurrency='{self.handler_concurrency}', "
+            f"fan_out_handlers='{self.fan_out_handlers}', "
+            f"webhook_buffer_size='{self.webhook_buffer_size}', "
+            f"webhook_batch_size='{self.webhook_batch_size}', "
+            f"webhook_batch_delay='{self.webhook_batch_delay}', "
+            f"webhook_spool_path='{self.webhook_spool_path}', "
+            f"srpm_log_max_size='{self.srpm_log_max_size}', "
+            f"srpm_cache_dir='{self.srpm_cache_dir}', "
+            f"srpm_cache_max_size='{self.srpm_cache_max_size}', "
+            f"git_mirror_cache_dir='{self.git_mirror_cache_dir}', "
+            f"git_mirror_cache_max_size='{self.git_mirror_cache_max_size}', "
+            f"sandbox_pool_size='{self.sandbox_pool_size}', "
+            f"sandbox_pool_max_size='{self.sandbox_pool_max_size}', "
+            f"local_srpm_namespaces='{self.local_srpm_namespaces}', "
+            f"local_srpm_workers='{self.local_srpm_workers}', "
+            f"local_srpm_timeout='{self.local_srpm_timeout}', "
+            f"srpm_cache_url='{self.srpm_cache_url}', "
+            f"copr_build_end_window='{self.copr_build_end_window}')"
         )
 
     @classmethod
@@ -0,0 +1,83 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Copr builds we have already decided about the "Congratulations!" PR comment for.
+
+Copr sends a message for every chroot of the build. Only the first successful
+chroot of the build looks at the PR comments and possibly posts the comment,
+the others see the build here and skip it.
+"""
+
+import logging
+from typing import Optional, Union
+
+from redis import Redis
+
+from packit_service.celerizer import get_redis
+
+logger = logging.getLogger(__name__)
+
+CONGRATULATED_BUILD_KEY = "packit-service:copr-build-congratulated:{build_id}"
+# longer than any copr build can take
+CONGRATULATED_BUILD_TTL = 7 * 24 * 60 * 60
+
+
+class CongratulatedBuilds:
+    """
+    Set of the Copr build IDs shared in redis.
+
+    When redis is not reachable, every chroot checks the PR comments.
+    """
+
+    def __init__(self, redis: Optional[Redis] = None):
+        self.redis = redis or get_redis()
+
+    @staticmethod
+    def get_key(build_id: Union[int, str]) -> str:
+        return CONGRATULATED_BUILD_KEY.format(build_id=build_id)
+
+    def claim(self, build_id: Union[int, str]) -> bool:
+        """
+        Atomically mark the build.
+
+        :return: True if we are the first one to handle the build
+        """
+        try:
+            return bool(
+                self.redis.set(
+                    self.get_key(build_id), 1, nx=True, ex=CONGRATULATED_BUILD_TTL
+                )
+            )
+        except Exception as ex:
+            logger.warning(f"Can't check the congratulated copr builds: {ex}")
+            return True
+
+    def release(self, build_id: Union[int, str]) -> None:
+        """ Let the next chroot try it again (e.g. when commenting failed). """
+        try:
+            self.redis.delete(self.get_key(build_id))
+        except Exception as ex:
+            logger.warning(f"Failed to release copr build {build_id}: {ex}")
+
+
+congratulated_builds = CongratulatedBuilds()
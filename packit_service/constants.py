@@ -33,3 +33,5 @@ WHITELIST_CONSTANTS = {
     "waiting": "waiting",
     "approved_manually": "approved_manually",
 }
+
+KOJI_HUB_URL = "https://koji.fedoraproject.org/kojihub"
@@ -0,0 +1,98 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Buffer of the finished chroots of the Copr builds.
+
+Copr sends a `build.end` message for every chroot. With `copr_build_end_window`
+set, `CoprBuildEndHandler` only reports the build status of the chroot
+and adds it here; the first chroot of the build schedules a task
+which processes all the chroots collected in the meantime at once.
+"""
+
+import json
+import logging
+from typing import List, Optional, Tuple, Union
+
+from redis import Redis
+
+from packit_service.celerizer import get_redis
+
+logger = logging.getLogger(__name__)
+
+# hash: chroot -> serialized CoprBuildEvent
+COPR_BUILD_COMPLETIONS_KEY = "packit-service:copr-build-end:{build_id}"
+# set while the task processing the build is scheduled
+COPR_BUILD_SCHEDULED_KEY = "packit-service:copr-build-end:{build_id}:scheduled"
+# the task should be done way sooner, this is just for the lost ones
+COPR_BUILD_COMPLETIONS_TTL = 60 * 60
+
+
+class CoprBuildCompletions:
+    """
+    When redis is not reachable, `add` returns None
+    and the chroot is processed right away.
+    """
+
+    def __init__(self, redis: Optional[Redis] = None):
+        self.redis = redis or get_redis()
+
+    @staticmethod
+    def get_keys(build_id: Union[int, str]) -> Tuple[str, str]:
+        return (
+            COPR_BUILD_COMPLETIONS_KEY.format(build_id=build_id),
+            COPR_BUILD_SCHEDULED_KEY.format(build_id=build_id),
+        )
+
+    def add(
+        self, build_id: Union[int, str], chroot: str, event: dict
+    ) -> Optional[bool]:
+        """
+        :return: True if the caller needs to schedule the processing of the build,
+                 False if it's already scheduled, None if the chroot was not added
+        """
+        completions_key, scheduled_key = self.get_keys(build_id)
+        try:
+            self.redis.hset(completions_key, chroot, json.dumps(event))
+            self.redis.expire(completions_key, COPR_BUILD_COMPLETIONS_TTL)
+            return bool(
+                self.redis.set(scheduled_key, 1, nx=True, ex=COPR_BUILD_COMPLETIONS_TTL)
+            )
+        except Exception as ex:
+            logger.warning(f"Failed to queue copr build {build_id} ({chroot}): {ex}")
+            return None
+
+    def pop(self, build_id: Union[int, str]) -> List[dict]:
+        """
+        Take all the queued chroots of the build.
+
+        The chroots finished after this call schedule a new task.
+        """
+        completions_key, scheduled_key = self.get_keys(build_id)
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.hgetall(completions_key)
+        pipeline.delete(completions_key, scheduled_key)
+        completions, _ = pipeline.execute()
+        return [json.loads(event) for _, event in sorted(completions.items())]
+
+
+copr_build_completions = CoprBuildCompletions()
@@ -0,0 +1,88 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Cache of the Copr projects we know to exist with the chroots they have.
+
+The same Copr project (e.g. the one of a pull request) is used for every build,
+so we don't need to ask Copr whether the project exists before each of them.
+"""
+
+import logging
+from typing import Iterable, Optional
+
+from redis import Redis
+
+from packit_service.celerizer import get_redis
+
+logger = logging.getLogger(__name__)
+
+KNOWN_COPR_PROJECT_KEY = "packit-service:copr-project:{owner}/{project}"
+# the project can be changed or removed by the user in the meantime
+KNOWN_COPR_PROJECT_TTL = 60 * 60
+
+
+class KnownCoprProjects:
+    """
+    Copr projects we have created or checked recently, shared in redis.
+
+    When redis is not reachable, the project is checked in Copr.
+    """
+
+    def __init__(self, redis: Optional[Redis] = None):
+        self.redis = redis or get_redis()
+
+    @staticmethod
+    def get_key(owner: str, project: str) -> str:
+        return KNOWN_COPR_PROJECT_KEY.format(owner=owner, project=project)
+
+    @staticmethod
+    def serialize_chroots(chroots: Iterable[str]) -> str:
+        return ",".join(sorted(set(chroots)))
+
+    def is_known(self, owner: str, project: str, chroots: Iterable[str]) -> bool:
+        """ True if the project exists with exactly these chroots. """
+        try:
+            cached = self.redis.get(self.get_key(owner, project))
+        except Exception as ex:
+            logger.warning(f"Can't check the known copr projects: {ex}")
+            return False
+        # redis returns bytes (or None when the project is not known)
+        return cached == self.serialize_chroots(chroots).encode()
+
+    def add(self, owner: str, project: str, chroots: Iterable[str]) -> None:
+        try:
+            self.redis.set(
+                self.get_key(owner, project),
+                self.serialize_chroots(chroots),
+                ex=KNOWN_COPR_PROJECT_TTL,
+            )
+        except Exception as ex:
+            logger.warning(f"Failed to cache copr project {owner}/{project}: {ex}")
+
+    def invalidate(self, owner: str, project: str) -> None:
+        try:
+            self.redis.delete(self.get_key(owner, project))
+        except Exception as ex:
+            logger.warning(f"Failed to invalidate copr project {owner}/{project}: {ex}")
+
+
+known_copr_projects = KnownCoprProjects()
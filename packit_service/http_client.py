@@ -0,0 +1,116 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Process-wide registry of HTTP sessions for the outbound integrations.
+
+A session keeps a pool of connections per host, so the TCP and TLS handshakes
+are done once per worker process and not for every request.
+"""
+
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) timeouts in seconds, used when the caller does not set any
+DEFAULT_TIMEOUT: Tuple[float, float] = (10, 60)
+# number of hosts with a connection pool and connections kept in each pool,
+# handlers can run in threads (ServiceConfig.handler_concurrency)
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 10
+RETRY_TOTAL = 5
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_FORCELIST = (429, 500, 502, 503, 504)
+
+_sessions: Dict[str, "PooledSession"] = {}
+_sessions_lock = threading.Lock()
+
+
+class PooledSession(requests.Session):
+    """
+    requests.Session with a default timeout
+    and a retrying adapter with a pool of kept-alive connections.
+    """
+
+    def __init__(
+        self,
+        timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+        retries: Optional[Retry] = None,
+    ):
+        super().__init__()
+        self.timeout = timeout
+        adapter = HTTPAdapter(
+            pool_connections=POOL_CONNECTIONS,
+            pool_maxsize=POOL_MAXSIZE,
+            max_retries=retries or get_default_retries(),
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def get_default_retries() -> Retry:
+    """
+    Retry on connection problems and on the responses
+    saying that the server is temporarily unavailable.
+
+    Only the connection errors are retried for the non-idempotent methods (POST),
+    we don't want to e.g. trigger the tests twice.
+    """
+    return Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_FORCELIST,
+        raise_on_status=False,
+    )
+
+
+def get_http_session(name: str) -> PooledSession:
+    """
+    Get the session shared within this process for the given integration,
+    e.g. "testing-farm".
+    """
+    session = _sessions.get(name)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(name)
+            if session is None:
+                logger.debug(f"Creating HTTP session for {name!r}.")
+                session = _sessions[name] = PooledSession()
+    return session
+
+
+def close_http_sessions() -> None:
+    """ Close all the pooled connections, e.g. when the worker shuts down. """
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,166 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Registry of Copr builds submitted by this deployment which did not finish yet.
+
+Most of the Copr messages on the fedmsg bus are about builds of other Copr users.
+The registry lets us reject such messages with a single sorted set lookup in redis,
+before we query the database or the forge.
+"""
+
+import logging
+from datetime import datetime, timezone
+from time import monotonic
+from typing import Iterable, Optional, Union
+
+from redis import Redis
+
+from packit_service.celerizer import get_redis
+from packit_service.models import CoprBuildModel
+
+logger = logging.getLogger(__name__)
+
+# sorted set: `build_id:chroot` -> timestamp of the submission
+IN_FLIGHT_BUILDS_KEY = "packit-service:copr-builds-in-flight-since"
+# set when the registry was synced with the pending builds from the database,
+# expires so that the registry is synced again
+IN_FLIGHT_BUILDS_SYNCED_KEY = "packit-service:copr-builds-in-flight-since:synced"
+# how often the registry is synced with the database
+IN_FLIGHT_BUILDS_SYNC_INTERVAL = 60 * 60
+# builds submitted longer ago are considered lost (e.g. we missed the end message)
+IN_FLIGHT_BUILDS_TTL = 7 * 24 * 60 * 60
+
+
+def get_timestamp(time: Optional[datetime] = None) -> float:
+    """
+    Timestamp of the UTC time (as stored in the database) or of now.
+    """
+    if time is None:
+        return datetime.now(timezone.utc).timestamp()
+    return time.replace(tzinfo=timezone.utc).timestamp()
+
+
+class InFlightCoprBuilds:
+    """
+    `build_id:chroot` pairs we are waiting for, scored by the submission time.
+
+    Builds are added when `CoprBuildJobHelper` submits them
+    and removed when `CoprBuildEndHandler` processes their final state.
+    Builds which did not finish in `IN_FLIGHT_BUILDS_TTL`
+    (e.g. their end message was lost) are pruned when the registry is synced.
+
+    When redis is not reachable, `might_contain` answers True
+    and the event goes through the usual database check.
+    """
+
+    def __init__(self, redis: Optional[Redis] = None):
+        self.redis = redis or get_redis()
+        # when this process asks redis whether the registry needs to be synced
+        self.next_sync_check = 0.0
+
+    @staticmethod
+    def get_member(build_id: Union[int, str], chroot: str) -> str:
+        return f"{build_id}:{chroot}"
+
+    def add(self, build_id: Union[int, str], chroots: Iterable[str]) -> None:
+        submitted = get_timestamp()
+        members = {self.get_member(build_id, chroot): submitted for chroot in chroots}
+        if not members:
+            return
+        try:
+            self.redis.zadd(IN_FLIGHT_BUILDS_KEY, members)
+        except Exception as ex:
+            logger.warning(f"Failed to register copr build {build_id}: {ex}")
+
+    def remove(self, build_id: Union[int, str], chroot: str) -> None:
+        try:
+            self.redis.zrem(IN_FLIGHT_BUILDS_KEY, self.get_member(build_id, chroot))
+        except Exception as ex:
+            logger.warning(f"Failed to unregister copr build {build_id}: {ex}")
+
+    def might_contain(self, build_id: Union[int, str], chroot: str) -> bool:
+        """
+        False only if we are sure the build was not submitted by us
+        or it was already processed.
+
+        Apart from the sync check once per `IN_FLIGHT_BUILDS_SYNC_INTERVAL`,
+        this is a single sorted set lookup.
+        """
+        try:
+            self.sync()
+            return (
+                self.redis.zscore(
+                    IN_FLIGHT_BUILDS_KEY, self.get_member(build_id, chroot)
+                )
+                is not None
+            )
+        except Exception as ex:
+            logger.warning(f"Can't check the in-flight copr builds: {ex}")
+            return True
+
+    def prune(self) -> None:
+        """
+        Remove the builds submitted longer than `IN_FLIGHT_BUILDS_TTL` ago.
+        """
+        self.redis.zremrangebyscore(
+            IN_FLIGHT_BUILDS_KEY, "-inf", get_timestamp() - IN_FLIGHT_BUILDS_TTL
+        )
+
+    def sync(self) -> None:
+        """
+        Add the pending builds from the database to the registry
+        and prune the lost ones, at most once per `IN_FLIGHT_BUILDS_SYNC_INTERVAL`.
+
+        This covers builds submitted before the registry existed,
+        the case when the redis data were lost
+        and builds whose registration failed.
+        """
+        if monotonic() < self.next_sync_check:
+            return
+        if not self.redis.set(
+            IN_FLIGHT_BUILDS_SYNCED_KEY, 1, ex=IN_FLIGHT_BUILDS_SYNC_INTERVAL, nx=True
+        ):
+            # synced by another process
+            self.next_sync_check = monotonic() + IN_FLIGHT_BUILDS_SYNC_INTERVAL
+            return
+        try:
+            members = {
+                self.get_member(build.build_id, build.target): get_timestamp(
+                    build.build_submitted_time
+                )
+                for build in CoprBuildModel.get_all_by_status("pending")
+            }
+            logger.info(
+                f"Syncing the in-flight copr builds with {len(members)} builds."
+            )
+            if members:
+                self.redis.zadd(IN_FLIGHT_BUILDS_KEY, members)
+            self.prune()
+        except Exception:
+            # let the next check try again
+            self.redis.delete(IN_FLIGHT_BUILDS_SYNCED_KEY)
+            raise
+        self.next_sync_check = monotonic() + IN_FLIGHT_BUILDS_SYNC_INTERVAL
+
+
+in_flight_copr_builds = InFlightCoprBuilds()
@@ -28,7 +28,7 @@ import logging
 import os
 from contextlib import contextmanager
 from datetime import datetime
-from typing import TYPE_CHECKING, Optional, Union, Iterable, Dict, Type, Any
+from typing import TYPE_CHECKING, Optional, Union, Iterable, Dict, Type, Any, Tuple
 
 from sqlalchemy import (
     Column,
@@ -42,17 +42,24 @@ from sqlalchemy import (
     JSON,
     create_engine,
     Boolean,
+    case,
+    insert,
 )
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.orm import sessionmaker, Session, relationship, scoped_session
 from sqlalchemy.types import PickleType, ARRAY
 
 from packit.config import JobConfigTriggerType
-from packit_service.constants import WHITELIST_CONSTANTS
+from packit_service.constants import (
+    WHITELIST_CONSTANTS,
+    PG_COPR_BUILD_STATUS_FAILURE,
+    PG_COPR_BUILD_STATUS_SUCCESS,
+)
 
 logger = logging.getLogger(__name__)
-# SQLAlchemy session, get it with `get_sa_session`
-session_instance = None
+# SQLAlchemy session registry (one session per thread),
+# get the session with `get_sa_session`
+session_registry: Optional[scoped_session] = None
 
 
 def get_pg_url() -> str:
@@ -71,11 +78,14 @@ def get_sa_session() -> Session:
     # are bound to this session and we can use them, otherwise we'd need
     # add objects into all newly created sessions:
     #   Instance <PullRequest> is not bound to a Session; attribute refresh operation cannot proceed
-    global session_instance
-    if session_instance is None:
+    #
+    # The session is thread-local since the handlers can run in threads
+    # (see `handler_concurrency` in the service config).
+    global session_registry
+    if session_registry is None:
         engine = create_engine(get_pg_url())
-        Session = sessionmaker(bind=engine)
-        session_instance = Session()
+        session_registry = scoped_session(sessionmaker(bind=engine))
+    session_instance = session_registry()
     try:
         yield session_instance
         session_instance.commit()
@@ -85,6 +95,12 @@ def get_sa_session() -> Session:
         raise
 
 
+def remove_sa_session():
+    """ close and forget the SQLAlchemy session of the current thread """
+    if session_registry is not None:
+        session_registry.remove()
+
+
 def optional_time(datetime_object) -> Union[str, None]:
     """Returns a string if argument is a datetime object."""
     if datetime_object is None:
@@ -433,6 +449,11 @@ class CoprBuildModel(Base):
         with get_sa_session() as session:
             return session.query(CoprBuildModel).order_by(desc(CoprBuildModel.id)).all()
 
+    @classmethod
+    def get_all_by_status(cls, status: str) -> Optional[Iterable["CoprBuildModel"]]:
+        with get_sa_session() as session:
+            return session.query(CoprBuildModel).filter_by(status=status)
+
     # Returns all builds with that build_id, irrespective of target
     @classmethod
     def get_all_by_build_id(
@@ -444,6 +465,52 @@ class CoprBuildModel(Base):
         with get_sa_session() as session:
             return session.query(CoprBuildModel).filter_by(build_id=build_id)
 
+    @classmethod
+    def set_chroots_finished(
+        cls,
+        build_id: Union[str, int],
+        statuses: Dict[str, Tuple[str, Optional[datetime]]],
+    ) -> Dict[str, int]:
+        """
+        Set the final status and the end time of the chroots of the build
+        which are not finished yet, all of them in one UPDATE.
+
+        :param statuses: chroot -> (status, end time)
+        :return: chroot -> ID of the CoprBuildModel for the chroots which were updated
+        """
+        with get_sa_session() as session:
+            build_ids = {
+                target: id_
+                for id_, target in session.query(
+                    CoprBuildModel.id, CoprBuildModel.target
+                ).filter(
+                    CoprBuildModel.build_id == str(build_id),
+                    CoprBuildModel.target.in_(list(statuses)),
+                    CoprBuildModel.status.notin_(
+                        [PG_COPR_BUILD_STATUS_FAILURE, PG_COPR_BUILD_STATUS_SUCCESS]
+                    ),
+                )
+            }
+            if not build_ids:
+                return {}
+            values = {
+                CoprBuildModel.status: case(
+                    {chroot: status for chroot, (status, _) in statuses.items()},
+                    value=CoprBuildModel.target,
+                )
+            }
+            end_times = {chroot: end for chroot, (_, end) in statuses.items() if end}
+            if end_times:
+                values[CoprBuildModel.build_finished_time] = case(
+                    end_times,
+                    value=CoprBuildModel.target,
+                    else_=CoprBuildModel.build_finished_time,
+                )
+            session.query(CoprBuildModel).filter(
+                CoprBuildModel.id.in_(list(build_ids.values()))
+            ).update(values, synchronize_session=False)
+            return build_ids
+
     # returns the build matching the build_id and the target
     @classmethod
     def get_by_build_id(
@@ -495,6 +562,60 @@ class CoprBuildModel(Base):
                 session.add(build)
             return build
 
+    @classmethod
+    def create_for_targets(
+        cls,
+        build_id: str,
+        targets: Iterable[str],
+        commit_sha: str,
+        project_name: str,
+        owner: str,
+        web_url: str,
+        status: str,
+        srpm_build: "SRPMBuildModel",
+        trigger_model: AbstractTriggerDbType,
+    ) -> Dict[str, "CoprBuildModel"]:
+        """
+        Bulk variant of `get_or_create` for all the chroots of one copr build.
+
+        The job trigger is resolved only once and all the missing rows
+        are inserted in a single statement.
+
+        :return: dict with target as a key and the build model as a value
+        """
+        targets = set(targets)
+        if not targets:
+            return {}
+
+        job_trigger = JobTriggerModel.get_or_create(
+            type=trigger_model.job_trigger_model_type, trigger_id=trigger_model.id
+        )
+
+        with get_sa_session() as session:
+            query = session.query(CoprBuildModel).filter(
+                CoprBuildModel.build_id == build_id, CoprBuildModel.target.in_(targets),
+            )
+            existing_targets = {build.target for build in query}
+            submitted_time = datetime.utcnow()
+            rows = [
+                {
+                    "build_id": build_id,
+                    "job_trigger_id": job_trigger.id,
+                    "srpm_build_id": srpm_build.id,
+                    "status": status,
+                    "project_name": project_name,
+                    "owner": owner,
+                    "commit_sha": commit_sha,
+                    "web_url": web_url,
+                    "target": target,
+                    "build_submitted_time": submitted_time,
+                }
+                for target in sorted(targets - existing_targets)
+            ]
+            if rows:
+                session.execute(insert(CoprBuildModel).values(rows))
+            return {build.target: build for build in query}
+
     def __repr__(self):
         return f"COPRBuildModel(id={self.id}, job_trigger={self.job_trigger})"
 
@@ -529,6 +650,16 @@ class KojiBuildModel(Base):
     # metadata is reserved to sqlalch
     data = Column(JSON)
 
+    def set_start_time(self, start_time: DateTime):
+        with get_sa_session() as session:
+            self.build_start_time = start_time
+            session.add(self)
+
+    def set_end_time(self, end_time: DateTime):
+        with get_sa_session() as session:
+            self.build_finished_time = end_time
+            session.add(self)
+
     def set_status(self, status: str):
         with get_sa_session() as session:
             self.status = status
@@ -542,6 +673,12 @@ class KojiBuildModel(Base):
     def get_project(self) -> GitProjectModel:
         return self.job_trigger.get_trigger_object().project
 
+    def get_pr_id(self) -> Optional[int]:
+        trigger_object = self.job_trigger.get_trigger_object()
+        if isinstance(trigger_object, PullRequestModel):
+            return trigger_object.pr_id
+        return None
+
     @property
     def api_structure(self) -> Dict[str, Any]:
         base = {
@@ -581,6 +718,11 @@ class KojiBuildModel(Base):
         with get_sa_session() as session:
             return session.query(KojiBuildModel).all()
 
+    @classmethod
+    def get_all_by_status(cls, status: str) -> Optional[Iterable["KojiBuildModel"]]:
+        with get_sa_session() as session:
+            return session.query(KojiBuildModel).filter_by(status=status)
+
     # Returns all builds with that build_id, irrespective of target
     @classmethod
     def get_all_by_build_id(
@@ -648,15 +790,20 @@ class SRPMBuildModel(Base):
     # our logs we want to show to the user
     logs = Column(Text)
     success = Column(Boolean)
+    # key of the SRPM in the SRPM cache (see worker/build/srpm_cache.py)
+    cache_key = Column(String, index=True)
     copr_builds = relationship("CoprBuildModel", back_populates="srpm_build")
     koji_builds = relationship("KojiBuildModel", back_populates="srpm_build")
 
     @classmethod
-    def create(cls, logs: str, success: bool) -> "SRPMBuildModel":
+    def create(
+        cls, logs: str, success: bool, cache_key: Optional[str] = None
+    ) -> "SRPMBuildModel":
         with get_sa_session() as session:
             srpm_build = cls()
             srpm_build.logs = logs
             srpm_build.success = success
+            srpm_build.cache_key = cache_key
             session.add(srpm_build)
             return srpm_build
 
@@ -665,6 +812,17 @@ class SRPMBuildModel(Base):
         with get_sa_session() as session:
             return session.query(SRPMBuildModel).filter_by(id=id_).first()
 
+    @classmethod
+    def get_by_cache_key(cls, cache_key: str) -> Optional["SRPMBuildModel"]:
+        """ The oldest successful SRPM build of the cached SRPM. """
+        with get_sa_session() as session:
+            return (
+                session.query(SRPMBuildModel)
+                .filter_by(cache_key=cache_key, success=True)
+                .order_by(SRPMBuildModel.id)
+                .first()
+            )
+
     def __repr__(self):
         return f"SRPMBuildModel(id={self.id})"
 
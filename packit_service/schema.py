@@ -56,6 +56,24 @@ class ServiceConfigSchema(UserConfigSchema):
     pr_accepted_labels = fields.List(fields.String())
     admins = fields.List(fields.String())
     server_name = fields.String()
+    handler_concurrency = fields.Integer(default=1)
+    fan_out_handlers = fields.Bool(default=False)
+    webhook_buffer_size = fields.Integer(default=1000)
+    webhook_batch_size = fields.Integer(default=1)
+    webhook_batch_delay = fields.Float(default=0.05)
+    webhook_spool_path = fields.String()
+    srpm_log_max_size = fields.Integer(default=1024 * 1024)
+    srpm_cache_dir = fields.String()
+    srpm_cache_max_size = fields.Integer(default=10 * 1024 ** 3)
+    git_mirror_cache_dir = fields.String()
+    git_mirror_cache_max_size = fields.Integer(default=50 * 1024 ** 3)
+    sandbox_pool_size = fields.Integer(default=0)
+    sandbox_pool_max_size = fields.Integer(default=10)
+    local_srpm_namespaces = fields.List(fields.String())
+    local_srpm_workers = fields.Integer(default=2)
+    local_srpm_timeout = fields.Integer(default=600)
+    srpm_cache_url = fields.String()
+    copr_build_end_window = fields.Float(default=0)
 
     @post_load
     def make_instance(self, data, **kwargs):
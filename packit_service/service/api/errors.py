@@ -20,6 +20,5 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-
-class ValidationFailed(Exception):
-    pass
+# kept here for backwards compatibility, the webhook checks don't depend on Flask
+from packit_service.service.webhook_checks import ValidationFailed  # noqa: F401
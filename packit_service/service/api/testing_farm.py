@@ -30,8 +30,8 @@ try:
 except ModuleNotFoundError:
     from flask_restplus import Namespace, Resource, fields
 
-from packit_service.celerizer import celery_app
 from packit_service.config import ServiceConfig
+from packit_service.service.publisher import get_webhook_publisher
 from packit_service.service.api.errors import ValidationFailed
 
 logger = logging.getLogger("packit_service")
@@ -106,9 +106,7 @@ class TestingFarmResults(Resource):
             logger.info(f"/testing-farm/results {exc}")
             return str(exc), HTTPStatus.UNAUTHORIZED
 
-        celery_app.send_task(
-            name="task.steve_jobs.process_message", kwargs={"event": msg}
-        )
+        get_webhook_publisher().submit(msg)
 
         return "Test results accepted", HTTPStatus.ACCEPTED
 
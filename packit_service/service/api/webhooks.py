@@ -19,8 +19,6 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
-import hmac
-from hashlib import sha1
 from http import HTTPStatus
 from logging import getLogger
 
@@ -31,9 +29,16 @@ try:
 except ModuleNotFoundError:
     from flask_restplus import Namespace, Resource, fields
 
-from packit_service.celerizer import celery_app
 from packit_service.config import ServiceConfig
-from packit_service.service.api.errors import ValidationFailed
+from packit_service.service.publisher import get_webhook_publisher
+from packit_service.service.webhook_checks import (
+    ValidationFailed,
+    is_ping,
+    validate_github_signature,
+    is_github_event_interesting,
+    validate_gitlab_token,
+    is_gitlab_event_interesting,
+)
 
 logger = getLogger("packit_service")
 config = ServiceConfig.get_service_config()
@@ -78,7 +83,7 @@ class GithubWebhook(Resource):
             logger.debug("/webhooks/github: we haven't received any JSON data.")
             return "We haven't received any JSON data.", HTTPStatus.BAD_REQUEST
 
-        if all([msg.get("zen"), msg.get("hook_id"), msg.get("hook")]):
+        if is_ping(msg):
             logger.debug(f"/webhooks/github received ping event: {msg['hook']}")
             return "Pong!", HTTPStatus.OK
 
@@ -91,71 +96,19 @@ class GithubWebhook(Resource):
         if not self.interested():
             return "Thanks but we don't care about this event", HTTPStatus.ACCEPTED
 
-        # TODO: define task names at one place
-        celery_app.send_task(
-            name="task.steve_jobs.process_message", kwargs={"event": msg}
-        )
+        get_webhook_publisher().submit(msg)
 
         return "Webhook accepted. We thank you, Github.", HTTPStatus.ACCEPTED
 
     @staticmethod
     def validate_signature():
-        """
-        https://developer.github.com/webhooks/securing/#validating-payloads-from-github
-        https://developer.github.com/webhooks/#delivery-headers
-        """
-        if "X-Hub-Signature" not in request.headers:
-            if config.validate_webhooks:
-                msg = "X-Hub-Signature not in request.headers"
-                logger.warning(msg)
-                raise ValidationFailed(msg)
-            else:
-                # don't validate signatures when testing locally
-                logger.debug("Ain't validating signatures.")
-                return
-
-        sig = request.headers["X-Hub-Signature"]
-        if not sig.startswith("sha1="):
-            msg = f"Digest mode in X-Hub-Signature {sig!r} is not sha1."
-            logger.warning(msg)
-            raise ValidationFailed(msg)
-
-        webhook_secret = config.webhook_secret.encode()
-        if not webhook_secret:
-            msg = "'webhook_secret' not specified in the config."
-            logger.error(msg)
-            raise ValidationFailed(msg)
-
-        signature = sig.split("=")[1]
-        mac = hmac.new(webhook_secret, msg=request.get_data(), digestmod=sha1)
-        digest_is_valid = hmac.compare_digest(signature, mac.hexdigest())
-        if digest_is_valid:
-            logger.debug("Payload signature OK.")
-        else:
-            msg = "Payload signature validation failed."
-            logger.warning(msg)
-            logger.debug(f"X-Hub-Signature: {sig!r} != computed: {mac.hexdigest()}")
-            raise ValidationFailed(msg)
+        validate_github_signature(
+            headers=request.headers, payload=request.get_data(), config=config
+        )
 
     @staticmethod
     def interested():
-        """
-        Check X-GitHub-Event header for events we know we give a f...
-        ...finely prepared response to.
-        :return: False if we are not interested in this kind of event
-        """
-        uninteresting_events = {
-            "integration_installation",
-            "integration_installation_repositories",
-        }
-        event_type = request.headers.get("X-GitHub-Event")
-        uuid = request.headers.get("X-GitHub-Delivery")
-        _interested = event_type not in uninteresting_events
-
-        logger.debug(
-            f"{event_type} {uuid}{' (not interested)' if not _interested else ''}"
-        )
-        return _interested
+        return is_github_event_interesting(request.headers)
 
 
 @ns.route("/gitlab")
@@ -176,7 +129,7 @@ class GitlabWebhook(Resource):
             logger.debug("/webhooks/gitlab: we haven't received any JSON data.")
             return "We haven't received any JSON data.", HTTPStatus.BAD_REQUEST
 
-        if all([msg.get("zen"), msg.get("hook_id"), msg.get("hook")]):
+        if is_ping(msg):
             logger.debug(f"/webhooks/gitlab received ping event: {msg['hook']}")
             return "Pong!", HTTPStatus.OK
 
@@ -189,50 +142,14 @@ class GitlabWebhook(Resource):
         if not self.interested():
             return "Thanks but we don't care about this event", HTTPStatus.ACCEPTED
 
-        # TODO: define task names at one place
-        celery_app.send_task(
-            name="task.steve_jobs.process_message", kwargs={"event": msg}
-        )
+        get_webhook_publisher().submit(msg)
 
         return "Webhook accepted. We thank you, Gitlab.", HTTPStatus.ACCEPTED
 
     @staticmethod
     def validate_token():
-        """
-        https://docs.gitlab.com/ee/user/project/integrations/webhooks.html#secret-token
-        """
-        if "X-Gitlab-Token" not in request.headers:
-            if config.validate_webhooks:
-                msg = "X-Gitlab-Token not in request.headers"
-                logger.warning(msg)
-                raise ValidationFailed(msg)
-            else:
-                # don't validate signatures when testing locally
-                logger.debug("Ain't validating token.")
-                return
-
-        token = request.headers["X-Gitlab-Token"]
-
-        # Find a better solution
-        if token != config.gitlab_webhook_token:
-            raise ValidationFailed("Payload token validation failed.")
-
-        logger.debug("Payload token is OK.")
+        validate_gitlab_token(headers=request.headers, config=config)
 
     @staticmethod
     def interested():
-        """
-        Check object_kind in request body for events we know we give a f...
-        ...finely prepared response to.
-        :return: False if we are not interested in this kind of event
-        """
-
-        interesting_events = {
-            "Note Hook",
-            "Merge Request Hook",
-        }
-        event_type = request.headers.get("X-Gitlab-Event")
-        _interested = event_type in interesting_events
-
-        logger.debug(f"{event_type} {' (not interested)' if not _interested else ''}")
-        return _interested
+        return is_gitlab_event_interesting(request.headers)
@@ -0,0 +1,301 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Optional ASGI front end for the webhooks.
+
+It serves the same routes and does the same validation as the Flask API
+(`packit_service/service/api/webhooks.py`), but it acknowledges the webhook
+as soon as the event is put into a bounded in-memory buffer.
+The events are published to the broker in batches by a background task
+(see `packit_service.service.publisher`).
+When the buffer is full, the request waits a moment and then gets
+503 Service Unavailable so the sender backs off.
+
+The in-memory buffer is not durable: the buffered events are lost
+when the process is killed. With `webhook_spool_path` set, the events are
+stored to the spool (`packit_service.service.spool`) before the webhook
+is acknowledged instead, and published from there.
+
+The Flask application is still needed for the rest of the API, route
+only the webhooks here, e.g.:
+
+    $ uvicorn packit_service.service.asgi:application --port 8443
+"""
+
+import asyncio
+import json
+import logging
+from http import HTTPStatus
+from typing import Callable, Dict, List, Optional, Tuple
+
+from requests.structures import CaseInsensitiveDict
+
+from packit_service.config import ServiceConfig
+from packit_service.service.publisher import BatchPublisher, publish_batch
+from packit_service.service.spool import WebhookSpool
+from packit_service.service.webhook_checks import (
+    ValidationFailed,
+    is_ping,
+    validate_github_signature,
+    is_github_event_interesting,
+    validate_gitlab_token,
+    is_gitlab_event_interesting,
+)
+
+logger = logging.getLogger("packit_service")
+
+# how many events are published to the broker at once
+PUBLISH_BATCH_SIZE = 100
+# how long can a request wait for a free place in the buffer (in seconds)
+ENQUEUE_TIMEOUT = 1.0
+# how long to wait before retrying a batch which failed to be published
+PUBLISH_RETRY_DELAY = 1.0
+PUBLISH_RETRY_MAX_DELAY = 30.0
+
+# response text, status and the event to publish
+Response = Tuple[str, HTTPStatus, Optional[dict]]
+
+
+class WebhookIngestion:
+    """
+    ASGI application accepting the Github and Gitlab webhooks.
+    """
+
+    def __init__(
+        self,
+        config: Optional[ServiceConfig] = None,
+        buffer_size: Optional[int] = None,
+        publish: Callable[[List[dict]], None] = publish_batch,
+        spool: Optional[WebhookSpool] = None,
+    ):
+        self._config = config
+        self._buffer_size = buffer_size
+        self.publish = publish
+        self._spool = spool
+        self.queue: Optional[asyncio.Queue] = None
+        self._publisher: Optional[asyncio.Future] = None
+        # publishes from the spool, when there is one
+        self.spooled_publisher: Optional[BatchPublisher] = None
+        self.routes: Dict[str, Callable[[CaseInsensitiveDict, bytes], Response]] = {
+            "/api/webhooks/github": self.github_webhook,
+            "/api/webhooks/gitlab": self.gitlab_webhook,
+        }
+
+    @property
+    def config(self) -> ServiceConfig:
+        if self._config is None:
+            self._config = ServiceConfig.get_service_config()
+        return self._config
+
+    def start(self):
+        if self.queue is not None or self.spooled_publisher is not None:
+            return
+        if self._spool is None and self.config.webhook_spool_path:
+            self._spool = WebhookSpool(self.config.webhook_spool_path)
+        if self._spool is not None:
+            self.spooled_publisher = BatchPublisher(
+                batch_size=PUBLISH_BATCH_SIZE,
+                batch_delay=self.config.webhook_batch_delay,
+                spool=self._spool,
+                publish=self.publish,
+            )
+            return
+        self.queue = asyncio.Queue(
+            maxsize=self._buffer_size or self.config.webhook_buffer_size
+        )
+        self._publisher = asyncio.ensure_future(self.publish_forever())
+
+    async def stop(self):
+        """ Publish everything what is buffered and stop the publisher. """
+        if self.spooled_publisher is not None:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self.spooled_publisher.flush)
+            return
+        if self.queue is None:
+            return
+        await self.queue.join()
+        self._publisher.cancel()
+        self.queue = self._publisher = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def http(self, scope, receive, send):
+        # servers without lifespan support
+        self.start()
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        handler = self.routes.get(scope["path"].rstrip("/"))
+        extra_headers = []
+        if not handler:
+            text, status = "Not found.", HTTPStatus.NOT_FOUND
+        elif scope["method"] != "POST":
+            text, status = "Method not allowed.", HTTPStatus.METHOD_NOT_ALLOWED
+        else:
+            headers = CaseInsensitiveDict(
+                (key.decode("latin-1"), value.decode("latin-1"))
+                for key, value in scope["headers"]
+            )
+            text, status, event = handler(headers, body)
+            if event is not None and not await self.enqueue(event):
+                text = "Too many webhooks, try again later."
+                status = HTTPStatus.SERVICE_UNAVAILABLE
+                extra_headers.append((b"retry-after", b"1"))
+
+        # the same format as flask-restx uses for the string responses
+        response_body = (json.dumps(text) + "\n").encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status.value,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(response_body)).encode()),
+                ]
+                + extra_headers,
+            }
+        )
+        await send({"type": "http.response.body", "body": response_body})
+
+    async def enqueue(self, event: dict) -> bool:
+        """
+        Wait for a free place in the buffer (or store the event to the spool).
+
+        :return: False if the buffer stayed full
+        """
+        if self.spooled_publisher is not None:
+            # the spool is written synchronously (fsync), don't block the loop
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self.spooled_publisher.submit, event)
+            return True
+        try:
+            await asyncio.wait_for(self.queue.put(event), timeout=ENQUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("The webhook buffer is full, rejecting the webhook.")
+            return False
+        return True
+
+    async def publish_forever(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < PUBLISH_BATCH_SIZE and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            delay = PUBLISH_RETRY_DELAY
+            while True:
+                try:
+                    await loop.run_in_executor(None, self.publish, batch)
+                    break
+                except Exception as ex:
+                    # keep the batch, the buffer fills up and we start
+                    # rejecting the new webhooks until the broker is back
+                    logger.error(f"Failed to publish {len(batch)} events: {ex}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, PUBLISH_RETRY_MAX_DELAY)
+
+            logger.debug(f"Published {len(batch)} events.")
+            for _ in batch:
+                self.queue.task_done()
+
+    @staticmethod
+    def parse_json(body: bytes) -> Optional[dict]:
+        try:
+            return json.loads(body) if body else None
+        except ValueError:
+            return None
+
+    def github_webhook(self, headers: CaseInsensitiveDict, body: bytes) -> Response:
+        msg = self.parse_json(body)
+
+        if not msg:
+            logger.debug("/webhooks/github: we haven't received any JSON data.")
+            return "We haven't received any JSON data.", HTTPStatus.BAD_REQUEST, None
+
+        if is_ping(msg):
+            logger.debug(f"/webhooks/github received ping event: {msg['hook']}")
+            return "Pong!", HTTPStatus.OK, None
+
+        try:
+            validate_github_signature(headers=headers, payload=body, config=self.config)
+        except ValidationFailed as exc:
+            logger.info(f"/webhooks/github {exc}")
+            return str(exc), HTTPStatus.UNAUTHORIZED, None
+
+        if not is_github_event_interesting(headers):
+            return (
+                "Thanks but we don't care about this event",
+                HTTPStatus.ACCEPTED,
+                None,
+            )
+
+        return "Webhook accepted. We thank you, Github.", HTTPStatus.ACCEPTED, msg
+
+    def gitlab_webhook(self, headers: CaseInsensitiveDict, body: bytes) -> Response:
+        msg = self.parse_json(body)
+
+        if not msg:
+            logger.debug("/webhooks/gitlab: we haven't received any JSON data.")
+            return "We haven't received any JSON data.", HTTPStatus.BAD_REQUEST, None
+
+        if is_ping(msg):
+            logger.debug(f"/webhooks/gitlab received ping event: {msg['hook']}")
+            return "Pong!", HTTPStatus.OK, None
+
+        try:
+            validate_gitlab_token(headers=headers, config=self.config)
+        except ValidationFailed as exc:
+            logger.info(f"/webhooks/gitlab {exc}")
+            return str(exc), HTTPStatus.UNAUTHORIZED, None
+
+        if not is_gitlab_event_interesting(headers):
+            return (
+                "Thanks but we don't care about this event",
+                HTTPStatus.ACCEPTED,
+                None,
+            )
+
+        return "Webhook accepted. We thank you, Gitlab.", HTTPStatus.ACCEPTED, msg
+
+
+application = WebhookIngestion()
@@ -35,7 +35,46 @@ from packit_service.models import (
 )
 
 
-class AddReleaseDbTrigger:
+class AddDbTrigger:
+    """
+    Resolve the db_trigger only once for the event instance.
+
+    Every resolution means a chain of `get_or_create` calls
+    (and possibly a forge call e.g. for the commit sha of the release),
+    so the result is kept until `invalidate_db_trigger` is called.
+
+    The `_db_trigger` and `_db_trigger_resolutions` attributes
+    are defined (as slots) and initialized by the `Event`.
+    """
+
+    __slots__ = ()
+    _db_trigger: Optional[AbstractTriggerDbType]
+    _db_trigger_resolutions: int
+
+    @property
+    def db_trigger(self) -> Optional[AbstractTriggerDbType]:
+        if self._db_trigger is None:
+            self._db_trigger_resolutions += 1
+            self._db_trigger = self.get_db_trigger()
+        return self._db_trigger
+
+    @property
+    def db_trigger_resolutions(self) -> int:
+        """
+        How many times was the db_trigger resolved for this event (i.e. for this task).
+        """
+        return self._db_trigger_resolutions
+
+    def get_db_trigger(self) -> Optional[AbstractTriggerDbType]:
+        raise NotImplementedError()
+
+    def invalidate_db_trigger(self) -> None:
+        self._db_trigger = None
+
+
+class AddReleaseDbTrigger(AddDbTrigger):
+    __slots__ = ()
+
     tag_name: str
     repo_namespace: str
     repo_name: str
@@ -48,8 +87,7 @@ class AddReleaseDbTrigger:
         """
         raise NotImplementedError()
 
-    @property
-    def db_trigger(self) -> Optional[AbstractTriggerDbType]:
+    def get_db_trigger(self) -> Optional[AbstractTriggerDbType]:
         return ProjectReleaseModel.get_or_create(
             tag_name=self.tag_name,
             namespace=self.repo_namespace,
@@ -59,13 +97,14 @@ class AddReleaseDbTrigger:
         )
 
 
-class AddPullRequestDbTrigger:
+class AddPullRequestDbTrigger(AddDbTrigger):
+    __slots__ = ()
+
     pr_id: int
     project: GitProject
     project_url: str
 
-    @property
-    def db_trigger(self) -> Optional[AbstractTriggerDbType]:
+    def get_db_trigger(self) -> Optional[AbstractTriggerDbType]:
         return PullRequestModel.get_or_create(
             pr_id=self.pr_id,
             namespace=self.project.namespace,
@@ -74,14 +113,15 @@ class AddPullRequestDbTrigger:
         )
 
 
-class AddIssueDbTrigger:
+class AddIssueDbTrigger(AddDbTrigger):
+    __slots__ = ()
+
     issue_id: int
     repo_namespace: str
     repo_name: str
     project_url: str
 
-    @property
-    def db_trigger(self) -> Optional[AbstractTriggerDbType]:
+    def get_db_trigger(self) -> Optional[AbstractTriggerDbType]:
         return IssueModel.get_or_create(
             issue_id=self.issue_id,
             namespace=self.repo_namespace,
@@ -90,14 +130,15 @@ class AddIssueDbTrigger:
         )
 
 
-class AddBranchPushDbTrigger:
+class AddBranchPushDbTrigger(AddDbTrigger):
+    __slots__ = ()
+
     git_ref: str
     repo_namespace: str
     repo_name: str
     project_url: str
 
-    @property
-    def db_trigger(self) -> Optional[AbstractTriggerDbType]:
+    def get_db_trigger(self) -> Optional[AbstractTriggerDbType]:
         return GitBranchModel.get_or_create(
             branch_name=self.git_ref,
             namespace=self.repo_namespace,
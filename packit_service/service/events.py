@@ -23,11 +23,11 @@
 """
 This file defines classes for events which are sent by GitHub or FedMsg.
 """
-import copy
 import enum
 import logging
 from datetime import datetime, timezone
-from typing import Optional, List, Union, Dict, Set
+from functools import lru_cache
+from typing import Optional, List, Union, Dict, Set, Any, Callable, Type, cast
 
 from ogr.abstract import GitProject
 from ogr.services.pagure import PagureProject
@@ -37,6 +37,7 @@ from packit_service.config import (
     PackageConfigGetter,
 )
 from packit_service.constants import WHITELIST_CONSTANTS
+from packit_service.in_flight_builds import in_flight_copr_builds
 from packit_service.models import (
     CoprBuildModel,
     AbstractTriggerDbType,
@@ -50,10 +51,52 @@ from packit_service.service.db_triggers import (
     AddPullRequestDbTrigger,
     AddBranchPushDbTrigger,
     AddIssueDbTrigger,
+    AddDbTrigger,
 )
 
 logger = logging.getLogger(__name__)
 
+# lazily fetched objects, fetched again after the event is restored from a dict
+LAZY_EVENT_ATTRIBUTES = ("_project", "_base_project", "_package_config")
+# cached DB/forge/config objects are not part of the event data
+NOT_SERIALIZED_EVENT_ATTRIBUTES = {
+    "_db_trigger",
+    "_db_trigger_resolutions",
+    "build",
+    *LAZY_EVENT_ATTRIBUTES,
+}
+
+
+@lru_cache(maxsize=None)
+def get_slot_descriptors(kls: type) -> Dict[str, Any]:
+    """
+    Get the slot descriptors (slot name -> descriptor) of the class and its parents.
+
+    The descriptors are used directly so a property of the same name
+    in a subclass (e.g. lazily fetched `commit_sha`) is not evaluated.
+    """
+    descriptors = {}
+    for base in reversed(kls.__mro__):
+        for slot in vars(base).get("__slots__", ()):
+            descriptors[slot] = vars(base)[slot]
+    return descriptors
+
+
+def to_primitive(value: Any) -> Any:
+    """
+    Convert the value to primitive types:
+    enums to their values, datetimes to timestamps and collections to lists/dicts.
+    """
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, dict):
+        return {k: to_primitive(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [to_primitive(v) for v in value]
+    return value
+
 
 class PullRequestAction(enum.Enum):
     opened = "opened"
@@ -110,6 +153,8 @@ class TheJobTriggerType(str, enum.Enum):
 
 
 class TestResult(dict):
+    __slots__ = ("name", "result", "log_url")
+
     def __init__(self, name: str, result: TestingFarmResult, log_url: str):
         dict.__init__(self, name=name, result=result, log_url=log_url)
         self.name = name
@@ -137,6 +182,14 @@ class TestResult(dict):
 
 
 class Event:
+    __slots__ = ("trigger", "created_at", "_db_trigger", "_db_trigger_resolutions")
+
+    # how to restore the attributes that are not primitive values (see `from_dict`)
+    attribute_types: Dict[str, Callable[[Any], Any]] = {
+        "trigger": TheJobTriggerType,
+        "created_at": lambda timestamp: datetime.fromtimestamp(timestamp, timezone.utc),
+    }
+
     def __init__(
         self, trigger: TheJobTriggerType, created_at: Union[int, float, str] = None
     ):
@@ -152,6 +205,10 @@ class Event:
         else:
             self.created_at = datetime.now()
 
+        # see AddDbTrigger
+        self._db_trigger: Optional[AbstractTriggerDbType] = None
+        self._db_trigger_resolutions: int = 0
+
     @staticmethod
     def ts2str(event: dict):
         """
@@ -167,12 +224,74 @@ class Event:
         return event
 
     def get_dict(self, default_dict: Optional[Dict] = None) -> dict:
-        d = default_dict or self.__dict__
-        d = copy.deepcopy(d)
         # whole dict have to be JSON serializable because of redis
-        d["trigger"] = d["trigger"].value
-        d["created_at"] = int(d["created_at"].timestamp())
-        return d
+        return to_primitive(
+            {
+                k: v
+                for k, v in (default_dict or self.get_attributes()).items()
+                if k not in NOT_SERIALIZED_EVENT_ATTRIBUTES
+            }
+        )
+
+    def to_dict(self) -> dict:
+        """
+        Serialize the event data to a dictionary of primitive values
+        (can be dumped by json/orjson/msgpack, restored by `from_dict`).
+
+        Cached DB objects and lazily fetched objects (project, package config)
+        are not part of the event data.
+        """
+        return self.get_dict()
+
+    @classmethod
+    def get_attribute_types(cls) -> Dict[str, Callable[[Any], Any]]:
+        """
+        Types of the attributes that are not primitive values
+        collected from `attribute_types` of the class and all its parents.
+        """
+        attribute_types: Dict[str, Callable[[Any], Any]] = {}
+        for kls in reversed(cls.__mro__):
+            attribute_types.update(vars(kls).get("attribute_types", {}))
+        return attribute_types
+
+    @classmethod
+    def from_dict(cls, event_dict: dict) -> "Event":
+        """
+        Restore the event from the `to_dict` output
+        without parsing the original message again.
+
+        The lazy properties are fetched again when used.
+        """
+        event = cls.__new__(cls)
+        slots = get_slot_descriptors(cls)
+        defaults = {
+            "_db_trigger": None,
+            "_db_trigger_resolutions": 0,
+            **{key: None for key in LAZY_EVENT_ATTRIBUTES},
+        }
+        attribute_types = cls.get_attribute_types()
+        for key, value in {**defaults, **event_dict}.items():
+            if key not in slots:
+                continue
+            if value is not None and key in attribute_types:
+                value = attribute_types[key](value)
+            slots[key].__set__(event, value)
+        return event
+
+    def get_attributes(self) -> Dict[str, Any]:
+        """
+        Attributes of the event that are set.
+
+        (The events use `__slots__`, so there is no `__dict__`.)
+        """
+        attributes = {}
+        for name, slot in get_slot_descriptors(type(self)).items():
+            try:
+                attributes[name] = slot.__get__(self, type(self))
+            except AttributeError:
+                # not set
+                continue
+        return attributes
 
     @property
     def db_trigger(self) -> Optional[AbstractTriggerDbType]:
@@ -213,6 +332,16 @@ class Event:
 
 
 class AbstractForgeIndependentEvent(Event):
+    __slots__ = (
+        "project_url",
+        "_pr_id",
+        "_project",
+        "_base_project",
+        "_package_config",
+        "git_ref",
+        "identifier",
+    )
+
     commit_sha: Optional[str]
     project_url: str
 
@@ -299,6 +428,8 @@ class AbstractForgeIndependentEvent(Event):
 
 
 class AbstractGithubEvent(AbstractForgeIndependentEvent):
+    __slots__ = ()
+
     def __init__(
         self, trigger: TheJobTriggerType, project_url: str, pr_id: Optional[int] = None
     ):
@@ -311,6 +442,8 @@ class AbstractGithubEvent(AbstractForgeIndependentEvent):
 
 
 class AbstractGitlabEvent(AbstractForgeIndependentEvent):
+    __slots__ = ()
+
     def __init__(
         self, trigger: TheJobTriggerType, project_url: str, pr_id: Optional[int] = None,
     ):
@@ -323,6 +456,8 @@ class AbstractGitlabEvent(AbstractForgeIndependentEvent):
 
 
 class ReleaseEvent(AddReleaseDbTrigger, AbstractGithubEvent):
+    __slots__ = ("repo_namespace", "repo_name", "tag_name", "_commit_sha")
+
     def __init__(
         self, repo_namespace: str, repo_name: str, tag_name: str, project_url: str
     ):
@@ -343,6 +478,8 @@ class ReleaseEvent(AddReleaseDbTrigger, AbstractGithubEvent):
 
 
 class PushGitHubEvent(AddBranchPushDbTrigger, AbstractGithubEvent):
+    __slots__ = ("repo_namespace", "repo_name", "commit_sha")
+
     def __init__(
         self,
         repo_namespace: str,
@@ -360,6 +497,21 @@ class PushGitHubEvent(AddBranchPushDbTrigger, AbstractGithubEvent):
 
 
 class MergeRequestGitlabEvent(AddPullRequestDbTrigger, AbstractGitlabEvent):
+    __slots__ = (
+        "action",
+        "username",
+        "object_id",
+        "object_iid",
+        "source_repo_name",
+        "source_repo_namespace",
+        "target_repo_namespace",
+        "target_repo_name",
+        "https_url",
+        "commit_sha",
+    )
+
+    attribute_types = {"action": GitlabEventAction}
+
     def __init__(
         self,
         action: GitlabEventAction,
@@ -389,13 +541,21 @@ class MergeRequestGitlabEvent(AddPullRequestDbTrigger, AbstractGitlabEvent):
         self.https_url = https_url
         self.commit_sha = commit_sha
 
-    def get_dict(self, default_dict: Optional[Dict] = None) -> dict:
-        result = super().get_dict()
-        result["action"] = result["action"].value
-        return result
-
 
 class PullRequestGithubEvent(AddPullRequestDbTrigger, AbstractGithubEvent):
+    __slots__ = (
+        "action",
+        "base_repo_namespace",
+        "base_repo_name",
+        "base_ref",
+        "target_repo_namespace",
+        "target_repo_name",
+        "commit_sha",
+        "user_login",
+    )
+
+    attribute_types = {"action": PullRequestAction}
+
     def __init__(
         self,
         action: PullRequestAction,
@@ -423,16 +583,25 @@ class PullRequestGithubEvent(AddPullRequestDbTrigger, AbstractGithubEvent):
         self.identifier = str(pr_id)
         self.git_ref = None  # pr_id will be used for checkout
 
-    def get_dict(self, default_dict: Optional[Dict] = None) -> dict:
-        result = super().get_dict()
-        result["action"] = result["action"].value
-        return result
-
     def get_base_project(self) -> Optional[GitProject]:
         return None  # With Github app, we cannot work with fork repo
 
 
 class PullRequestCommentGithubEvent(AddPullRequestDbTrigger, AbstractGithubEvent):
+    __slots__ = (
+        "action",
+        "base_repo_namespace",
+        "base_repo_name",
+        "base_ref",
+        "target_repo_namespace",
+        "target_repo_name",
+        "user_login",
+        "comment",
+        "_commit_sha",
+    )
+
+    attribute_types = {"action": PullRequestCommentAction}
+
     def __init__(
         self,
         action: PullRequestCommentAction,
@@ -471,16 +640,26 @@ class PullRequestCommentGithubEvent(AddPullRequestDbTrigger, AbstractGithubEvent
             self._commit_sha = self.project.get_pr(pr_id=self.pr_id).head_commit
         return self._commit_sha
 
-    def get_dict(self, default_dict: Optional[Dict] = None) -> dict:
-        result = super().get_dict()
-        result["action"] = result["action"].value
-        return result
-
     def get_base_project(self) -> Optional[GitProject]:
         return None  # With Github app, we cannot work with fork repo
 
 
 class IssueCommentEvent(AddIssueDbTrigger, AbstractGithubEvent):
+    __slots__ = (
+        "action",
+        "issue_id",
+        "repo_namespace",
+        "repo_name",
+        "base_ref",
+        "_tag_name",
+        "target_repo",
+        "user_login",
+        "comment",
+        "commit_sha",
+    )
+
+    attribute_types = {"action": IssueCommentAction}
+
     def __init__(
         self,
         action: IssueCommentAction,
@@ -518,13 +697,22 @@ class IssueCommentEvent(AddIssueDbTrigger, AbstractGithubEvent):
             self._tag_name = releases[0].tag_name if releases else ""
         return self._tag_name
 
-    def get_dict(self, default_dict: Optional[Dict] = None) -> dict:
-        result = super().get_dict()
-        result["action"] = result["action"].value
-        return result
-
 
 class InstallationEvent(Event):
+    __slots__ = (
+        "installation_id",
+        "account_login",
+        "account_id",
+        "account_url",
+        "account_type",
+        "repositories",
+        "sender_id",
+        "sender_login",
+        "status",
+    )
+
+    attribute_types = {"status": WhitelistStatus}
+
     def __init__(
         self,
         installation_id: int,
@@ -552,11 +740,6 @@ class InstallationEvent(Event):
         self.sender_login = sender_login
         self.status = status
 
-    def get_dict(self, default_dict: Optional[Dict] = None) -> dict:
-        result = super().get_dict()
-        result["status"] = result["status"].value
-        return result
-
     @property
     def project(self):
         return self.get_project()
@@ -566,6 +749,10 @@ class InstallationEvent(Event):
 
 
 class DistGitEvent(AbstractForgeIndependentEvent):
+    __slots__ = ("topic", "repo_namespace", "repo_name", "branch", "msg_id")
+
+    attribute_types = {"topic": FedmsgTopic}
+
     def __init__(
         self,
         topic: str,
@@ -586,16 +773,37 @@ class DistGitEvent(AbstractForgeIndependentEvent):
         self.project_url = project_url
         self.identifier = branch
 
-    def get_dict(self, default_dict: Optional[Dict] = None) -> dict:
-        result = super().get_dict()
-        result["topic"] = result["topic"].value
-        return result
-
     def get_project(self) -> GitProject:
         return ServiceConfig.get_service_config().get_project(self.project_url)
 
 
-class TestingFarmResultsEvent(AbstractForgeIndependentEvent):
+class TestingFarmResultsEvent(AddDbTrigger, AbstractForgeIndependentEvent):
+    __slots__ = (
+        "pipeline_id",
+        "result",
+        "environment",
+        "message",
+        "log_url",
+        "copr_repo_name",
+        "copr_chroot",
+        "tests",
+        "repo_name",
+        "repo_namespace",
+        "commit_sha",
+    )
+
+    attribute_types = {
+        "result": TestingFarmResult,
+        "tests": lambda tests: [
+            TestResult(
+                name=test["name"],
+                result=TestingFarmResult(test["result"]),
+                log_url=test["log_url"],
+            )
+            for test in tests
+        ],
+    }
+
     def __init__(
         self,
         pipeline_id: str,
@@ -631,7 +839,6 @@ class TestingFarmResultsEvent(AbstractForgeIndependentEvent):
 
         # Lazy properties
         self._pr_id: Optional[int] = None
-        self._db_trigger: Optional[AbstractTriggerDbType] = None
 
     @property
     def pr_id(self) -> Optional[int]:
@@ -639,18 +846,11 @@ class TestingFarmResultsEvent(AbstractForgeIndependentEvent):
             self._pr_id = self.db_trigger.pr_id
         return self._pr_id
 
-    def get_dict(self, default_dict: Optional[Dict] = None) -> dict:
-        result = super().get_dict()
-        result["result"] = result["result"].value
-        return result
-
-    @property
-    def db_trigger(self) -> Optional[AbstractTriggerDbType]:
-        if not self._db_trigger:
-            run_model = TFTTestRunModel.get_by_pipeline_id(pipeline_id=self.pipeline_id)
-            if run_model:
-                self._db_trigger = run_model.job_trigger.get_trigger_object()
-        return self._db_trigger
+    def get_db_trigger(self) -> Optional[AbstractTriggerDbType]:
+        run_model = TFTTestRunModel.get_by_pipeline_id(pipeline_id=self.pipeline_id)
+        if not run_model:
+            return None
+        return run_model.job_trigger.get_trigger_object()
 
     def get_base_project(self) -> Optional[GitProject]:
         if self.pr_id is not None:
@@ -667,8 +867,24 @@ class TestingFarmResultsEvent(AbstractForgeIndependentEvent):
         return self.project
 
 
-class CoprBuildEvent(AbstractForgeIndependentEvent):
+class CoprBuildEvent(AddDbTrigger, AbstractForgeIndependentEvent):
+    __slots__ = (
+        "commit_sha",
+        "base_repo_name",
+        "base_repo_namespace",
+        "topic",
+        "build_id",
+        "build",
+        "chroot",
+        "status",
+        "owner",
+        "project_name",
+        "pkg",
+        "timestamp",
+    )
+
     build: Optional[CoprBuildModel]
+    attribute_types = {"topic": FedmsgTopic}
 
     def __init__(
         self,
@@ -697,7 +913,6 @@ class CoprBuildEvent(AbstractForgeIndependentEvent):
             raise ValueError(f"Unknown topic for CoprEvent: '{self.topic}'")
 
         trigger_type = build.job_trigger.type
-        trigger_db = build.job_trigger.get_trigger_object()
         pr_id = None
         if trigger_type == JobTriggerModelType.pull_request:
             pr_id = trigger_db.pr_id
@@ -723,8 +938,7 @@ class CoprBuildEvent(AbstractForgeIndependentEvent):
         self.pkg = pkg
         self.timestamp = timestamp
 
-    @property
-    def db_trigger(self) -> Optional[AbstractTriggerDbType]:
+    def get_db_trigger(self) -> Optional[AbstractTriggerDbType]:
         return self.build.job_trigger.get_trigger_object()
 
     def get_base_project(self) -> Optional[GitProject]:
@@ -754,6 +968,9 @@ class CoprBuildEvent(AbstractForgeIndependentEvent):
         timestamp,
     ) -> Optional["CoprBuildEvent"]:
         """ Return cls instance or None if build_id not in CoprBuildDB"""
+        if not in_flight_copr_builds.might_contain(build_id, chroot):
+            logger.debug(f"Build id {build_id} ({chroot}) was not submitted by us.")
+            return None
         build = CoprBuildModel.get_by_build_id(str(build_id), chroot)
         if not build:
             logger.warning(f"Build id {build_id} not in CoprBuildDB.")
@@ -769,13 +986,11 @@ class CoprBuildEvent(AbstractForgeIndependentEvent):
 
         return True
 
-    def get_dict(self, default_dict: Optional[Dict] = None) -> dict:
-        d = self.__dict__
-        build = d.pop("build")
-        result = super().get_dict(d)
-        result["topic"] = result["topic"].value
-        self.build = build
-        return result
+    @classmethod
+    def from_dict(cls, event_dict: dict) -> "CoprBuildEvent":
+        event = cast(CoprBuildEvent, super().from_dict(event_dict))
+        event.build = CoprBuildModel.get_by_build_id(str(event.build_id), event.chroot)
+        return event
 
 
 def get_copr_build_logs_url(event: CoprBuildEvent) -> str:
@@ -787,6 +1002,8 @@ def get_copr_build_logs_url(event: CoprBuildEvent) -> str:
 
 
 class AbstractPagureEvent(AbstractForgeIndependentEvent):
+    __slots__ = ()
+
     def __init__(
         self, trigger: TheJobTriggerType, project_url: str, pr_id: Optional[int] = None
     ):
@@ -799,6 +1016,8 @@ class AbstractPagureEvent(AbstractForgeIndependentEvent):
 
 
 class PushPagureEvent(AbstractPagureEvent):
+    __slots__ = ("repo_namespace", "repo_name", "commit_sha")
+
     def __init__(
         self,
         repo_namespace: str,
@@ -816,6 +1035,20 @@ class PushPagureEvent(AbstractPagureEvent):
 
 
 class PullRequestCommentPagureEvent(AddPullRequestDbTrigger, AbstractPagureEvent):
+    __slots__ = (
+        "action",
+        "base_repo_namespace",
+        "base_repo_name",
+        "base_repo_owner",
+        "base_ref",
+        "commit_sha",
+        "target_repo",
+        "user_login",
+        "comment",
+    )
+
+    attribute_types = {"action": PullRequestCommentAction}
+
     def __init__(
         self,
         action: PullRequestCommentAction,
@@ -845,11 +1078,6 @@ class PullRequestCommentPagureEvent(AddPullRequestDbTrigger, AbstractPagureEvent
         self.identifier = str(pr_id)
         self.git_ref = None  # pr_id will be used for checkout
 
-    def get_dict(self, default_dict: Optional[Dict] = None) -> dict:
-        result = super().get_dict()
-        result["action"] = result["action"].value
-        return result
-
     def get_base_project(self) -> GitProject:
         fork = self.project.service.get_project(
             namespace=self.base_repo_namespace,
@@ -862,6 +1090,19 @@ class PullRequestCommentPagureEvent(AddPullRequestDbTrigger, AbstractPagureEvent
 
 
 class PullRequestPagureEvent(AddPullRequestDbTrigger, AbstractPagureEvent):
+    __slots__ = (
+        "action",
+        "base_repo_namespace",
+        "base_repo_name",
+        "base_repo_owner",
+        "base_ref",
+        "target_repo",
+        "commit_sha",
+        "user_login",
+    )
+
+    attribute_types = {"action": PullRequestAction}
+
     def __init__(
         self,
         action: PullRequestAction,
@@ -890,11 +1131,6 @@ class PullRequestPagureEvent(AddPullRequestDbTrigger, AbstractPagureEvent):
         self.git_ref = None  # pr_id will be used for checkout
         self.project_url = project_url
 
-    def get_dict(self, default_dict: Optional[Dict] = None) -> dict:
-        result = super().get_dict()
-        result["action"] = result["action"].value
-        return result
-
     def get_base_project(self) -> GitProject:
         fork = self.project.service.get_project(
             namespace=self.base_repo_namespace,
@@ -907,6 +1143,18 @@ class PullRequestPagureEvent(AddPullRequestDbTrigger, AbstractPagureEvent):
 
 
 class PullRequestLabelPagureEvent(AddPullRequestDbTrigger, AbstractPagureEvent):
+    __slots__ = (
+        "action",
+        "base_repo_namespace",
+        "base_repo_name",
+        "base_repo_owner",
+        "base_ref",
+        "commit_sha",
+        "labels",
+    )
+
+    attribute_types = {"action": PullRequestLabelAction, "labels": set}
+
     def __init__(
         self,
         action: PullRequestLabelAction,
@@ -932,11 +1180,6 @@ class PullRequestLabelPagureEvent(AddPullRequestDbTrigger, AbstractPagureEvent):
         self.commit_sha = commit_sha
         self.labels = labels
 
-    def get_dict(self, default_dict: Optional[Dict] = None) -> dict:
-        result = super().get_dict()
-        result["action"] = result["action"].value
-        return result
-
     def get_base_project(self) -> GitProject:
         fork = self.project.service.get_project(
             namespace=self.base_repo_namespace,
@@ -946,3 +1189,16 @@ class PullRequestLabelPagureEvent(AddPullRequestDbTrigger, AbstractPagureEvent):
         )
         logger.debug(f"Base project: {fork} owned by {self.base_repo_owner}")
         return fork
+
+
+def get_event_class(name: str) -> Optional[Type[Event]]:
+    """
+    Get the event class of the given name (e.g. to restore an event sent to a task).
+    """
+    kls_to_check: List[Type[Event]] = [Event]
+    while kls_to_check:
+        kls = kls_to_check.pop()
+        if kls.__name__ == name:
+            return kls
+        kls_to_check.extend(kls.__subclasses__())
+    return None
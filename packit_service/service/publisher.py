@@ -0,0 +1,271 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Publishing of the accepted webhooks to the workers.
+
+Every `celery_app.send_task` costs one round-trip to the broker.
+During bursts, the publisher collects the events and sends all of them
+in one `task.steve_jobs.process_message_batch` message.
+The batch is sent when it reaches `webhook_batch_size` events
+or when the oldest event waits for `webhook_batch_delay` seconds.
+
+With `webhook_spool_path` set, the events are stored to a local spool
+(`packit_service.service.spool`) before the webhook is acknowledged
+and published from there, so they are not lost when the broker is not available.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from packit_service.config import ServiceConfig
+from packit_service.service.spool import WebhookSpool
+
+logger = logging.getLogger("packit_service")
+
+# how often to check the spool for events of the other processes (in seconds)
+SPOOL_DRAIN_INTERVAL = 10.0
+# how often to remove the old published events from the spool (in seconds)
+SPOOL_PURGE_INTERVAL = 60 * 60
+# how long to wait before publishing the buffered events again
+# after a broker error (in seconds), doubled with every failed attempt
+PUBLISH_RETRY_DELAY = 1.0
+PUBLISH_MAX_RETRY_DELAY = 60.0
+
+
+def get_ordering_key(event: dict) -> Optional[str]:
+    """
+    Events with the same key (= of the same pull request) need to be processed
+    in the order they came in.
+
+    :return: key or None if the event can be processed independently
+    """
+    # github: pull_request, issue_comment
+    repository = event.get("repository") or {}
+    number = (event.get("pull_request") or event.get("issue") or {}).get("number")
+    if repository.get("full_name") and number:
+        return f"github:{repository['full_name']}#{number}"
+
+    # gitlab: merge request, note on a merge request
+    project = event.get("project") or {}
+    iid = (event.get("merge_request") or {}).get("iid")
+    if not iid and event.get("object_kind") == "merge_request":
+        iid = (event.get("object_attributes") or {}).get("iid")
+    if project.get("path_with_namespace") and iid:
+        return f"gitlab:{project['path_with_namespace']}!{iid}"
+
+    # testing farm results
+    pipeline_id = (event.get("pipeline") or {}).get("id")
+    if pipeline_id:
+        return f"testing-farm:{pipeline_id}"
+
+    return None
+
+
+def group_by_ordering_key(events: List[dict]) -> List[List[dict]]:
+    """
+    Split the events into groups which can be processed in parallel,
+    keep the order of the events within the group.
+    """
+    groups: "OrderedDict[object, List[dict]]" = OrderedDict()
+    for index, event in enumerate(events):
+        key = get_ordering_key(event) or index
+        groups.setdefault(key, []).append(event)
+    return list(groups.values())
+
+
+def publish_batch(events: List[dict]) -> None:
+    """ Send the events to the workers in one message. """
+    # imported here so that importing this module doesn't configure celery
+    from packit_service.celerizer import celery_app
+
+    if len(events) == 1:
+        celery_app.send_task(
+            name="task.steve_jobs.process_message", kwargs={"event": events[0]}
+        )
+    else:
+        celery_app.send_task(
+            name="task.steve_jobs.process_message_batch", kwargs={"events": events}
+        )
+
+
+class BatchPublisher:
+    """
+    Thread-safe buffer of the events flushed by a background thread.
+
+    With a spool, every event is stored to the spool first
+    and the background thread drains the spool.
+    Without a spool and with `batch_size` 1, the events are published right away
+    in the caller's thread.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 1,
+        batch_delay: float = 0.05,
+        spool: Optional[WebhookSpool] = None,
+        publish: Callable[[List[dict]], None] = publish_batch,
+    ):
+        self.batch_size = max(batch_size, 1)
+        self.batch_delay = batch_delay
+        self.spool = spool
+        self.publish = publish
+        self.events: List[dict] = []
+        self._first_event_time: Optional[float] = None
+        self._condition = threading.Condition()
+        # only one flush at a time, so that the order of the events is kept
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, event: dict) -> None:
+        if self.spool:
+            self.spool.append(event)
+            with self._condition:
+                if self._first_event_time is None:
+                    self._first_event_time = time.monotonic()
+                self._start_thread()
+                self._condition.notify()
+            return
+
+        if self.batch_size == 1:
+            with self._flush_lock:
+                self.publish([event])
+            return
+
+        with self._condition:
+            if not self.events:
+                self._first_event_time = time.monotonic()
+            self.events.append(event)
+            self._start_thread()
+            self._condition.notify()
+
+    def _start_thread(self):
+        if self._thread is None:
+            # don't lose the buffered events when the process exits
+            atexit.register(self.flush)
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._drain_forever if self.spool else self._flush_forever,
+                name="webhook-publisher",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _flush_forever(self):
+        retry_delay = PUBLISH_RETRY_DELAY
+        while True:
+            with self._condition:
+                while not self.events:
+                    self._condition.wait()
+                self._wait_for_batch(lambda: len(self.events))
+
+            try:
+                self.flush()
+            except Exception as ex:
+                # the events are back in the buffer, don't hammer the broker
+                logger.error(
+                    f"Failed to publish the events, retrying in {retry_delay}s: {ex}"
+                )
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, PUBLISH_MAX_RETRY_DELAY)
+                continue
+            retry_delay = PUBLISH_RETRY_DELAY
+
+    def _drain_forever(self):
+        """
+        Drain the spool, also the events left there by the previous runs
+        or by the other processes.
+        """
+        last_purge = 0.0
+        while True:
+            with self._condition:
+                if self._first_event_time is None:
+                    # nothing new from this process, check the spool from time to time
+                    self._condition.wait(SPOOL_DRAIN_INTERVAL)
+                if self._first_event_time is not None:
+                    self._wait_for_batch(self.spool.count_unpublished)
+                self._first_event_time = None
+
+            try:
+                self.flush()
+            except Exception as ex:
+                logger.error(f"Failed to publish the spooled events: {ex}")
+                continue
+
+            if time.monotonic() - last_purge > SPOOL_PURGE_INTERVAL:
+                logger.debug(f"Purged {self.spool.purge()} events from the spool.")
+                last_purge = time.monotonic()
+
+    def _wait_for_batch(self, get_size: Callable[[], int]):
+        """ Wait for a full batch or for the batch delay, with the condition held. """
+        deadline = self._first_event_time + self.batch_delay
+        while get_size() < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._condition.wait(remaining)
+
+    def flush(self) -> None:
+        """
+        Publish all the buffered events.
+
+        The events which were not published are kept (in the spool or in the buffer).
+
+        :raises Exception: when the broker is down
+        """
+        with self._flush_lock:
+            if self.spool:
+                while self.spool.drain(self.publish, self.batch_size):
+                    pass
+                return
+
+            with self._condition:
+                events, self.events = self.events, []
+            for start in range(0, len(events), self.batch_size):
+                try:
+                    self.publish(events[start : start + self.batch_size])
+                except Exception:
+                    # put them back in front of the events submitted meanwhile
+                    with self._condition:
+                        self.events[:0] = events[start:]
+                    raise
+
+
+_publisher: Optional[BatchPublisher] = None
+
+
+def get_webhook_publisher() -> BatchPublisher:
+    global _publisher
+    if _publisher is None:
+        config = ServiceConfig.get_service_config()
+        _publisher = BatchPublisher(
+            batch_size=config.webhook_batch_size,
+            batch_delay=config.webhook_batch_delay,
+            spool=WebhookSpool(config.webhook_spool_path)
+            if config.webhook_spool_path
+            else None,
+        )
+    return _publisher
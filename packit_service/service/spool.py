@@ -0,0 +1,211 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Append-only local spool of the accepted webhooks.
+
+The web tier writes every accepted webhook here before it replies,
+a drainer forwards the events to the broker and marks them as published.
+When the broker is down, the events wait in the spool until it is back.
+The published events are kept for a while so they can be replayed
+(see `files/scripts/webhook_spool.py`).
+
+The spool is a SQLite database in WAL mode: appends don't block readers
+and the database can be shared by all the processes of the web tier.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("packit_service")
+
+# published events older than this are removed from the spool (in seconds)
+SPOOL_RETENTION = 7 * 24 * 60 * 60
+# events claimed by a drainer which did not mark them as published in this time
+# (e.g. it was killed) can be claimed again (in seconds)
+SPOOL_CLAIM_TIMEOUT = 5 * 60
+
+SpooledEvent = Tuple[int, datetime, dict]
+
+
+class WebhookSpool:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                received_at REAL NOT NULL,
+                claimed_at REAL,
+                published_at REAL,
+                event TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS events_unpublished
+                ON events (id) WHERE published_at IS NULL;
+            CREATE INDEX IF NOT EXISTS events_received_at ON events (received_at);
+            """
+        )
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """ sqlite3 connections can't be shared by threads, one per thread """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # autocommit, transactions are started explicitly
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # fsync every commit, the event is acknowledged after the append
+            connection.execute("PRAGMA synchronous=FULL")
+            self._local.connection = connection
+        return connection
+
+    def append(self, event: dict) -> int:
+        """ Store the event, return its id in the spool. """
+        cursor = self.connection.execute(
+            "INSERT INTO events (received_at, event) VALUES (?, ?)",
+            (time.time(), json.dumps(event)),
+        )
+        return cursor.lastrowid
+
+    def drain(self, publish: Callable[[List[dict]], None], limit: int) -> int:
+        """
+        Publish the oldest unpublished events.
+
+        The events are claimed first so that they are not published twice
+        by several processes, and only one process drains the spool at a time
+        so that the order of the events is kept.
+        The spool is not locked while publishing, appends don't wait for the broker.
+
+        :param publish: function sending the events to the broker, can raise
+        :param limit: max number of the events to publish
+        :return: number of the published events
+                 (0 when another process is draining the spool)
+        """
+        rows = self.claim(limit)
+        if not rows:
+            return 0
+
+        try:
+            publish([json.loads(event) for _, event in rows])
+        except Exception:
+            # let the next drain try again
+            self._set_state(rows, "claimed_at", None)
+            raise
+        self._set_state(rows, "published_at", time.time())
+        return len(rows)
+
+    def claim(self, limit: int) -> List[Tuple[int, str]]:
+        """
+        Claim the oldest unpublished events unless another drainer has a claim.
+
+        :return: ids and data of the claimed events
+        """
+        now = time.time()
+        with self.transaction():
+            if self.connection.execute(
+                "SELECT 1 FROM events WHERE published_at IS NULL AND claimed_at > ? "
+                "LIMIT 1",
+                (now - SPOOL_CLAIM_TIMEOUT,),
+            ).fetchone():
+                return []
+            rows = self.connection.execute(
+                "SELECT id, event FROM events WHERE published_at IS NULL "
+                "ORDER BY id LIMIT ?",
+                (limit,),
+            ).fetchall()
+            self.connection.executemany(
+                "UPDATE events SET claimed_at = ? WHERE id = ?",
+                [(now, id_) for id_, _ in rows],
+            )
+        return rows
+
+    def _set_state(
+        self, rows: List[Tuple[int, str]], column: str, value: Optional[float]
+    ) -> None:
+        with self.transaction():
+            self.connection.executemany(
+                f"UPDATE events SET {column} = ? WHERE id = ?",
+                [(value, id_) for id_, _ in rows],
+            )
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """ Short write transaction, the spool is locked for the other writers. """
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def count_unpublished(self) -> int:
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM events WHERE published_at IS NULL"
+        ).fetchone()[0]
+
+    def get_summary(self) -> Tuple[int, Optional[datetime], Optional[datetime]]:
+        """ Number of the events in the spool, when the oldest and the newest came. """
+        count, oldest, newest = self.connection.execute(
+            "SELECT COUNT(*), MIN(received_at), MAX(received_at) FROM events"
+        ).fetchone()
+        if not count:
+            return 0, None, None
+        return count, datetime.fromtimestamp(oldest), datetime.fromtimestamp(newest)
+
+    def get_events(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Iterator[SpooledEvent]:
+        """ Events received in the given time range, oldest first. """
+        rows = self.connection.execute(
+            "SELECT id, received_at, event FROM events "
+            "WHERE received_at >= ? AND received_at < ? ORDER BY id",
+            (
+                since.timestamp() if since else 0,
+                until.timestamp() if until else float("inf"),
+            ),
+        )
+        for id_, received_at, event in rows:
+            yield id_, datetime.fromtimestamp(received_at), json.loads(event)
+
+    def purge(self, older_than: Optional[float] = None) -> int:
+        """
+        Remove the published events.
+
+        :param older_than: timestamp, default is now - `SPOOL_RETENTION`
+        :return: number of the removed events
+        """
+        if older_than is None:
+            older_than = time.time() - SPOOL_RETENTION
+        cursor = self.connection.execute(
+            "DELETE FROM events WHERE published_at IS NOT NULL AND received_at < ?",
+            (older_than,),
+        )
+        return cursor.rowcount
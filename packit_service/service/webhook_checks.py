@@ -0,0 +1,149 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Validation of the incoming webhooks shared by the Flask API and the ASGI front end.
+
+This module must not depend on Flask.
+"""
+
+import hmac
+from hashlib import sha1
+from logging import getLogger
+from typing import Mapping
+
+from packit_service.config import ServiceConfig
+
+logger = getLogger("packit_service")
+
+
+class ValidationFailed(Exception):
+    pass
+
+
+def is_ping(msg: dict) -> bool:
+    return all([msg.get("zen"), msg.get("hook_id"), msg.get("hook")])
+
+
+def validate_github_signature(
+    headers: Mapping[str, str], payload: bytes, config: ServiceConfig
+):
+    """
+    https://developer.github.com/webhooks/securing/#validating-payloads-from-github
+    https://developer.github.com/webhooks/#delivery-headers
+
+    :param headers: case-insensitive mapping of the request headers
+    :param payload: raw request body
+    :raises ValidationFailed
+    """
+    if "X-Hub-Signature" not in headers:
+        if config.validate_webhooks:
+            msg = "X-Hub-Signature not in request.headers"
+            logger.warning(msg)
+            raise ValidationFailed(msg)
+        else:
+            # don't validate signatures when testing locally
+            logger.debug("Ain't validating signatures.")
+            return
+
+    sig = headers["X-Hub-Signature"]
+    if not sig.startswith("sha1="):
+        msg = f"Digest mode in X-Hub-Signature {sig!r} is not sha1."
+        logger.warning(msg)
+        raise ValidationFailed(msg)
+
+    webhook_secret = config.webhook_secret.encode()
+    if not webhook_secret:
+        msg = "'webhook_secret' not specified in the config."
+        logger.error(msg)
+        raise ValidationFailed(msg)
+
+    signature = sig.split("=")[1]
+    mac = hmac.new(webhook_secret, msg=payload, digestmod=sha1)
+    digest_is_valid = hmac.compare_digest(signature, mac.hexdigest())
+    if digest_is_valid:
+        logger.debug("Payload signature OK.")
+    else:
+        msg = "Payload signature validation failed."
+        logger.warning(msg)
+        logger.debug(f"X-Hub-Signature: {sig!r} != computed: {mac.hexdigest()}")
+        raise ValidationFailed(msg)
+
+
+def is_github_event_interesting(headers: Mapping[str, str]) -> bool:
+    """
+    Check X-GitHub-Event header for events we know we give a f...
+    ...finely prepared response to.
+    :return: False if we are not interested in this kind of event
+    """
+    uninteresting_events = {
+        "integration_installation",
+        "integration_installation_repositories",
+    }
+    event_type = headers.get("X-GitHub-Event")
+    uuid = headers.get("X-GitHub-Delivery")
+    _interested = event_type not in uninteresting_events
+
+    logger.debug(f"{event_type} {uuid}{' (not interested)' if not _interested else ''}")
+    return _interested
+
+
+def validate_gitlab_token(headers: Mapping[str, str], config: ServiceConfig):
+    """
+    https://docs.gitlab.com/ee/user/project/integrations/webhooks.html#secret-token
+
+    :raises ValidationFailed
+    """
+    if "X-Gitlab-Token" not in headers:
+        if config.validate_webhooks:
+            msg = "X-Gitlab-Token not in request.headers"
+            logger.warning(msg)
+            raise ValidationFailed(msg)
+        else:
+            # don't validate signatures when testing locally
+            logger.debug("Ain't validating token.")
+            return
+
+    token = headers["X-Gitlab-Token"]
+
+    # Find a better solution
+    if token != config.gitlab_webhook_token:
+        raise ValidationFailed("Payload token validation failed.")
+
+    logger.debug("Payload token is OK.")
+
+
+def is_gitlab_event_interesting(headers: Mapping[str, str]) -> bool:
+    """
+    Check X-Gitlab-Event header for events we know we give a f...
+    ...finely prepared response to.
+    :return: False if we are not interested in this kind of event
+    """
+    interesting_events = {
+        "Note Hook",
+        "Merge Request Hook",
+    }
+    event_type = headers.get("X-Gitlab-Event")
+    _interested = event_type in interesting_events
+
+    logger.debug(f"{event_type} {' (not interested)' if not _interested else ''}")
+    return _interested
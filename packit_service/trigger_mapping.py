@@ -50,8 +50,20 @@ def is_trigger_matching_job_config(
     e.g. Both pr_comment and pull_request are compatible
          with the pull_request config in the config
     """
+    return is_trigger_matching_job_config_trigger(
+        trigger=trigger, job_config_trigger=job_config.trigger
+    )
+
+
+def is_trigger_matching_job_config_trigger(
+    trigger: TheJobTriggerType, job_config_trigger: JobConfigTriggerType
+) -> bool:
+    """
+    Same as `is_trigger_matching_job_config`,
+    but only the trigger of the job config is needed.
+    """
     config_trigger = MAP_JOB_TRIGGER_TO_JOB_CONFIG_TRIGGER_TYPE.get(trigger)
-    return bool(config_trigger and job_config.trigger == config_trigger)
+    return bool(config_trigger and job_config_trigger == config_trigger)
 
 
 def are_job_types_same(first: JobType, second: JobType) -> bool:
@@ -20,10 +20,10 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import logging
-from io import StringIO
 from pathlib import Path
 from typing import Union, List, Optional, Tuple, Set
 
+import git
 from kubernetes.client.rest import ApiException
 
 from ogr.abstract import GitProject, CommitStatus
@@ -47,7 +47,25 @@ from packit_service.trigger_mapping import (
     is_trigger_matching_job_config,
     are_job_types_same,
 )
+from packit_service.worker.build.local_srpm import (
+    LocalSRPMBuildError,
+    LocalSRPMBuildTimeout,
+    get_local_srpm_builder,
+)
+from packit_service.worker.build.log_capture import BoundedLogCapture
+# registered instead of the packit's sandcastle command handler,
+# leases the sandboxes for the SRPM creation from the pool
+from packit_service.worker.build.sandbox_pool import (  # noqa: F401
+    PooledSandcastleCommandHandler,
+)
+from packit_service.worker.build.srpm_cache import (
+    SRPMCache,
+    get_srpm_cache,
+    get_srpm_cache_key,
+)
+from packit_service.worker.git_mirror import GitMirrorCache
 from packit_service.worker.reporting import StatusReporter
+from packit_service.worker.workspace import empty_directory
 from sandcastle import SandcastleTimeoutReached
 
 logger = logging.getLogger(__name__)
@@ -95,6 +113,8 @@ class BaseBuildJobHelper:
         self._status_reporter: Optional[StatusReporter] = None
         self._test_check_names: Optional[List[str]] = None
         self._build_check_names: Optional[List[str]] = None
+        self._build_targets: Optional[Set[str]] = None
+        self._tests_targets: Optional[Set[str]] = None
         self._srpm_model: Optional[SRPMBuildModel] = None
         self._srpm_path: Optional[Path] = None
 
@@ -111,12 +131,37 @@ class BaseBuildJobHelper:
         if self._local_project is None:
             self._local_project = LocalProject(
                 git_project=self.project,
+                git_repo=self._clone_from_mirror(),
                 working_dir=self.config.command_handler_work_dir,
                 ref=self.event.git_ref,
                 pr_id=self.event.pr_id,
             )
         return self._local_project
 
+    def _clone_from_mirror(self) -> Optional[git.Repo]:
+        """
+        Clone the project using the git mirror cache (if configured).
+
+        :return: None if LocalProject should clone the project itself
+        """
+        if not self.config.git_mirror_cache_dir:
+            return None
+        mirror_cache = GitMirrorCache(
+            directory=self.config.git_mirror_cache_dir,
+            max_size=self.config.git_mirror_cache_max_size,
+        )
+        try:
+            return mirror_cache.clone(
+                url=self.project.get_git_urls()["git"],
+                working_dir=self.config.command_handler_work_dir,
+                pr_id=self.event.pr_id,
+            )
+        except Exception as ex:
+            logger.warning(f"Failed to clone the project using the mirror: {ex}")
+            # LocalProject clones into the same directory, it has to be empty
+            empty_directory(Path(self.config.command_handler_work_dir))
+            return None
+
     @property
     def api(self) -> PackitAPI:
         if not self._api:
@@ -327,26 +372,89 @@ class BaseBuildJobHelper:
         if not (self._srpm_path or self._srpm_model):
             self._create_srpm()
 
+    def _get_srpm_cache_key(self) -> Optional[str]:
+        commit_sha = self.event.commit_sha
+        if not commit_sha:
+            return None
+        return get_srpm_cache_key(
+            project_url=self.event.project_url,
+            commit_sha=commit_sha,
+            package_config=self.package_config,
+        )
+
+    def _use_cached_srpm(self, srpm_cache: SRPMCache, cache_key: str) -> bool:
+        """
+        Use the SRPM built for the same commit and config before.
+
+        :return: False on cache miss
+        """
+        srpm_path = srpm_cache.get(cache_key)
+        if not srpm_path:
+            return False
+        srpm_model = SRPMBuildModel.get_by_cache_key(cache_key)
+        if not srpm_model:
+            return False
+        logger.info(f"Using cached SRPM {srpm_path} (SRPM build {srpm_model.id}).")
+        self._srpm_path = srpm_path
+        self._srpm_model = srpm_model
+        return True
+
+    def _use_local_srpm_builder(self) -> bool:
+        """ SRPMs of the trusted projects are created locally, not in the sandbox. """
+        namespaces = self.config.local_srpm_namespaces
+        return bool(namespaces) and (
+            self.project.namespace in namespaces
+            or f"{self.project.namespace}/{self.project.repo}" in namespaces
+        )
+
+    def _create_srpm_locally(self, capture: BoundedLogCapture) -> Path:
+        working_dir = str(self.local_project.working_dir)
+        logger.info(
+            f"Creating SRPM of {self.project.namespace}/{self.project.repo} locally."
+        )
+        try:
+            srpm_path, logs = get_local_srpm_builder(self.config).create_srpm(
+                working_dir=working_dir,
+                package_config=self.package_config,
+                srpm_dir=working_dir,
+            )
+        except LocalSRPMBuildError as ex:
+            capture.write(ex.logs)
+            raise
+        capture.write(logs)
+        return srpm_path
+
     def _create_srpm(self):
+        srpm_cache = get_srpm_cache(
+            directory=self.config.srpm_cache_dir,
+            max_size=self.config.srpm_cache_max_size,
+        )
+        cache_key = self._get_srpm_cache_key() if srpm_cache else None
+        # skip cloning the repo and creating the sandbox if we can
+        if cache_key and self._use_cached_srpm(srpm_cache, cache_key):
+            return
+
         # we want to get packit logs from the SRPM creation process
-        # so we stuff them into a StringIO buffer
-        stream = StringIO()
-        handler = logging.StreamHandler(stream)
+        # so we collect them (bounded in size) from the packit logger
+        capture = BoundedLogCapture(max_size=self.config.srpm_log_max_size)
         packit_logger = logging.getLogger("packit")
         packit_logger.setLevel(logging.DEBUG)
-        packit_logger.addHandler(handler)
+        packit_logger.addHandler(capture)
         formatter = PackitFormatter(None, "%H:%M:%S")
-        handler.setFormatter(formatter)
+        capture.setFormatter(formatter)
 
         srpm_success = True
         exception: Optional[Exception] = None
         extra_logs: str = ""
 
         try:
-            self._srpm_path = Path(
-                self.api.create_srpm(srpm_dir=self.api.up.local_project.working_dir)
-            )
-        except SandcastleTimeoutReached as ex:
+            if self._use_local_srpm_builder():
+                self._srpm_path = self._create_srpm_locally(capture)
+            else:
+                self._srpm_path = Path(
+                    self.api.create_srpm(srpm_dir=self.api.up.local_project.working_dir)
+                )
+        except (SandcastleTimeoutReached, LocalSRPMBuildTimeout) as ex:
             exception = ex
             extra_logs = f"\nYou have reached 10-minute timeout while creating SRPM.\n"
         except ApiException as ex:
@@ -359,10 +467,8 @@ class BaseBuildJobHelper:
         except Exception as ex:
             exception = ex
 
-        # collect the logs now
-        packit_logger.removeHandler(handler)
-        stream.seek(0)
-        srpm_logs = stream.read()
+        # stop collecting the logs now
+        packit_logger.removeHandler(capture)
 
         if exception:
             logger.info(f"exception while running SRPM build: {exception}")
@@ -375,17 +481,29 @@ class BaseBuildJobHelper:
 
             # this needs to be done AFTER we gather logs
             # so that extra logs are after actual logs
-            srpm_logs += extra_logs
+            capture.write(extra_logs)
             if hasattr(exception, "output"):
                 output = getattr(exception, "output", "")  # mypy
-                srpm_logs += f"\nOutput of the command in the sandbox:\n{output}\n"
+                capture.write("\nOutput of the command in the sandbox:\n")
+                capture.write(f"{output}\n")
 
-            srpm_logs += (
+            capture.write(
                 f"\nMessage: {exception}\nException: {exception!r}\n{self.msg_retrigger}"
                 "\nPlease join the freenode IRC channel #packit for the latest info.\n"
             )
 
-        self._srpm_model = SRPMBuildModel.create(logs=srpm_logs, success=srpm_success)
+        if srpm_success and cache_key:
+            try:
+                self._srpm_path = srpm_cache.put(cache_key, self._srpm_path)
+            except OSError as ex:
+                logger.warning(f"Failed to store the SRPM to the cache: {ex}")
+                cache_key = None
+        else:
+            cache_key = None
+
+        self._srpm_model = SRPMBuildModel.create(
+            logs=capture.get_logs(), success=srpm_success, cache_key=cache_key
+        )
 
     def _report(
         self,
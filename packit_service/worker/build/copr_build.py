@@ -24,12 +24,13 @@ from typing import Union, Optional, Tuple, Set
 
 from ogr.abstract import GitProject, CommitStatus
 from packit.config import PackageConfig, JobType, JobConfig
-from packit.config.aliases import get_build_targets
 from packit.exceptions import PackitCoprException
 from packit_service import sentry_integration
 from packit_service.celerizer import celery_app
 from packit_service.config import ServiceConfig, Deployment
 from packit_service.constants import MSG_RETRIGGER
+from packit_service.copr_projects import known_copr_projects
+from packit_service.in_flight_builds import in_flight_copr_builds
 from packit_service.models import CoprBuildModel
 from packit_service.service.events import (
     PullRequestGithubEvent,
@@ -45,6 +46,9 @@ from packit_service.service.urls import (
     get_copr_build_log_url_from_flask,
 )
 from packit_service.worker.build.build_helper import BaseBuildJobHelper
+from packit_service.worker.build.srpm_cache import get_srpm_cache
+from packit_service.worker.build.srpm_upload import upload_srpm
+from packit_service.worker.build.targets import get_build_targets
 from packit_service.worker.result import HandlerResults
 
 logger = logging.getLogger(__name__)
@@ -118,7 +122,11 @@ class CoprBuildJobHelper(BaseBuildJobHelper):
         1. If the job is not defined, use the test chroots.
         2. If the job is defined without targets, use "fedora-stable".
         """
-        return get_build_targets(*self.configured_build_targets, default=None)
+        if self._build_targets is None:
+            self._build_targets = get_build_targets(
+                *self.configured_build_targets, default=None
+            )
+        return self._build_targets
 
     @property
     def tests_targets(self) -> Set[str]:
@@ -134,7 +142,11 @@ class CoprBuildJobHelper(BaseBuildJobHelper):
         1. use the build_targets if the job si configured
         2. use "fedora-stable" alias otherwise
         """
-        return get_build_targets(*self.configured_tests_targets, default=None)
+        if self._tests_targets is None:
+            self._tests_targets = get_build_targets(
+                *self.configured_tests_targets, default=None
+            )
+        return self._tests_targets
 
     def run_copr_build(self) -> HandlerResults:
 
@@ -172,18 +184,21 @@ class CoprBuildJobHelper(BaseBuildJobHelper):
             )
             return HandlerResults(success=False, details={"error": str(ex)})
 
-        for chroot in self.build_targets:
-            copr_build = CoprBuildModel.get_or_create(
-                build_id=str(build_id),
-                commit_sha=self.event.commit_sha,
-                project_name=self.job_project,
-                owner=self.job_owner,
-                web_url=web_url,
-                target=chroot,
-                status="pending",
-                srpm_build=self.srpm_model,
-                trigger_model=self.event.db_trigger,
-            )
+        # create the DB entries for all the chroots at once
+        # and report the statuses after that
+        copr_builds = CoprBuildModel.create_for_targets(
+            build_id=str(build_id),
+            targets=self.build_targets,
+            commit_sha=self.event.commit_sha,
+            project_name=self.job_project,
+            owner=self.job_owner,
+            web_url=web_url,
+            status="pending",
+            srpm_build=self.srpm_model,
+            trigger_model=self.event.db_trigger,
+        )
+        in_flight_copr_builds.add(build_id, copr_builds.keys())
+        for chroot, copr_build in copr_builds.items():
             url = get_copr_build_log_url_from_flask(id_=copr_build.id)
             self.report_status_to_all_for_chroot(
                 state=CommitStatus.pending,
@@ -201,6 +216,18 @@ class CoprBuildJobHelper(BaseBuildJobHelper):
 
         return HandlerResults(success=True, details={})
 
+    def _get_srpm_url(self) -> Optional[str]:
+        """ URL to download the SRPM from if it is in the published SRPM cache. """
+        if not self.config.srpm_cache_url:
+            return None
+        srpm_cache = get_srpm_cache(
+            directory=self.config.srpm_cache_dir,
+            max_size=self.config.srpm_cache_max_size,
+        )
+        if not srpm_cache:
+            return None
+        return srpm_cache.get_url(self.srpm_path, base_url=self.config.srpm_cache_url)
+
     def run_build(
         self, target: Optional[str] = None
     ) -> Tuple[Optional[int], Optional[str]]:
@@ -216,18 +243,38 @@ class CoprBuildJobHelper(BaseBuildJobHelper):
                 f"Copr owner not set. Use Copr config file or `--owner` when calling packit CLI."
             )
 
-        self.api.copr_helper.create_copr_project_if_not_exists(
-            project=self.job_project,
-            chroots=list(self.build_targets),
-            owner=owner,
-            description=None,
-            instructions=None,
-        )
+        chroots = list(self.build_targets)
+        # the project of e.g. a pull request is reused for every build,
+        # skip the check in Copr if it was already done with the same chroots
+        if known_copr_projects.is_known(owner, self.job_project, chroots):
+            logger.debug(f"Copr project {owner}/{self.job_project} is known.")
+        else:
+            self.api.copr_helper.create_copr_project_if_not_exists(
+                project=self.job_project,
+                chroots=chroots,
+                owner=owner,
+                description=None,
+                instructions=None,
+            )
+            known_copr_projects.add(owner, self.job_project, chroots)
         logger.debug(
             f"owner={owner}, project={self.job_project}, path={self.srpm_path}"
         )
 
-        build = self.api.copr_helper.copr_client.build_proxy.create_from_file(
-            ownername=owner, projectname=self.job_project, path=self.srpm_path
-        )
+        build_proxy = self.api.copr_helper.copr_client.build_proxy
+        srpm_url = self._get_srpm_url()
+        try:
+            if srpm_url:
+                logger.info(f"Copr downloads the SRPM from {srpm_url}.")
+                build = build_proxy.create_from_url(
+                    ownername=owner, projectname=self.job_project, url=srpm_url
+                )
+            else:
+                build = upload_srpm(
+                    build_proxy, owner, self.job_project, self.srpm_path
+                )
+        except Exception:
+            # e.g. the project was removed or changed in the meantime
+            known_copr_projects.invalidate(owner, self.job_project)
+            raise
         return build.id, self.api.copr_helper.copr_web_build_url(build)
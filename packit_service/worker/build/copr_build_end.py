@@ -0,0 +1,99 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Processing of the chroots of a Copr build collected by `CoprBuildEndHandler`
+(see `packit_service/copr_build_completions.py`).
+"""
+
+import copy
+import logging
+from typing import List, Optional
+
+from packit_service.config import ServiceConfig
+from packit_service.copr_build_completions import copr_build_completions
+from packit_service.service.events import CoprBuildEvent
+from packit_service.worker.handlers import CoprBuildEndHandler
+from packit_service.worker.jobs import get_config_for_handler_kls
+from packit_service.worker.result import HandlerResults
+
+logger = logging.getLogger(__name__)
+
+
+def get_chroot_events(event_dicts: List[dict]) -> List[CoprBuildEvent]:
+    """
+    Restore the events of the chroots of one build.
+
+    Only the first one is restored from scratch, the others are its copies
+    with the chroot data replaced, so the project, package config and DB trigger
+    are fetched once for the whole build. The copies share the DB build of the
+    first chroot: only its build-level data (trigger, commit) may be used,
+    the chroot ones are taken from the event.
+    """
+    first = CoprBuildEvent.from_dict(event_dicts[0])
+    if not first.build or not first.package_config:
+        return []
+    events = [first]
+    for event_dict in event_dicts[1:]:
+        event = copy.copy(first)
+        event.chroot = event_dict["chroot"]
+        event.status = event_dict["status"]
+        event.timestamp = event_dict["timestamp"]
+        event.build = first.build
+        events.append(event)
+    return events
+
+
+def process_queued_chroots(build_id: int) -> Optional[HandlerResults]:
+    """
+    Process the chroots of the build queued since the task was scheduled.
+
+    Used in the `task.process_copr_build_completions` task.
+
+    :param build_id: Copr build ID
+    :return: results of the handler, None if there was nothing to process
+    """
+    event_dicts = copr_build_completions.pop(build_id)
+    if not event_dicts:
+        logger.debug(f"No chroots of copr build {build_id} to process.")
+        return None
+
+    logger.info(f"Processing {len(event_dicts)} chroots of copr build {build_id}.")
+    events = get_chroot_events(event_dicts)
+    if not events:
+        logger.warning(f"Copr build {build_id} can't be processed.")
+        return None
+
+    job_configs = get_config_for_handler_kls(
+        handler_kls=CoprBuildEndHandler,
+        event=events[0],
+        package_config=events[0].package_config,
+    )
+    if not job_configs:
+        logger.debug(f"No job config for copr build {build_id}.")
+        return None
+
+    # the handler runs once per build, not once per job config
+    # as SteveJobs does, the second run would find the builds processed
+    return CoprBuildEndHandler(
+        ServiceConfig.get_service_config(), job_config=job_configs[0], event=events[0]
+    ).finish_chroots(events)
@@ -0,0 +1,347 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Babysitter of the Koji builds.
+
+We don't get any messages about the Koji builds we submit, so a single
+celery task (`task.babysit_koji_build`) polls the states of all the pending
+Koji tasks from the hub. The states are fetched in batches with one `multiCall`
+request per batch and the database and the commit statuses are updated
+only when the state of a task changes.
+
+The task reschedules itself while there are pending builds: the interval
+starts at `KOJI_BABYSIT_MIN_INTERVAL`, doubles up to `KOJI_BABYSIT_MAX_INTERVAL`
+while nothing changes (or the hub does not respond) and drops back
+to the minimum when any state changes.
+"""
+
+import logging
+import xmlrpc.client
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ogr.abstract import CommitStatus
+from redis import Redis
+
+from packit_service.celerizer import celery_app, get_redis
+from packit_service.config import ServiceConfig
+from packit_service.constants import KOJI_HUB_URL
+from packit_service.models import KojiBuildModel
+from packit_service.service.urls import get_koji_build_log_url_from_flask
+from packit_service.worker.reporting import StatusReporter
+
+logger = logging.getLogger(__name__)
+
+KOJI_BABYSIT_MIN_INTERVAL = 60
+KOJI_BABYSIT_MAX_INTERVAL = 15 * 60
+KOJI_MULTICALL_BATCH_SIZE = 100
+
+# set while a babysitter task is scheduled, so that we run only one of them
+KOJI_BABYSITTER_KEY = "packit-service:koji-babysitter"
+
+# koji.TASK_STATES
+KOJI_TASK_FREE = 0
+KOJI_TASK_OPEN = 1
+KOJI_TASK_CLOSED = 2
+KOJI_TASK_CANCELED = 3
+KOJI_TASK_ASSIGNED = 4
+KOJI_TASK_FAILED = 5
+
+# statuses of KojiBuildModel the babysitter watches
+KOJI_PENDING_STATUSES = ("pending", "running")
+
+# koji task state -> (KojiBuildModel.status, commit status, description)
+KOJI_TASK_STATE_MAP: Dict[int, Tuple[str, CommitStatus, str]] = {
+    KOJI_TASK_FREE: ("pending", CommitStatus.pending, "Building RPM ..."),
+    KOJI_TASK_ASSIGNED: ("pending", CommitStatus.pending, "Building RPM ..."),
+    KOJI_TASK_OPEN: ("running", CommitStatus.pending, "RPM build is in progress..."),
+    KOJI_TASK_CLOSED: (
+        "success",
+        CommitStatus.success,
+        "RPMs were built successfully.",
+    ),
+    KOJI_TASK_CANCELED: ("error", CommitStatus.error, "RPM build was canceled."),
+    KOJI_TASK_FAILED: ("failure", CommitStatus.failure, "RPMs failed to be built."),
+}
+
+
+class KojiHubError(Exception):
+    """ The hub did not respond or did not understand the request. """
+
+
+class KojiTaskPoller:
+    """ Get the info about many Koji tasks in a few `multiCall` requests. """
+
+    def __init__(
+        self,
+        hub_url: str = KOJI_HUB_URL,
+        batch_size: int = KOJI_MULTICALL_BATCH_SIZE,
+        proxy: Optional[xmlrpc.client.ServerProxy] = None,
+    ):
+        self.hub_url = hub_url
+        self.batch_size = batch_size
+        self._proxy = proxy
+
+    @property
+    def proxy(self) -> xmlrpc.client.ServerProxy:
+        if self._proxy is None:
+            self._proxy = xmlrpc.client.ServerProxy(
+                self.hub_url, allow_none=True, use_builtin_types=True
+            )
+        return self._proxy
+
+    def get_task_infos(self, task_ids: Iterable[int]) -> Dict[int, Optional[dict]]:
+        """
+        :return: task id -> result of `getTaskInfo`,
+                 None for the tasks the hub returned a fault for
+        :raises KojiHubError: when any of the batches failed as a whole
+        """
+        task_ids = list(dict.fromkeys(task_ids))
+        infos: Dict[int, Optional[dict]] = {}
+        for start in range(0, len(task_ids), self.batch_size):
+            batch = task_ids[start : start + self.batch_size]
+            calls = [
+                {"methodName": "getTaskInfo", "params": [task_id]} for task_id in batch
+            ]
+            try:
+                results = self.proxy.multiCall(calls)
+            except (xmlrpc.client.Error, OSError) as ex:
+                raise KojiHubError(f"multiCall failed: {ex}") from ex
+
+            for task_id, result in zip(batch, results):
+                # a one-item list with the result or a fault struct
+                if isinstance(result, list) and result and result[0]:
+                    infos[task_id] = result[0]
+                else:
+                    logger.warning(f"Failed to get the Koji task {task_id}: {result}")
+                    infos[task_id] = None
+        return infos
+
+
+def get_next_interval(interval: int, changed: bool) -> int:
+    """ Check again soon after a change, back off while nothing happens. """
+    if changed:
+        return KOJI_BABYSIT_MIN_INTERVAL
+    return min(max(interval, KOJI_BABYSIT_MIN_INTERVAL) * 2, KOJI_BABYSIT_MAX_INTERVAL)
+
+
+def get_pending_koji_builds() -> List[KojiBuildModel]:
+    return [
+        build
+        for status in KOJI_PENDING_STATUSES
+        for build in KojiBuildModel.get_all_by_status(status)
+    ]
+
+
+def get_task_id(build: KojiBuildModel) -> Optional[int]:
+    try:
+        return int(build.build_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def report_koji_build_status(
+    build: KojiBuildModel, state: CommitStatus, description: str
+) -> None:
+    # required to avoid circular imports
+    from packit_service.worker.build.koji_build import KojiBuildJobHelper
+
+    project_url = build.get_project().project_url
+    project = ServiceConfig.get_service_config().get_project(url=project_url)
+    StatusReporter(
+        project=project, commit_sha=build.commit_sha, pr_id=build.get_pr_id()
+    ).report(
+        state=state,
+        description=description,
+        url=get_koji_build_log_url_from_flask(build.id),
+        check_names=KojiBuildJobHelper.get_build_check(build.target),
+    )
+
+
+def update_koji_build(build: KojiBuildModel, task_info: Optional[dict]) -> bool:
+    """
+    Update the build and its commit status if the state of the task changed.
+
+    :param task_info: result of `getTaskInfo`, None if the hub does not know the task
+    :return: True if the build was updated
+    """
+    if task_info is None:
+        status, state, description = (
+            "error",
+            CommitStatus.error,
+            "Koji task was not found.",
+        )
+    else:
+        status, state, description = KOJI_TASK_STATE_MAP.get(
+            task_info.get("state"), KOJI_TASK_STATE_MAP[KOJI_TASK_FREE]
+        )
+        start_ts = task_info.get("start_ts")
+        if start_ts and not build.build_start_time:
+            build.set_start_time(datetime.utcfromtimestamp(start_ts))
+        completion_ts = task_info.get("completion_ts")
+        if completion_ts and status not in KOJI_PENDING_STATUSES:
+            build.set_end_time(datetime.utcfromtimestamp(completion_ts))
+
+    if status == build.status:
+        return False
+
+    logger.info(f"Koji build {build.build_id} ({build.target}): {status}.")
+    build.set_status(status)
+    try:
+        report_koji_build_status(build, state=state, description=description)
+    except Exception as ex:
+        # the status in the DB is what matters, don't poll the task again
+        logger.warning(f"Failed to report the status of {build}: {ex}")
+    return True
+
+
+def check_pending_koji_builds(
+    poller: Optional[KojiTaskPoller] = None,
+) -> Tuple[int, bool]:
+    """
+    Refresh the states of all the pending Koji builds.
+
+    :return: number of the builds still pending and whether any state changed
+    :raises KojiHubError: when the hub did not respond
+    """
+    poller = poller or KojiTaskPoller()
+    builds = []
+    for build in get_pending_koji_builds():
+        if get_task_id(build) is None:
+            logger.warning(f"{build} has no Koji task ID, marking as error.")
+            build.set_status("error")
+            continue
+        builds.append(build)
+    if not builds:
+        return 0, False
+
+    logger.debug(f"Checking {len(builds)} pending Koji builds.")
+    infos = poller.get_task_infos(get_task_id(build) for build in builds)
+
+    changed = False
+    still_pending = 0
+    for build in builds:
+        changed |= update_koji_build(build, infos.get(get_task_id(build)))
+        if build.status in KOJI_PENDING_STATUSES:
+            still_pending += 1
+    return still_pending, changed
+
+
+class KojiBabysitterSchedule:
+    """
+    Makes sure only one babysitter task is scheduled.
+
+    The key is set (with an expiration in case the task gets lost)
+    when the task is scheduled and removed when there are no pending builds.
+    A duplicate babysitter (e.g. when redis is not reachable)
+    only makes more requests to the hub.
+    """
+
+    def __init__(self, redis: Optional[Redis] = None):
+        self.redis = redis or get_redis()
+
+    def acquire(self, countdown: int) -> bool:
+        """ :return: True if no babysitter is scheduled and we should schedule one """
+        try:
+            return bool(
+                self.redis.set(
+                    KOJI_BABYSITTER_KEY, 1, nx=True, ex=self.get_expiration(countdown)
+                )
+            )
+        except Exception as ex:
+            logger.warning(f"Can't check the Koji babysitter schedule: {ex}")
+            return True
+
+    def extend(self, countdown: int) -> None:
+        try:
+            self.redis.set(KOJI_BABYSITTER_KEY, 1, ex=self.get_expiration(countdown))
+        except Exception as ex:
+            logger.warning(f"Can't extend the Koji babysitter schedule: {ex}")
+
+    def release(self) -> None:
+        try:
+            self.redis.delete(KOJI_BABYSITTER_KEY)
+        except Exception as ex:
+            logger.warning(f"Can't release the Koji babysitter schedule: {ex}")
+
+    @staticmethod
+    def get_expiration(countdown: int) -> int:
+        # the task can wait in the queue for a while
+        return countdown + 10 * 60
+
+
+koji_babysitter_schedule = KojiBabysitterSchedule()
+
+
+def send_babysit_task(countdown: int) -> None:
+    celery_app.send_task(
+        "task.babysit_koji_build", kwargs={"interval": countdown}, countdown=countdown
+    )
+
+
+def schedule_koji_babysitter(countdown: int = KOJI_BABYSIT_MIN_INTERVAL) -> bool:
+    """
+    Schedule the babysitter unless it's already scheduled.
+
+    :return: True if the task was sent
+    """
+    if not koji_babysitter_schedule.acquire(countdown):
+        logger.debug("Koji babysitter is already scheduled.")
+        return False
+    send_babysit_task(countdown)
+    return True
+
+
+def babysit_koji_builds(
+    interval: int = KOJI_BABYSIT_MIN_INTERVAL, poller: Optional[KojiTaskPoller] = None
+) -> Optional[int]:
+    """
+    One round of the babysitter, reschedules the task if needed.
+
+    :param interval: how long we waited since the previous round
+    :return: countdown of the next round, None if there is nothing to watch
+    """
+    schedule = koji_babysitter_schedule
+    try:
+        pending, changed = check_pending_koji_builds(poller)
+    except KojiHubError as ex:
+        logger.warning(f"Koji hub is not available: {ex}")
+        pending, changed = None, False
+    next_interval = get_next_interval(interval, changed=changed)
+
+    if pending == 0:
+        schedule.release()
+        # a build could have been submitted after we looked into the DB
+        # and not scheduled a babysitter because we were still there
+        if not get_pending_koji_builds() or not schedule.acquire(
+            KOJI_BABYSIT_MIN_INTERVAL
+        ):
+            logger.debug("No pending Koji builds.")
+            return None
+        next_interval = KOJI_BABYSIT_MIN_INTERVAL
+    else:
+        schedule.extend(next_interval)
+
+    logger.debug(f"Next check of the Koji builds in {next_interval}s.")
+    send_babysit_task(next_interval)
+    return next_interval
@@ -25,7 +25,6 @@ from typing import Optional, Union, Tuple, Dict, Set
 
 from ogr.abstract import CommitStatus, GitProject
 from packit.config import JobType, PackageConfig, JobConfig
-from packit.config.aliases import get_koji_targets, get_all_koji_targets
 from packit.exceptions import PackitCommandFailedError
 from packit_service import sentry_integration
 from packit_service.config import ServiceConfig
@@ -42,6 +41,8 @@ from packit_service.service.urls import (
     get_koji_build_log_url_from_flask,
 )
 from packit_service.worker.build.build_helper import BaseBuildJobHelper
+from packit_service.worker.build.koji_babysit import schedule_koji_babysitter
+from packit_service.worker.build.targets import get_koji_targets, get_all_koji_targets
 from packit_service.worker.result import HandlerResults
 
 logger = logging.getLogger(__name__)
@@ -86,7 +87,9 @@ class KojiBuildJobHelper(BaseBuildJobHelper):
         1. If the job is not defined, use the test chroots.
         2. If the job is defined without targets, use "fedora-stable".
         """
-        return get_koji_targets(*self.configured_build_targets)
+        if self._build_targets is None:
+            self._build_targets = get_koji_targets(*self.configured_build_targets)
+        return self._build_targets
 
     @property
     def tests_targets(self) -> Set[str]:
@@ -104,7 +107,9 @@ class KojiBuildJobHelper(BaseBuildJobHelper):
         1. use the build_targets if the job si configured
         2. use "fedora-stable" alias otherwise
         """
-        return get_koji_targets(*self.configured_tests_targets)
+        if self._tests_targets is None:
+            self._tests_targets = get_koji_targets(*self.configured_tests_targets)
+        return self._tests_targets
 
     @property
     def supported_koji_targets(self):
@@ -196,14 +201,7 @@ class KojiBuildJobHelper(BaseBuildJobHelper):
                 },
             )
 
-        # TODO: release the hounds!
-        """
-        celery_app.send_task(
-            "task.babysit_koji_build",
-            args=(build_metadata.build_id,),
-            countdown=120,  # do the first check in 120s
-        )
-        """
+        schedule_koji_babysitter()
 
         return HandlerResults(success=True, details={})
 
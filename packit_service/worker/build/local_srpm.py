@@ -0,0 +1,269 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Local SRPM builder for the trusted projects.
+
+Instead of starting a sandbox pod for every SRPM, the SRPMs of the trusted
+projects (`local_srpm_namespaces` of the service config) are created
+by a pool of pre-started worker processes of this module (with packit
+already imported). Every worker process:
+
+* has its memory and the size of the files it writes limited (rlimits),
+* runs every build with its own temporary home and temporary directory
+  which are removed afterwards,
+* is killed with all the processes it started (e.g. the `actions`
+  of the project) and replaced if the build does not finish in time.
+
+The parent and the worker exchange pickled requests and responses
+over the stdin/stdout of the worker.
+"""
+
+import logging
+import os
+import pickle
+import queue
+import resource
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Iterator, List, Optional, Tuple
+
+from packit.config import PackageConfig
+
+from packit_service.config import ServiceConfig
+
+logger = logging.getLogger(__name__)
+
+MEMORY_LIMIT = 4 * 1024 ** 3
+FILE_SIZE_LIMIT = 2 * 1024 ** 3
+# restart the worker process after this number of builds
+MAX_BUILDS_PER_WORKER = 100
+
+_builder: Optional["LocalSRPMBuilder"] = None
+_builder_lock = threading.Lock()
+
+
+class LocalSRPMBuildError(Exception):
+    """ The SRPM build failed in the worker process. """
+
+    def __init__(self, message: str, logs: str = ""):
+        super().__init__(message)
+        self.logs = logs
+
+
+class LocalSRPMBuildTimeout(LocalSRPMBuildError):
+    """ The worker did not finish the build in time and was killed. """
+
+
+def set_limits():
+    """ Called in the worker process before it accepts any request. """
+    resource.setrlimit(resource.RLIMIT_AS, (MEMORY_LIMIT, MEMORY_LIMIT))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (FILE_SIZE_LIMIT, FILE_SIZE_LIMIT))
+
+
+class WorkerProcess:
+    def __init__(self, command: Optional[List[str]] = None):
+        self.builds = 0
+        self.process = subprocess.Popen(
+            command or [sys.executable, "-m", __name__],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            # own process group, so that we can kill the whole build
+            start_new_session=True,
+        )
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def request(self, request: dict, timeout: float) -> dict:
+        pickle.dump(request, self.process.stdin)
+        self.process.stdin.flush()
+        self.builds += 1
+        # the response is written at once at the end of the build
+        readable, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not readable:
+            self.kill()
+            raise LocalSRPMBuildTimeout(
+                f"The SRPM build did not finish in {timeout}s."
+            )
+        try:
+            return pickle.load(self.process.stdout)
+        except EOFError:
+            self.kill()
+            raise LocalSRPMBuildError(
+                f"The SRPM build worker died (exit code {self.process.wait()})."
+            )
+
+    def kill(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            # the worker and all its children are gone already
+            pass
+        self.process.wait()
+        self.process.stdin.close()
+        self.process.stdout.close()
+
+
+class LocalSRPMBuilder:
+    def __init__(
+        self,
+        workers: int,
+        timeout: float,
+        max_log_size: int,
+        worker_command: Optional[List[str]] = None,
+    ):
+        """
+        :param workers: number of the worker processes (and concurrent builds)
+        :param timeout: seconds after which the build is killed
+        :param max_log_size: how many characters of the logs the worker returns
+        :param worker_command: command starting a worker, this module by default
+        """
+        self.timeout = timeout
+        self.max_log_size = max_log_size
+        self.worker_command = worker_command
+        self._idle: "queue.Queue[WorkerProcess]" = queue.Queue()
+        for _ in range(workers):
+            self._idle.put(WorkerProcess(worker_command))
+
+    @contextmanager
+    def _lease(self) -> Iterator[WorkerProcess]:
+        worker = self._idle.get()
+        if not worker.is_alive() or worker.builds >= MAX_BUILDS_PER_WORKER:
+            if worker.is_alive():
+                worker.kill()
+            worker = WorkerProcess(self.worker_command)
+        try:
+            yield worker
+        finally:
+            if not worker.is_alive():
+                worker = WorkerProcess(self.worker_command)
+            self._idle.put(worker)
+
+    def create_srpm(
+        self, working_dir: str, package_config: PackageConfig, srpm_dir: str
+    ) -> Tuple[Path, str]:
+        """
+        Create the SRPM from the prepared working directory.
+
+        :return: path to the SRPM and the packit logs of the build
+        :raises LocalSRPMBuildError: the build failed, the logs are in `output`
+        """
+        request = {
+            "working_dir": working_dir,
+            "package_config": package_config,
+            "srpm_dir": srpm_dir,
+            "max_log_size": self.max_log_size,
+        }
+        start = time.perf_counter()
+        with self._lease() as worker:
+            response = worker.request(request, timeout=self.timeout)
+        logger.info(f"Local SRPM build took {time.perf_counter() - start:.3f}s.")
+        if response.get("error"):
+            raise LocalSRPMBuildError(response["error"], logs=response["logs"])
+        return Path(response["srpm_path"]), response["logs"]
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get().kill()
+
+
+def get_local_srpm_builder(config: ServiceConfig) -> LocalSRPMBuilder:
+    """ Get the builder (with its worker processes) shared within this process. """
+    global _builder
+    with _builder_lock:
+        if _builder is None:
+            logger.info(
+                f"Starting {config.local_srpm_workers} local SRPM build workers."
+            )
+            _builder = LocalSRPMBuilder(
+                workers=config.local_srpm_workers,
+                timeout=config.local_srpm_timeout,
+                max_log_size=config.srpm_log_max_size,
+            )
+        return _builder
+
+
+def build_srpm(request: dict) -> dict:
+    """ Run in the worker process: build the SRPM and collect the packit logs. """
+    # imported in the worker only, once for all the builds
+    from packit.api import PackitAPI
+    from packit.config import RunCommandType
+    from packit.local_project import LocalProject
+    from packit.utils import PackitFormatter
+
+    from packit_service.worker.build.log_capture import BoundedLogCapture
+
+    capture = BoundedLogCapture(max_size=request["max_log_size"])
+    capture.setFormatter(PackitFormatter(None, "%H:%M:%S"))
+    packit_logger = logging.getLogger("packit")
+    packit_logger.setLevel(logging.DEBUG)
+    packit_logger.addHandler(capture)
+
+    environ = os.environ.copy()
+    try:
+        with TemporaryDirectory(prefix="srpm-build-") as tmp_dir:
+            os.environ.update({"HOME": tmp_dir, "TMPDIR": tmp_dir})
+            config = ServiceConfig()
+            config.command_handler = RunCommandType.local
+            config.command_handler_work_dir = request["working_dir"]
+            api = PackitAPI(
+                config,
+                request["package_config"],
+                LocalProject(working_dir=request["working_dir"]),
+            )
+            srpm_path = api.create_srpm(srpm_dir=request["srpm_dir"])
+        return {"srpm_path": str(srpm_path), "logs": capture.get_logs()}
+    except Exception as ex:
+        logger.debug(f"SRPM build failed: {ex!r}")
+        return {"error": str(ex), "logs": capture.get_logs()}
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+        packit_logger.removeHandler(capture)
+
+
+def main():
+    set_limits()
+    # keep the stdout for the responses only,
+    # everything else printed (e.g. by the commands) goes to stderr
+    responses = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    requests = sys.stdin.buffer
+    while True:
+        try:
+            request = pickle.load(requests)
+        except EOFError:
+            # the parent is gone
+            return
+        pickle.dump(build_srpm(request), responses)
+        responses.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+import threading
+from collections import deque
+from typing import Deque, List, Optional
+
+TRUNCATION_MARKER = "\n[... {size} characters were truncated ...]\n"
+
+
+class BoundedLogCapture(logging.Handler):
+    """
+    Logging handler collecting the logs of one task, e.g. of the SRPM build.
+
+    * Only the records logged from the thread which created the handler
+      are collected so that the handlers running concurrently
+      don't get each other's logs.
+    * At most `max_size` characters are kept: the beginning of the logs (a quarter)
+      and the end of the logs, the middle is replaced by a truncation marker.
+      The memory used does not depend on how verbose the build is.
+    """
+
+    def __init__(self, max_size: int, level=logging.NOTSET):
+        super().__init__(level=level)
+        self.thread_id: Optional[int] = threading.get_ident()
+        self.head_size = max_size // 4
+        self.tail_size = max_size - self.head_size
+        self._head: List[str] = []
+        self._head_length = 0
+        self._tail: Deque[str] = deque()
+        self._tail_length = 0
+        self.truncated = 0
+        self.addFilter(self._is_from_our_thread)
+
+    def _is_from_our_thread(self, record: logging.LogRecord) -> bool:
+        return self.thread_id is None or record.thread == self.thread_id
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.write(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def write(self, text: str):
+        """ Add text to the logs, e.g. output of a command. """
+        with self.lock:
+            if self._head_length < self.head_size:
+                chunk = text[: self.head_size - self._head_length]
+                self._head.append(chunk)
+                self._head_length += len(chunk)
+                text = text[len(chunk) :]
+            if not text:
+                return
+
+            if len(text) > self.tail_size:
+                self.truncated += len(text) - self.tail_size
+                text = text[-self.tail_size :]
+            self._tail.append(text)
+            self._tail_length += len(text)
+            while self._tail_length > self.tail_size:
+                overflow = self._tail_length - self.tail_size
+                oldest = self._tail[0]
+                if len(oldest) <= overflow:
+                    self._tail.popleft()
+                    self._tail_length -= len(oldest)
+                    self.truncated += len(oldest)
+                else:
+                    self._tail[0] = oldest[overflow:]
+                    self._tail_length -= overflow
+                    self.truncated += overflow
+
+    def get_logs(self) -> str:
+        with self.lock:
+            marker = (
+                TRUNCATION_MARKER.format(size=self.truncated) if self.truncated else ""
+            )
+            return "".join(self._head) + marker + "".join(self._tail)
@@ -0,0 +1,489 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Pool of pre-warmed sandbox pods for the SRPM creation.
+
+Starting a new pod (scheduling, pulling the image) takes most of the time
+of the SRPM creation, so we keep a few running pods per image
+and lease them to the command handler. After the lease, the pod is reset
+(the processes of the lease are killed, the working directory, $HOME
+and the temporary directories are emptied) and returned to the pool
+in the background. The pods are leased to any project, so pods which
+failed, could not be reset or were used `MAX_LEASES` times are deleted instead.
+
+The number of the warm pods follows the number of the waiting tasks,
+between `sandbox_pool_size` and `sandbox_pool_max_size` of the service config.
+Every celery worker process has its own pool, so a worker with concurrency N
+keeps N times `sandbox_pool_size` warm pods.
+
+The pools are closed (their pods deleted) when the worker process exits.
+The pods are labeled with the worker pod and process owning them, so the pods
+of the processes which did not close their pools (e.g. killed ones)
+are deleted when the next process of the same worker creates its pool.
+"""
+
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Union
+
+from celery.signals import worker_process_shutdown
+from packit.command_handler import SandcastleCommandHandler, add_run_command
+from redis import Redis
+
+from packit_service.celerizer import get_redis_url
+from packit_service.config import ServiceConfig
+from packit_service.constants import SANDCASTLE_WORK_DIR
+
+logger = logging.getLogger(__name__)
+
+# recycle the pod after this number of leases
+MAX_LEASES = 20
+# the default queue of the celery workers
+CELERY_QUEUE_NAME = "celery"
+# labels of the pods: the worker pod and the process of the pool
+POOL_WORKER_LABEL = "packit.dev/sandbox-pool-worker"
+POOL_PID_LABEL = "packit.dev/sandbox-pool-pid"
+# directories written by the commands of a lease (besides the working directory)
+RESET_DIRS = ("$HOME", "/tmp", "/var/tmp")
+# kill everything but the pod's main process and this script, empty the dirs
+# and fail if something survived, the pod is deleted then
+# (no subshells while looking for the processes, they would find themselves)
+RESET_SCRIPT = """
+find_other_processes() {{
+    others=""
+    for proc in /proc/[0-9]*; do
+        pid=${{proc#/proc/}}
+        [ "$pid" = 1 ] || [ "$pid" = $$ ] && continue
+        read -r stat 2>/dev/null <"$proc/stat" || continue
+        state=${{stat##*) }}
+        # zombies are dead already, just not reaped by the main process
+        [ "${{state%% *}}" = Z ] || others="$others $pid"
+    done
+}}
+for attempt in 1 2 3 4 5 6 7 8 9 10; do
+    find_other_processes
+    [ -z "$others" ] && break
+    kill -9 $others 2>/dev/null
+    sleep 0.1
+done
+find_other_processes
+if [ -n "$others" ]; then
+    echo "Processes$others survived the reset." >&2
+    exit 1
+fi
+[ "$HOME" != / ] || {{ echo "HOME is /, refusing to clear it." >&2; exit 1; }}
+for dir in {dirs}; do
+    rm -rf "$dir"/* "$dir"/.[!.]* "$dir"/..?* || exit 1
+    if [ -n "$(ls -A "$dir")" ]; then
+        echo "$dir is not empty after the reset." >&2
+        exit 1
+    fi
+done
+"""
+
+_pools: Dict[str, "SandboxPool"] = {}
+_pools_lock = threading.Lock()
+
+
+def get_worker_name() -> str:
+    """ Name of the worker pod (the hostname is stable in the stateful set). """
+    # label values are limited to 63 characters
+    return socket.gethostname()[:63]
+
+
+def is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SandcastleBackend:
+    """
+    Creates, resets and deletes the sandcastle pods of one image.
+
+    The pods are started with a mapped dir in `path`,
+    its local counterpart is set for every lease.
+    """
+
+    def __init__(
+        self,
+        image_reference: str,
+        k8s_namespace_name: str,
+        path: str = SANDCASTLE_WORK_DIR,
+    ):
+        self.image_reference = image_reference
+        self.k8s_namespace_name = k8s_namespace_name
+        self.path = path
+
+    def create(self):
+        # sandcastle depends on the kubernetes client, import only when needed
+        from sandcastle.api import Sandcastle, MappedDir
+
+        sandcastle = Sandcastle(
+            image_reference=self.image_reference,
+            k8s_namespace_name=self.k8s_namespace_name,
+            # the local dir is set for every lease, it's only copied by `exec`
+            mapped_dir=MappedDir(
+                local_dir=self.path, path=self.path, with_interim_pvc=True
+            ),
+        )
+        create_pod_manifest = sandcastle.create_pod_manifest
+
+        def create_labeled_pod_manifest(command=None) -> dict:
+            manifest = create_pod_manifest(command)
+            manifest["metadata"]["labels"] = self.get_labels()
+            return manifest
+
+        # sandcastle can't label the pod
+        sandcastle.create_pod_manifest = create_labeled_pod_manifest
+        sandcastle.run()
+        return sandcastle
+
+    @staticmethod
+    def get_labels() -> Dict[str, str]:
+        return {POOL_WORKER_LABEL: get_worker_name(), POOL_PID_LABEL: str(os.getpid())}
+
+    def delete_orphans(self) -> None:
+        """
+        Delete the pods (and their volume claims) of the pools of the processes
+        of this worker which are not running anymore.
+        """
+        from kubernetes.client import V1DeleteOptions
+        from kubernetes.client.rest import ApiException
+        from sandcastle.api import Sandcastle
+
+        api = Sandcastle.get_api_client()
+        pods = api.list_namespaced_pod(
+            self.k8s_namespace_name,
+            label_selector=f"{POOL_WORKER_LABEL}={get_worker_name()}",
+        ).items
+        for pod in pods:
+            if is_process_alive(int(pod.metadata.labels[POOL_PID_LABEL])):
+                continue
+            logger.info(f"Deleting the orphaned sandbox {pod.metadata.name}.")
+            claims = [
+                volume.persistent_volume_claim.claim_name
+                for volume in pod.spec.volumes or []
+                if volume.persistent_volume_claim
+            ]
+            try:
+                api.delete_namespaced_pod(
+                    pod.metadata.name, self.k8s_namespace_name, body=V1DeleteOptions()
+                )
+                for claim in claims:
+                    api.delete_namespaced_persistent_volume_claim(
+                        claim, self.k8s_namespace_name, body=V1DeleteOptions()
+                    )
+            except ApiException as ex:
+                # deleted by another process of the worker in the meantime
+                if ex.status != 404:
+                    raise
+
+    def get_reset_script(self) -> str:
+        dirs = " ".join(f'"{dir_}"' for dir_ in (self.path, *RESET_DIRS))
+        return RESET_SCRIPT.format(dirs=dirs)
+
+    def reset(self, sandcastle) -> None:
+        """
+        Remove everything the previous lease left in the pod
+        (the next lease can be for another project).
+
+        :raises Exception: when the pod can't be reset, it needs to be deleted then
+        """
+        # run directly, not from a script in the mapped dir which is emptied
+        mapped_dir, sandcastle.mapped_dir = sandcastle.mapped_dir, None
+        try:
+            sandcastle.exec(command=["bash", "-c", self.get_reset_script()])
+        finally:
+            sandcastle.mapped_dir = mapped_dir
+
+    def delete(self, sandcastle) -> None:
+        sandcastle.delete_pod()
+
+
+class SandboxPool:
+    def __init__(
+        self,
+        backend: Any,
+        min_size: int,
+        max_size: int,
+        get_queue_depth: Callable[[], int] = lambda: 0,
+        max_leases: int = MAX_LEASES,
+    ):
+        """
+        :param backend: object with `create()`, `reset(sandbox)` and `delete(sandbox)`
+        :param min_size: number of the pods kept warm
+        :param max_size: maximum number of the pods (including the leased ones)
+        :param get_queue_depth: number of the tasks waiting for a worker
+        :param max_leases: number of leases after which the pod is deleted
+        """
+        self.backend = backend
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self.get_queue_depth = get_queue_depth
+        self.max_leases = max_leases
+
+        self._idle: Deque[Any] = deque()
+        self._leases: Dict[int, int] = {}  # id of the sandbox -> number of leases
+        self._size = 0  # idle, leased and being created/reset
+        self._leased = 0
+        self._lock = threading.Lock()
+        # creates and resets the pods in the background
+        self._maintenance = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="sandbox-pool"
+        )
+
+        self.lease_count = 0
+        self.hit_count = 0
+        self.wait_time = 0.0
+
+    def get_target_size(self) -> int:
+        try:
+            queue_depth = self.get_queue_depth()
+        except Exception as ex:
+            logger.debug(f"Can't get the queue depth: {ex}")
+            queue_depth = 0
+        return min(self.max_size, max(self.min_size, self._leased + queue_depth))
+
+    @contextmanager
+    def lease(self) -> Iterator[Any]:
+        """
+        Get a running sandbox: a warm one from the pool if there is any,
+        a new one otherwise.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            sandbox = self._idle.popleft() if self._idle else None
+            hit = sandbox is not None
+            if not hit:
+                self._size += 1
+            self._leased += 1
+        try:
+            if not hit:
+                sandbox = self.backend.create()
+                self._leases[id(sandbox)] = 0
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._leased -= 1
+            raise
+        self._record_lease(hit, time.perf_counter() - start)
+        self.replenish()
+
+        healthy = False
+        try:
+            yield sandbox
+            healthy = True
+        finally:
+            with self._lock:
+                self._leased -= 1
+            self._leases[id(sandbox)] += 1
+            self._maintenance.submit(self._return, sandbox, healthy)
+
+    def _record_lease(self, hit: bool, wait_time: float) -> None:
+        with self._lock:
+            self.lease_count += 1
+            self.hit_count += hit
+            self.wait_time += wait_time
+        logger.info(
+            f"Sandbox leased in {wait_time:.3f}s ({'warm' if hit else 'new'}), "
+            f"pool hit rate {self.hit_count / self.lease_count:.0%}."
+        )
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "leases": self.lease_count,
+                "hits": self.hit_count,
+                "hit_rate": self.hit_count / self.lease_count
+                if self.lease_count
+                else 0.0,
+                "average_wait_time": self.wait_time / self.lease_count
+                if self.lease_count
+                else 0.0,
+                "size": self._size,
+                "idle": len(self._idle),
+            }
+
+    def replenish(self) -> None:
+        """ Start creating the pods in the background to reach the target size. """
+        with self._lock:
+            missing = self.get_target_size() - self._size
+            if missing <= 0:
+                return
+            self._size += missing
+        for _ in range(missing):
+            self._maintenance.submit(self._add)
+
+    def _add(self) -> None:
+        try:
+            sandbox = self.backend.create()
+        except Exception as ex:
+            logger.warning(f"Failed to create a sandbox for the pool: {ex}")
+            with self._lock:
+                self._size -= 1
+            return
+        self._leases[id(sandbox)] = 0
+        with self._lock:
+            self._idle.append(sandbox)
+
+    def _return(self, sandbox, healthy: bool) -> None:
+        recycle = (
+            not healthy
+            or self._leases[id(sandbox)] >= self.max_leases
+            or self._size > self.get_target_size()
+        )
+        if not recycle:
+            try:
+                self.backend.reset(sandbox)
+            except Exception as ex:
+                logger.warning(f"Failed to reset the sandbox: {ex}")
+                recycle = True
+        if recycle:
+            self._delete(sandbox)
+            self.replenish()
+            return
+        with self._lock:
+            self._idle.append(sandbox)
+
+    def _delete(self, sandbox) -> None:
+        with self._lock:
+            self._size -= 1
+        self._leases.pop(id(sandbox), None)
+        try:
+            self.backend.delete(sandbox)
+        except Exception as ex:
+            logger.warning(f"Failed to delete the sandbox: {ex}")
+
+    def close(self) -> None:
+        """ Delete the idle pods, wait for the ones being returned. """
+        self._maintenance.shutdown(wait=True)
+        with self._lock:
+            idle: List[Any] = list(self._idle)
+            self._idle.clear()
+        for sandbox in idle:
+            self._delete(sandbox)
+
+
+def get_celery_queue_depth() -> int:
+    return Redis.from_url(get_redis_url()).llen(CELERY_QUEUE_NAME)
+
+
+def get_sandbox_pool(config: ServiceConfig) -> Optional[SandboxPool]:
+    """
+    Get the pool shared within this process for the sandbox image from the config.
+
+    The pool belongs to the worker process: with the celery concurrency N,
+    there are N pools (and N times `sandbox_pool_size` warm pods).
+
+    :return: None if the pool is disabled
+    """
+    if not config.sandbox_pool_size:
+        return None
+    image = config.command_handler_image_reference
+    pool = _pools.get(image)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(image)
+            if pool is None:
+                logger.info(f"Creating a pool of sandboxes of {image}.")
+                backend = SandcastleBackend(
+                    image_reference=image,
+                    k8s_namespace_name=config.command_handler_k8s_namespace,
+                )
+                try:
+                    backend.delete_orphans()
+                except Exception as ex:
+                    logger.warning(f"Failed to delete the orphaned sandboxes: {ex}")
+                pool = _pools[image] = SandboxPool(
+                    backend=backend,
+                    min_size=config.sandbox_pool_size,
+                    max_size=config.sandbox_pool_max_size,
+                    get_queue_depth=get_celery_queue_depth,
+                )
+                pool.replenish()
+    return pool
+
+
+@worker_process_shutdown.connect
+def close_sandbox_pools(**kwargs) -> None:
+    """
+    Delete the pods of all the pools, the worker process exits.
+
+    The pool processes of celery exit via `os._exit`, without the atexit handlers.
+    """
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+# e.g. the solo pool, which runs the tasks in the main process
+atexit.register(close_sandbox_pools)
+
+
+@add_run_command
+class PooledSandcastleCommandHandler(SandcastleCommandHandler):
+    """
+    Runs the commands in a sandbox leased from the pool
+    (replaces the packit's sandcastle command handler).
+
+    Falls back to a new sandbox if the pool is disabled
+    or the command needs something the warm pods can't provide
+    (environment variables or a different directory).
+    """
+
+    def run_command(
+        self,
+        command: List[str],
+        return_output: bool = True,
+        env: Optional[Dict] = None,
+        cwd: Union[str, Path] = None,
+        shell: bool = True,
+    ):
+        pool = get_sandbox_pool(self.config)
+        if not pool or env or cwd:
+            return super().run_command(
+                command=command,
+                return_output=return_output,
+                env=env,
+                cwd=cwd,
+                shell=shell,
+            )
+
+        with pool.lease() as sandcastle:
+            sandcastle.mapped_dir.local_dir = self.local_project.working_dir
+            logger.info(f"Running command: {' '.join(command)}")
+            out = sandcastle.exec(command=command)
+        return out if return_output else None
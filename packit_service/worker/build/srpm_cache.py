@@ -0,0 +1,191 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Content-addressed cache of the built SRPMs.
+
+A retrigger of the build or Copr and Koji jobs for the same commit
+produce the same SRPM, the cache lets us skip cloning the repository
+and creating the SRPM in the sandbox.
+
+The cache lives in a directory (ideally on a persistent volume):
+
+    <cache_dir>/<key[:2]>/<key>/<name>.src.rpm
+"""
+
+import enum
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from tempfile import mkdtemp
+from typing import Any, Optional
+
+from packit.config import PackageConfig
+
+logger = logging.getLogger(__name__)
+
+# entries used more recently are not evicted, another worker can be using them
+# (in seconds)
+EVICTION_GRACE_PERIOD = 10 * 60
+
+# package config fields which can change the SRPM
+SRPM_PACKAGE_CONFIG_FIELDS = (
+    "specfile_path",
+    "synced_files",
+    "upstream_project_url",
+    "upstream_package_name",
+    "downstream_package_name",
+    "upstream_ref",
+    "upstream_tag_template",
+    "create_tarball_command",
+    "current_version_command",
+    "actions",
+    "spec_source_id",
+    "patch_generation_ignore_paths",
+)
+
+
+def to_primitive(value: Any) -> Any:
+    """ Convert the value to something json.dumps can represent stably. """
+    if isinstance(value, enum.Enum):
+        return to_primitive(value.value)
+    if isinstance(value, dict):
+        return {str(to_primitive(k)): to_primitive(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_primitive(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(str(to_primitive(item)) for item in value)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if hasattr(value, "__dict__"):
+        return to_primitive(vars(value))
+    return str(value)
+
+
+def get_srpm_cache_key(
+    project_url: str, commit_sha: str, package_config: PackageConfig
+) -> str:
+    relevant_config = {
+        field: to_primitive(getattr(package_config, field, None))
+        for field in SRPM_PACKAGE_CONFIG_FIELDS
+    }
+    content = json.dumps(
+        {
+            "project_url": project_url,
+            "commit_sha": commit_sha,
+            "package_config": relevant_config,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class SRPMCache:
+    def __init__(self, directory: str, max_size: int):
+        """
+        :param directory: where to store the SRPMs
+        :param max_size: max size of the cache in bytes,
+                         the least recently used SRPMs are removed above it
+        """
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    def _get_entry_dir(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def get(self, key: str) -> Optional[Path]:
+        """ Path to the cached SRPM or None. """
+        entry_dir = self._get_entry_dir(key)
+        srpms = list(entry_dir.glob("*.src.rpm")) if entry_dir.is_dir() else []
+        if not srpms:
+            return None
+        try:
+            # for the LRU eviction
+            os.utime(entry_dir)
+        except FileNotFoundError:
+            # evicted by another worker meanwhile
+            return None
+        return srpms[0]
+
+    def put(self, key: str, srpm_path: Path) -> Path:
+        """ Copy the SRPM to the cache, return the path of the cached SRPM. """
+        entry_dir = self._get_entry_dir(key)
+        entry_dir.parent.mkdir(parents=True, exist_ok=True)
+
+        # copy aside and rename so that nobody sees a partially copied SRPM
+        tmp_dir = Path(mkdtemp(dir=entry_dir.parent, prefix=f".{key}-"))
+        shutil.copy2(srpm_path, tmp_dir / srpm_path.name)
+        try:
+            tmp_dir.rename(entry_dir)
+        except OSError:
+            # somebody else cached the same SRPM in the meantime
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.evict()
+        return self.get(key) or srpm_path
+
+    def get_url(self, srpm_path: Path, base_url: str) -> Optional[str]:
+        """
+        URL of the cached SRPM if the cache directory is published on `base_url`.
+
+        :return: None if the SRPM is not in the cache
+        """
+        try:
+            relative_path = Path(srpm_path).relative_to(self.directory)
+        except ValueError:
+            return None
+        return f"{base_url.rstrip('/')}/{relative_path.as_posix()}"
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used SRPMs until the cache fits the size.
+
+        Several workers can evict at the same time: the entries removed
+        by the others are skipped and the recently used ones are kept.
+        """
+        entries = []
+        total_size = 0
+        for entry_dir in self.directory.glob("??/*"):
+            if entry_dir.name.startswith("."):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in entry_dir.iterdir())
+                entries.append((entry_dir.stat().st_mtime, size, entry_dir))
+            except FileNotFoundError:
+                continue
+            total_size += size
+
+        used_recently = time.time() - EVICTION_GRACE_PERIOD
+        for mtime, size, entry_dir in sorted(entries):
+            if total_size <= self.max_size or mtime > used_recently:
+                break
+            logger.debug(f"Removing {entry_dir} from the SRPM cache.")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
+
+
+def get_srpm_cache(directory: Optional[str], max_size: int) -> Optional[SRPMCache]:
+    return SRPMCache(directory, max_size) if directory else None
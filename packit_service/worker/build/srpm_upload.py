@@ -0,0 +1,113 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Upload of the SRPMs to Copr.
+
+The copr client streams the file (it is never loaded to the memory as a whole),
+we add logging of the progress and retries with a backoff
+for the transient (network) errors. Copr can't resume an upload,
+so every attempt sends the whole file again.
+"""
+
+import logging
+import time
+from pathlib import Path
+from typing import Any, Union
+
+import requests
+from copr.v3 import CoprException, CoprRequestException
+from copr.v3.exceptions import CoprTimeoutException
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_ATTEMPTS = 5
+# seconds to wait before the second attempt, doubled for every next one
+UPLOAD_BACKOFF = 10
+# log the progress every this many percent
+PROGRESS_STEP = 10
+
+
+class UploadProgress:
+    """ Progress callback of the copr client, logs every `PROGRESS_STEP` percent. """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.logged_percent = 0
+
+    def __call__(self, monitor) -> None:
+        # monitor.len is the size of the whole request body
+        percent = 100 * monitor.bytes_read // max(monitor.len, 1)
+        if percent >= self.logged_percent + PROGRESS_STEP:
+            self.logged_percent = percent - percent % PROGRESS_STEP
+            logger.debug(
+                f"Uploading {self.name}: {self.logged_percent}% "
+                f"({monitor.bytes_read}/{monitor.len} B)."
+            )
+
+
+def is_transient(ex: Exception) -> bool:
+    """ Connection problems and server errors, not the rejections by Copr. """
+    if isinstance(ex, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if not isinstance(ex, CoprException):
+        return False
+    response = ex.result.get("__response__")
+    if response is not None:
+        # e.g. CoprTimeoutException for the 504 Gateway Timeout of a long upload
+        return response.status_code >= 500
+    # no response at all (the client gave up connecting)
+    return isinstance(ex, (CoprRequestException, CoprTimeoutException))
+
+
+def upload_srpm(
+    build_proxy, owner: str, project: str, srpm_path: Union[str, Path]
+) -> Any:
+    """
+    Create a Copr build from the local SRPM.
+
+    :return: the created build
+    """
+    srpm_path = Path(srpm_path)
+    for attempt in range(1, UPLOAD_ATTEMPTS + 1):
+        start = time.perf_counter()
+        try:
+            build = build_proxy.create_from_file(
+                ownername=owner,
+                projectname=project,
+                path=str(srpm_path),
+                buildopts={"progress_callback": UploadProgress(srpm_path.name)},
+            )
+        except Exception as ex:
+            if attempt == UPLOAD_ATTEMPTS or not is_transient(ex):
+                raise
+            delay = UPLOAD_BACKOFF * 2 ** (attempt - 1)
+            logger.warning(
+                f"Upload of {srpm_path.name} to Copr failed ({ex}), "
+                f"retrying in {delay}s."
+            )
+            time.sleep(delay)
+            continue
+        logger.info(
+            f"{srpm_path.name} uploaded to Copr "
+            f"in {time.perf_counter() - start:.1f}s (attempt {attempt})."
+        )
+        return build
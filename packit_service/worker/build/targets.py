@@ -0,0 +1,142 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Process-wide caches of the build targets.
+
+`packit.config.aliases.get_all_koji_targets` runs `koji list-targets`,
+we run it once per process and refresh the list in the background
+every `KOJI_TARGETS_REFRESH_INTERVAL` seconds, the jobs get the last known list.
+
+The alias expansion (`get_build_targets`, `get_koji_targets`) depends only
+on the static alias table from packit, so its results are memoized.
+"""
+
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from packit.config import aliases
+
+logger = logging.getLogger(__name__)
+
+KOJI_TARGETS_REFRESH_INTERVAL = 60 * 60
+
+
+class KojiTargetsCache:
+    """
+    List of the Koji targets, refreshed in a background thread once it's stale.
+
+    Only the first call blocks, later ones return the cached list
+    (the old one while it's being refreshed or when the refresh failed).
+    """
+
+    def __init__(
+        self,
+        refresh_interval: int = KOJI_TARGETS_REFRESH_INTERVAL,
+        fetch: Callable[[], List[str]] = None,
+    ):
+        self.refresh_interval = refresh_interval
+        self.fetch = fetch or aliases.get_all_koji_targets
+        self._targets: Optional[List[str]] = None
+        self._fetched_at: float = 0.0
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    @property
+    def is_stale(self) -> bool:
+        return time.monotonic() - self._fetched_at > self.refresh_interval
+
+    def get(self) -> List[str]:
+        with self._lock:
+            if self._targets is None:
+                self._refresh()
+            elif self.is_stale and not self.is_refreshing:
+                self._refresh_thread = threading.Thread(
+                    target=self.refresh, name="koji-targets-refresh", daemon=True
+                )
+                self._refresh_thread.start()
+            return self._targets
+
+    @property
+    def is_refreshing(self) -> bool:
+        return self._refresh_thread is not None and self._refresh_thread.is_alive()
+
+    def refresh(self) -> None:
+        try:
+            targets = self.fetch()
+        except Exception as ex:
+            logger.warning(f"Failed to refresh the Koji targets: {ex}")
+            return
+        with self._lock:
+            self._targets, self._fetched_at = targets, time.monotonic()
+        logger.debug(f"Koji targets refreshed: {len(targets)} targets.")
+
+    def _refresh(self) -> None:
+        """ The first fetch, the exception goes to the caller. """
+        self._targets, self._fetched_at = self.fetch(), time.monotonic()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._targets = None
+
+
+_koji_targets_cache: Optional[KojiTargetsCache] = None
+
+
+def get_koji_targets_cache() -> KojiTargetsCache:
+    global _koji_targets_cache
+    if _koji_targets_cache is None:
+        _koji_targets_cache = KojiTargetsCache()
+    return _koji_targets_cache
+
+
+def get_all_koji_targets() -> List[str]:
+    """ Cached `packit.config.aliases.get_all_koji_targets`. """
+    return get_koji_targets_cache().get()
+
+
+def _get_key(names: Iterable[str]) -> Tuple[str, ...]:
+    # the helpers give us sets, the order should not create new cache entries
+    return tuple(sorted(names))
+
+
+@lru_cache(maxsize=1024)
+def _get_build_targets(names: Tuple[str, ...], default: Optional[str]) -> FrozenSet:
+    return frozenset(aliases.get_build_targets(*names, default=default))
+
+
+@lru_cache(maxsize=1024)
+def _get_koji_targets(names: Tuple[str, ...], default: Optional[str]) -> FrozenSet:
+    return frozenset(aliases.get_koji_targets(*names, default=default))
+
+
+def get_build_targets(*name: str, default=aliases.DEFAULT_VERSION) -> Set[str]:
+    """ Memoized `packit.config.aliases.get_build_targets`. """
+    return set(_get_build_targets(_get_key(name), default))
+
+
+def get_koji_targets(*name: str, default=aliases.DEFAULT_VERSION) -> Set[str]:
+    """ Memoized `packit.config.aliases.get_koji_targets`. """
+    return set(_get_koji_targets(_get_key(name), default))
@@ -0,0 +1,163 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Cache of bare mirrors of the upstream repositories.
+
+Instead of cloning the whole repository from the forge for every job,
+we keep a bare mirror on a persistent volume, fetch only the new commits
+(and the ref of the pull request) into it and clone the job's working copy
+from the mirror locally.
+
+The working copy is a standalone local clone (with hardlinked objects
+when the mirror is on the same filesystem), not a `git worktree`:
+the working directory is synced to the sandbox pod which can't see the mirror.
+"""
+
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+import git
+
+logger = logging.getLogger(__name__)
+
+
+class GitMirrorCache:
+    def __init__(self, directory: str, max_size: int):
+        """
+        :param directory: where to keep the mirrors
+        :param max_size: disk quota in bytes,
+                         the least recently used mirrors are removed above it
+        """
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    def get_mirror_path(self, url: str) -> Path:
+        name = url.rstrip("/").rsplit("/", 1)[-1]
+        if not name.endswith(".git"):
+            name += ".git"
+        digest = hashlib.sha256(url.encode()).hexdigest()[:16]
+        return self.directory / f"{digest}-{name}"
+
+    @contextmanager
+    def lock(self, mirror_path: Path, blocking: bool = True) -> Iterator[bool]:
+        """
+        Exclusive lock of the mirror, shared by all the processes using the volume.
+
+        :return: False if not blocking and the mirror is locked by somebody else
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(f"{mirror_path}.lock", "w") as lock_file:
+            try:
+                fcntl.flock(
+                    lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB)
+                )
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def update_mirror(
+        self, url: str, mirror_path: Path, pr_id: Optional[Union[str, int]] = None
+    ) -> git.Repo:
+        """ Create the mirror or fetch the new commits, call with the lock held. """
+        if (mirror_path / "HEAD").is_file():
+            logger.info(f"Fetching {url} into the mirror {mirror_path}.")
+            mirror = git.Repo(mirror_path)
+            mirror.remote().fetch(prune=True, tags=True)
+        else:
+            logger.info(f"Creating the mirror of {url} in {mirror_path}.")
+            shutil.rmtree(mirror_path, ignore_errors=True)
+            mirror = git.Repo.clone_from(url, mirror_path, bare=True)
+            # bare clones don't have any refspec to fetch with
+            mirror.git.config("remote.origin.fetch", "+refs/heads/*:refs/heads/*")
+
+        if pr_id is not None:
+            try:
+                mirror.remote().fetch(f"+refs/pull/{pr_id}/head:refs/pull/{pr_id}/head")
+            except git.GitCommandError as ex:
+                # e.g. Gitlab has a different ref for the merge requests
+                logger.debug(f"Can't fetch the ref of PR {pr_id}: {ex}")
+
+        # for the LRU eviction
+        os.utime(mirror_path)
+        return mirror
+
+    def clone(
+        self,
+        url: str,
+        working_dir: Union[str, Path],
+        pr_id: Optional[Union[str, int]] = None,
+    ) -> git.Repo:
+        """
+        Clone the repository into an empty `working_dir` using the mirror.
+
+        The `origin` of the clone points to the forge, not to the mirror,
+        so that it behaves as the one cloned from the forge directly.
+        """
+        mirror_path = self.get_mirror_path(url)
+        with self.lock(mirror_path):
+            mirror = self.update_mirror(url, mirror_path, pr_id=pr_id)
+            repo = mirror.clone(str(working_dir), local=True)
+        repo.remote().set_url(url)
+        self.evict()
+        return repo
+
+    def evict(self) -> None:
+        """ Remove the least recently used mirrors until they fit the quota. """
+        mirrors = []
+        total_size = 0
+        for mirror_path in self.directory.glob("*.git"):
+            size = get_directory_size(mirror_path)
+            mirrors.append((mirror_path.stat().st_mtime, size, mirror_path))
+            total_size += size
+
+        for _, size, mirror_path in sorted(mirrors):
+            if total_size <= self.max_size:
+                break
+            with self.lock(mirror_path, blocking=False) as locked:
+                if not locked:
+                    # in use
+                    continue
+                logger.info(f"Removing the mirror {mirror_path} from the cache.")
+                shutil.rmtree(mirror_path, ignore_errors=True)
+                total_size -= size
+
+
+def get_directory_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
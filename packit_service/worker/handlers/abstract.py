@@ -23,10 +23,10 @@
 """
 This file defines generic job handler
 """
+import copy
 import logging
-import shutil
+import time
 from collections import defaultdict
-from os import getenv
 from pathlib import Path
 from typing import Dict, Optional, Type, List, Set
 
@@ -37,6 +37,11 @@ from packit_service.config import ServiceConfig
 from packit_service.sentry_integration import push_scope_to_sentry
 from packit_service.service.events import Event, TheJobTriggerType
 from packit_service.worker.result import HandlerResults
+from packit_service.worker.workspace import (
+    create_workspace,
+    remove_stale_workspaces,
+    remove_workspace,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -80,10 +85,17 @@ def use_for(job_type: JobType):
 
 
 class Handler:
+    # set to False for the handlers which don't touch the disk
+    # (e.g. only report the status), they don't get any workspace
+    needs_workspace: bool = True
+
     def __init__(self, config: ServiceConfig):
         self.config: ServiceConfig = config
         self.api: Optional[PackitAPI] = None
         self.local_project: Optional[LocalProject] = None
+        self.workspace: Optional[Path] = None
+        # seconds spent by preparing and cleaning the workspace
+        self.cleanup_time: float = 0.0
 
     def run(self) -> HandlerResults:
         raise NotImplementedError("This should have been implemented.")
@@ -102,38 +114,55 @@ class Handler:
 
     def run_n_clean(self) -> HandlerResults:
         try:
+            self._prepare_workplace()
             with push_scope_to_sentry() as scope:
                 for k, v in self.get_tag_info().items():
                     scope.set_tag(k, v)
                 return self.run()
         finally:
             self.clean()
-
-    def _clean_workplace(self):
-        # clean only when we are in k8s for sure
-        if not getenv("KUBERNETES_SERVICE_HOST"):
-            logger.debug("This is not a kubernetes pod, won't clean.")
-            return
-        logger.debug("Removing contents of the PV.")
-        p = Path(self.config.command_handler_work_dir)
-        # Do not clean dir if does not exist
-        if not p.is_dir():
-            logger.debug(
-                f"Directory {self.config.command_handler_work_dir!r} does not exist."
+            logger.info(
+                f"Workspace of {self.__class__.__name__} "
+                f"prepared and cleaned in {self.cleanup_time:.3f}s."
             )
+
+    def _prepare_workplace(self):
+        """
+        Create a directory for this handler inside of the `command_handler_work_dir`
+        and use it as the `command_handler_work_dir` of the handler.
+        """
+        if not self.needs_workspace:
+            logger.debug("The handler does not need a workspace.")
             return
+        start = time.perf_counter()
+        try:
+            work_dir = Path(self.config.command_handler_work_dir)
+            # Do not create anything if the dir does not exist
+            if not work_dir.is_dir():
+                logger.debug(f"Directory {str(work_dir)!r} does not exist.")
+                return
+            remove_stale_workspaces(work_dir)
+            self.workspace = create_workspace(work_dir, prefix=self.__class__.__name__)
+            logger.debug(f"Using the workspace {self.workspace}.")
+            self.config = copy.copy(self.config)
+            self.config.command_handler_work_dir = str(self.workspace)
+            self._config_changed()
+        finally:
+            self.cleanup_time += time.perf_counter() - start
 
-        # remove everything in the volume, but not the volume dir
-        dir_items = list(p.iterdir())
-        if dir_items:
-            logger.info("Volume is not empty.")
-            logger.debug(f"Content: {[g.name for g in dir_items]}")
-        for item in dir_items:
-            # symlink pointing to a dir is also a dir and a symlink
-            if item.is_symlink() or item.is_file():
-                item.unlink()
-            else:
-                shutil.rmtree(item)
+    def _config_changed(self):
+        """
+        Drop the lazily created objects which use the original config
+        (e.g. build helpers created by `pre_check`),
+        so that they are created again with the config of the workspace.
+        """
+
+    def _clean_workplace(self):
+        if not self.workspace:
+            return
+        logger.debug(f"Removing the workspace {self.workspace}.")
+        remove_workspace(self.workspace)
+        self.workspace = None
 
     def pre_check(self) -> bool:
         """
@@ -147,9 +176,11 @@ class Handler:
     def clean(self):
         """ clean up the mess once we're done """
         logger.info("Cleaning up the mess.")
+        start = time.perf_counter()
         if self.api:
             self.api.clean()
         self._clean_workplace()
+        self.cleanup_time += time.perf_counter() - start
 
 
 class JobHandler(Handler):
@@ -164,7 +195,6 @@ class JobHandler(Handler):
         super().__init__(config)
         self.job_config: Optional[JobConfig] = job_config
         self.event = event
-        self._clean_workplace()
 
     def run(self) -> HandlerResults:
         raise NotImplementedError("This should have been implemented.")
@@ -26,7 +26,7 @@ This file defines classes for job handlers specific for Fedmsg events
 
 import logging
 from datetime import datetime
-from typing import Type
+from typing import List, Optional, Type
 
 from ogr.abstract import CommitStatus
 from ogr.services.github import GithubProject
@@ -40,12 +40,16 @@ from packit.config import (
 from packit.distgit import DistGit
 from packit.local_project import LocalProject
 from packit.utils import get_namespace_and_repo_name
+from packit_service.celerizer import celery_app
 from packit_service.config import ServiceConfig
+from packit_service.congratulations import congratulated_builds
+from packit_service.copr_build_completions import copr_build_completions
 from packit_service.constants import (
     PG_COPR_BUILD_STATUS_FAILURE,
     PG_COPR_BUILD_STATUS_SUCCESS,
     COPR_API_SUCC_STATE,
 )
+from packit_service.in_flight_builds import in_flight_copr_builds
 from packit_service.models import CoprBuildModel
 from packit_service.service.events import (
     Event,
@@ -149,6 +153,7 @@ class CoprBuildEndHandler(FedmsgHandler):
     topic = "org.fedoraproject.prod.copr.build.end"
     triggers = [TheJobTriggerType.copr_end]
     event: CoprBuildEvent
+    needs_workspace = False
 
     def was_last_packit_comment_with_congratulation(self):
         """
@@ -169,6 +174,19 @@ class CoprBuildEndHandler(FedmsgHandler):
         # if there is no comment from p-s
         return False
 
+    def should_congratulate(self) -> bool:
+        """
+        Only the first successful chroot of the build checks the PR comments,
+        the others don't need to ask the forge again.
+        """
+        if not congratulated_builds.claim(self.event.build_id):
+            logger.debug(
+                f"Congratulation for the copr build {self.event.build_id} "
+                "was already taken care of."
+            )
+            return False
+        return not self.was_last_packit_comment_with_congratulation()
+
     def run(self):
         build_job_helper = CoprBuildJobHelper(
             config=self.config,
@@ -199,15 +217,20 @@ class CoprBuildEndHandler(FedmsgHandler):
                 f" processed (status={build.status})."
             )
             logger.info(msg)
+            in_flight_copr_builds.remove(self.event.build_id, self.event.chroot)
             return HandlerResults(success=True, details={"msg": msg})
 
-        end_time = (
-            datetime.utcfromtimestamp(self.event.timestamp)
-            if self.event.timestamp
-            else None
-        )
-        build.set_end_time(end_time)
         url = get_copr_build_log_url_from_flask(build.id)
+        if self.config.copr_build_end_window and self.queue_completion():
+            self.report_build_status(build_job_helper, self.event, url)
+            msg = (
+                f"Copr build {self.event.build_id} ({self.event.chroot}) "
+                "queued for processing with the other chroots."
+            )
+            logger.debug(msg)
+            return HandlerResults(success=True, details={"msg": msg})
+
+        build.set_end_time(self.get_end_time(self.event))
 
         # https://pagure.io/copr/copr/blob/master/f/common/copr_common/enums.py#_42
         if self.event.status != COPR_API_SUCC_STATE:
@@ -219,26 +242,10 @@ class CoprBuildEndHandler(FedmsgHandler):
                 chroot=self.event.chroot,
             )
             build.set_status(PG_COPR_BUILD_STATUS_FAILURE)
+            in_flight_copr_builds.remove(self.event.build_id, self.event.chroot)
             return HandlerResults(success=False, details={"msg": failed_msg})
 
-        if (
-            build_job_helper.job_build
-            and build_job_helper.job_build.trigger == JobConfigTriggerType.pull_request
-            and self.event.pr_id
-            and isinstance(self.event.project, GithubProject)
-            and not self.was_last_packit_comment_with_congratulation()
-            and self.event.package_config.notifications.pull_request.successful_build
-        ):
-            msg = (
-                f"Congratulations! One of the builds has completed. :champagne:\n\n"
-                "You can install the built RPMs by following these steps:\n\n"
-                "* `sudo yum install -y dnf-plugins-core` on RHEL 8\n"
-                "* `sudo dnf install -y dnf-plugins-core` on Fedora\n"
-                f"* `dnf copr enable {self.event.owner}/{self.event.project_name}`\n"
-                "* And now you can install the packages.\n"
-                "\nPlease note that the RPMs should be used only in a testing environment."
-            )
-            self.event.project.pr_comment(pr_id=self.event.pr_id, body=msg)
+        self.congratulate(build_job_helper)
 
         build_job_helper.report_status_to_build_for_chroot(
             state=CommitStatus.success,
@@ -253,21 +260,153 @@ class CoprBuildEndHandler(FedmsgHandler):
             chroot=self.event.chroot,
         )
         build.set_status(PG_COPR_BUILD_STATUS_SUCCESS)
+        in_flight_copr_builds.remove(self.event.build_id, self.event.chroot)
+
+        self.run_testing_farm(build_job_helper, self.event)
 
+        return HandlerResults(success=True, details={})
+
+    @staticmethod
+    def get_end_time(event: CoprBuildEvent) -> Optional[datetime]:
+        return datetime.utcfromtimestamp(event.timestamp) if event.timestamp else None
+
+    def queue_completion(self) -> bool:
+        """
+        Add the chroot to the ones processed together by `finish_chroots`.
+
+        :return: False if the chroot needs to be processed right away
+        """
+        first = copr_build_completions.add(
+            self.event.build_id, self.event.chroot, self.event.to_dict()
+        )
+        if first is None:
+            return False
+        if first:
+            celery_app.send_task(
+                "task.process_copr_build_completions",
+                kwargs={"build_id": self.event.build_id},
+                countdown=self.config.copr_build_end_window,
+            )
+        return True
+
+    @staticmethod
+    def report_build_status(
+        build_job_helper: CoprBuildJobHelper, event: CoprBuildEvent, url: str
+    ) -> None:
+        if event.status == COPR_API_SUCC_STATE:
+            state, description = CommitStatus.success, "RPMs were built successfully."
+        else:
+            state, description = CommitStatus.failure, "RPMs failed to be built."
+        build_job_helper.report_status_to_build_for_chroot(
+            state=state, description=description, url=url, chroot=event.chroot
+        )
+
+    def congratulate(self, build_job_helper: CoprBuildJobHelper) -> None:
+        if not (
+            build_job_helper.job_build
+            and build_job_helper.job_build.trigger == JobConfigTriggerType.pull_request
+            and self.event.pr_id
+            and isinstance(self.event.project, GithubProject)
+            and self.event.package_config.notifications.pull_request.successful_build
+            and self.should_congratulate()
+        ):
+            return
+        msg = (
+            f"Congratulations! One of the builds has completed. :champagne:\n\n"
+            "You can install the built RPMs by following these steps:\n\n"
+            "* `sudo yum install -y dnf-plugins-core` on RHEL 8\n"
+            "* `sudo dnf install -y dnf-plugins-core` on Fedora\n"
+            f"* `dnf copr enable {self.event.owner}/{self.event.project_name}`\n"
+            "* And now you can install the packages.\n"
+            "\nPlease note that the RPMs should be used only in a testing environment."
+        )
+        try:
+            self.event.project.pr_comment(pr_id=self.event.pr_id, body=msg)
+        except Exception:
+            congratulated_builds.release(self.event.build_id)
+            raise
+
+    def run_testing_farm(
+        self, build_job_helper: CoprBuildJobHelper, event: CoprBuildEvent
+    ) -> None:
         if (
             build_job_helper.job_tests
-            and self.event.chroot in build_job_helper.tests_targets
+            and event.chroot in build_job_helper.tests_targets
         ):
             testing_farm_handler = GithubTestingFarmHandler(
                 config=self.config,
                 job_config=build_job_helper.job_tests,
-                event=self.event,
-                chroot=self.event.chroot,
+                event=event,
+                chroot=event.chroot,
             )
             testing_farm_handler.run()
         else:
             logger.debug("Testing farm not in the job config.")
 
+    def finish_chroots(self, events: List[CoprBuildEvent]) -> HandlerResults:
+        """
+        Process the chroots of the build queued by `queue_completion`.
+
+        The build statuses were reported by the handlers of the chroots,
+        here we update the builds in the DB at once, report the test statuses,
+        congratulate and run the tests for all the chroots.
+
+        :param events: events of the chroots of one build,
+                       they share the package config of the handler's event
+        """
+        build_job_helper = CoprBuildJobHelper(
+            config=self.config,
+            package_config=self.event.package_config,
+            project=self.event.project,
+            event=self.event,
+        )
+        statuses = {
+            event.chroot: (
+                PG_COPR_BUILD_STATUS_SUCCESS
+                if event.status == COPR_API_SUCC_STATE
+                else PG_COPR_BUILD_STATUS_FAILURE,
+                self.get_end_time(event),
+            )
+            for event in events
+        }
+        build_ids = CoprBuildModel.set_chroots_finished(self.event.build_id, statuses)
+        events = [event for event in events if event.chroot in build_ids]
+        if not events:
+            msg = f"Copr build {self.event.build_id} is already processed."
+            logger.info(msg)
+            return HandlerResults(success=True, details={"msg": msg})
+
+        succeeded = []
+        for event in events:
+            in_flight_copr_builds.remove(event.build_id, event.chroot)
+            url = get_copr_build_log_url_from_flask(build_ids[event.chroot])
+            if event.status == COPR_API_SUCC_STATE:
+                build_job_helper.report_status_to_test_for_chroot(
+                    state=CommitStatus.pending,
+                    description="RPMs were built successfully.",
+                    url=url,
+                    chroot=event.chroot,
+                )
+                succeeded.append(event)
+            else:
+                build_job_helper.report_status_to_test_for_chroot(
+                    state=CommitStatus.failure,
+                    description="RPMs failed to be built.",
+                    url=url,
+                    chroot=event.chroot,
+                )
+
+        if succeeded:
+            self.congratulate(build_job_helper)
+        for event in succeeded:
+            self.run_testing_farm(build_job_helper, event)
+
+        failed = [event.chroot for event in events if event not in succeeded]
+        if failed:
+            return HandlerResults(
+                success=False,
+                details={"msg": "RPMs failed to be built.", "chroots": failed},
+            )
         return HandlerResults(success=True, details={})
 
 
@@ -279,6 +418,7 @@ class CoprBuildStartHandler(FedmsgHandler):
     topic = "org.fedoraproject.prod.copr.build.start"
     triggers = [TheJobTriggerType.copr_start]
     event: CoprBuildEvent
+    needs_workspace = False
 
     def run(self):
         build_job_helper = CoprBuildJobHelper(
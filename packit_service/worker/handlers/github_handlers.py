@@ -88,6 +88,7 @@ class GithubAppInstallationHandler(AbstractGitForgeJobHandler):
     type = JobType.add_to_whitelist
     triggers = [TheJobTriggerType.installation]
     event: InstallationEvent
+    needs_workspace = False
 
     # https://developer.github.com/v3/activity/events/types/#events-api-payload-28
 
@@ -239,6 +240,9 @@ class AbstractCoprBuildHandler(AbstractGitForgeJobHandler):
             )
         return self._copr_build_helper
 
+    def _config_changed(self):
+        self._copr_build_helper = None
+
     def run(self) -> HandlerResults:
         return self.copr_build_helper.run_copr_build()
 
@@ -371,6 +375,9 @@ class AbstractGithubKojiBuildHandler(AbstractGitForgeJobHandler):
             )
         return self._koji_build_helper
 
+    def _config_changed(self):
+        self._koji_build_helper = None
+
     def run(self) -> HandlerResults:
         return self.koji_build_helper.run_koji_build()
 
@@ -75,6 +75,9 @@ class PagurePullRequestCommentCoprBuildHandler(CommentActionHandler):
             )
         return self._copr_build_helper
 
+    def _config_changed(self):
+        self._copr_build_helper = None
+
     def run(self) -> HandlerResults:
         return self.copr_build_helper.run_copr_build()
 
@@ -83,6 +86,7 @@ class PagurePullRequestLabelHandler(AbstractGitForgeJobHandler):
     type = JobType.create_bugzilla
     triggers = [TheJobTriggerType.pr_label]
     event: PullRequestLabelPagureEvent
+    needs_workspace = False
 
     def __init__(
         self,
@@ -52,6 +52,7 @@ class TestingFarmResultsHandler(AbstractGitForgeJobHandler):
     type = JobType.report_test_results
     triggers = [TheJobTriggerType.testing_farm_results]
     event: TestingFarmResultsEvent
+    needs_workspace = False
 
     def __init__(
         self,
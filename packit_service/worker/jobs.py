@@ -23,26 +23,32 @@
 """
 We love you, Steve Jobs.
 """
+import copy
 import datetime
 import logging
-from typing import Any
-from typing import Optional, Dict, Union, Type, Set, List
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Iterable, cast
+from typing import Optional, Dict, Union, Type, Set, List, Tuple, FrozenSet
 
-from packit.config import JobType, PackageConfig, JobConfig
+from packit.config import JobType, PackageConfig, JobConfig, JobConfigTriggerType
 from packit.constants import DATETIME_FORMAT
 
+from packit_service.celerizer import celery_app
 from packit_service.config import ServiceConfig
 from packit_service.log_versions import log_job_versions
-from packit_service.models import PullRequestModel
+from packit_service.models import PullRequestModel, remove_sa_session
+from packit_service.service.db_triggers import AddDbTrigger
 from packit_service.service.events import (
     PullRequestCommentGithubEvent,
     IssueCommentEvent,
     Event,
     TheJobTriggerType,
     PullRequestCommentPagureEvent,
+    get_event_class,
 )
 from packit_service.trigger_mapping import (
-    is_trigger_matching_job_config,
+    is_trigger_matching_job_config_trigger,
     are_job_types_same,
 )
 from packit_service.worker.handlers import (
@@ -70,6 +76,7 @@ from packit_service.worker.handlers.pagure_handlers import (
 from packit_service.worker.handlers.pagure_handlers import PagurePullRequestLabelHandler
 from packit_service.worker.parser import Parser, CentosEventParser
 from packit_service.worker.result import HandlerResults
+from packit_service.worker.topic_router import TopicRouter, CENTOS_MESSAGE_SOURCE
 from packit_service.worker.whitelist import Whitelist
 
 REQUESTED_PULL_REQUEST_COMMENT = "/packit"
@@ -77,6 +84,146 @@ REQUESTED_PULL_REQUEST_COMMENT = "/packit"
 logger = logging.getLogger(__name__)
 
 
+# handlers which can be run as separate tasks (see `SteveJobs.process_handler`)
+HANDLERS_BY_NAME: Dict[str, Type[JobHandler]] = {
+    h.__name__: cast(Type[JobHandler], h) for h in MAP_HANDLER_TO_JOB_TYPES.keys()
+}
+
+# jobs of the package config reduced to what matters for the dispatching
+JobsKey = Tuple[Tuple[JobType, JobConfigTriggerType], ...]
+
+# topics of the handlers are known once all the handlers are imported (= now)
+HANDLER_TOPICS: FrozenSet[str] = frozenset(
+    getattr(h, "topic")
+    for h in MAP_HANDLER_TO_JOB_TYPES.keys()
+    if getattr(h, "topic", None)
+)
+
+# shared by the celery task (before SteveJobs is even created) and SteveJobs
+TOPIC_ROUTER = TopicRouter(
+    fedmsg_topics=HANDLER_TOPICS,
+    centos_topics=CentosEventParser().event_mapping.keys(),
+)
+
+
+class EventRestoreError(Exception):
+    """
+    The event of a scheduled handler could not be restored
+    (e.g. the database or the forge were not reachable).
+
+    The handler did not start, so it is safe to retry the task.
+    """
+
+
+class DispatchPlan:
+    """
+    Handlers and their job configs for one combination of:
+    - job types and triggers configured in the package config,
+    - trigger of the event,
+    - trigger type of the event's db_trigger.
+
+    Job configs are referenced by their index in `package_config.jobs`
+    so the plan can be shared between package configs with the same jobs.
+    """
+
+    def __init__(
+        self,
+        jobs_key: JobsKey,
+        event_trigger: TheJobTriggerType,
+        db_trigger_type: Optional[JobConfigTriggerType],
+    ):
+        self.jobs_key = jobs_key
+        self.event_trigger = event_trigger
+
+        # jobs that can be triggered by the event
+        self.triggered_jobs: Tuple[int, ...] = tuple(
+            i
+            for i, (_, job_trigger) in enumerate(jobs_key)
+            if (db_trigger_type and db_trigger_type == job_trigger)
+            or is_trigger_matching_job_config_trigger(
+                trigger=event_trigger, job_config_trigger=job_trigger
+            )
+        )
+        self.handlers: FrozenSet[Type[JobHandler]] = self._get_handlers()
+        # used when there is no job config for the handler
+        # e.g. we can use `tests` configuration when running build
+        self.required_jobs: Tuple[int, ...] = tuple(
+            i
+            for i in self.triggered_jobs
+            if any(
+                is_trigger_matching_job_config_trigger(
+                    trigger=trigger, job_config_trigger=jobs_key[i][1]
+                )
+                for pos_handler in MAP_REQUIRED_JOB_TO_HANDLERS.get(
+                    jobs_key[i][0], set()
+                )
+                for trigger in pos_handler.triggers
+            )
+        )
+        self._jobs_for_handlers: Dict[Type[Handler], Tuple[int, ...]] = {}
+
+    def _get_handlers(self) -> FrozenSet[Type[JobHandler]]:
+        handlers: Set[Type[JobHandler]] = set()
+        classes_for_trigger = MAP_EVENT_TRIGGER_TO_HANDLERS.get(
+            self.event_trigger, set()
+        )
+        for i in self.triggered_jobs:
+            job_type = self.jobs_key[i][0]
+            for pos_handler in classes_for_trigger:
+                if job_type in MAP_HANDLER_TO_JOB_TYPES.get(pos_handler, set()):
+                    handlers.add(pos_handler)
+
+        # We need to return also handlers that are required for the configured jobs.
+        # e.g. we need to run `build` when only `test` is configured
+        for job_type, _ in self.jobs_key:
+            for pos_handler in MAP_REQUIRED_JOB_TO_HANDLERS.get(job_type, set()):
+                if self.event_trigger in pos_handler.triggers:
+                    handlers.add(pos_handler)
+
+        return frozenset(handlers)
+
+    def get_jobs_for_handler(self, handler_kls: Type[Handler]) -> Tuple[int, ...]:
+        """
+        Indexes of the job configs for the handler (in the order of the config).
+        """
+        if handler_kls not in self._jobs_for_handlers:
+            matching_job_types = MAP_HANDLER_TO_JOB_TYPES.get(handler_kls, set())
+            matching_jobs = tuple(
+                i
+                for i in self.triggered_jobs
+                # The function `are_job_types_same` is used
+                # because of the `build` x `copr_build` aliasing.
+                if any(
+                    are_job_types_same(self.jobs_key[i][0], type)
+                    for type in matching_job_types
+                )
+            )
+            self._jobs_for_handlers[handler_kls] = matching_jobs or self.required_jobs
+        return self._jobs_for_handlers[handler_kls]
+
+
+@lru_cache(maxsize=1024)
+def _get_dispatch_plan(
+    jobs_key: JobsKey,
+    event_trigger: TheJobTriggerType,
+    db_trigger_type: Optional[JobConfigTriggerType],
+) -> DispatchPlan:
+    return DispatchPlan(
+        jobs_key=jobs_key, event_trigger=event_trigger, db_trigger_type=db_trigger_type
+    )
+
+
+def get_dispatch_plan(event: Event, package_config: PackageConfig) -> DispatchPlan:
+    """
+    Get the (cached) dispatch plan for the given event and package config.
+    """
+    jobs_key: JobsKey = tuple((job.type, job.trigger) for job in package_config.jobs)
+    db_trigger_type = None
+    if jobs_key and event.db_trigger:
+        db_trigger_type = event.db_trigger.job_config_trigger_type
+    return _get_dispatch_plan(jobs_key, event.trigger, db_trigger_type)
+
+
 def get_handlers_for_event(
     event: Event, package_config: PackageConfig
 ) -> Set[Type[JobHandler]]:
@@ -94,26 +241,7 @@ def get_handlers_for_event(
     :param package_config: for checking configured jobs
     :return: set of handler instances that we need to run for given event and user configuration
     """
-    handlers: Set[Type[JobHandler]] = set()
-    classes_for_trigger = MAP_EVENT_TRIGGER_TO_HANDLERS[event.trigger]
-
-    for job in package_config.jobs:
-        if (
-            event.db_trigger and event.db_trigger.job_config_trigger_type == job.trigger
-        ) or is_trigger_matching_job_config(trigger=event.trigger, job_config=job):
-            for pos_handler in classes_for_trigger:
-                if job.type in MAP_HANDLER_TO_JOB_TYPES[pos_handler]:
-                    handlers.add(pos_handler)
-
-        # We need to return also handlers that are required for the configured jobs.
-        # e.g. we need to run `build` when only `test` is configured
-        required_handlers = MAP_REQUIRED_JOB_TO_HANDLERS[job.type]
-        for pos_handler in required_handlers:
-            for trigger in pos_handler.triggers:
-                if trigger == event.trigger:
-                    handlers.add(pos_handler)
-
-    return handlers
+    return set(get_dispatch_plan(event, package_config).handlers)
 
 
 def get_config_for_handler_kls(
@@ -138,41 +266,12 @@ def get_config_for_handler_kls(
     :return: list of JobConfigs relevant to the given handler and event
              preserving the order in the config
     """
-    matching_jobs = []
-    jobs_that_can_be_triggered = []
-
-    for job in package_config.jobs:
-        if (
-            event.db_trigger and event.db_trigger.job_config_trigger_type == job.trigger
-        ) or is_trigger_matching_job_config(trigger=event.trigger, job_config=job):
-            jobs_that_can_be_triggered.append(job)
-
-    matching_job_types = MAP_HANDLER_TO_JOB_TYPES[handler_kls]
-    for job in jobs_that_can_be_triggered:
-        if (
-            # Check if the job matches any job supported by the handler.
-            # The function `are_job_types_same` is used
-            # because of the `build` x `copr_build` aliasing.
-            any(are_job_types_same(job.type, type) for type in matching_job_types)
-            and job not in matching_jobs
-        ):
+    plan = get_dispatch_plan(event, package_config)
+    matching_jobs: List[JobConfig] = []
+    for i in plan.get_jobs_for_handler(handler_kls):
+        job = package_config.jobs[i]
+        if job not in matching_jobs:
             matching_jobs.append(job)
-
-    if matching_jobs:
-        return matching_jobs
-
-    # The job was not configured but let's try required ones.
-    # e.g. we can use `tests` configuration when running build
-    for job in jobs_that_can_be_triggered:
-        matching_required_job_types = MAP_REQUIRED_JOB_TO_HANDLERS[job.type]
-        for pos_handler in matching_required_job_types:
-            for trigger in pos_handler.triggers:
-                if (
-                    is_trigger_matching_job_config(trigger=trigger, job_config=job)
-                    and job not in matching_jobs
-                ):
-                    matching_jobs.append(job)
-
     return matching_jobs
 
 
@@ -194,6 +293,8 @@ class SteveJobs:
     def process_jobs(self, event: Event) -> Dict[str, HandlerResults]:
         """
         Run a job handler (if trigger matches) for every job defined in config.
+
+        :param event: parsed event
         """
 
         handlers_results = {}
@@ -213,6 +314,7 @@ class SteveJobs:
             logger.warning(f"There is no handler for {event.trigger} event.")
             return handlers_results
 
+        jobs_to_run: List[Tuple[Type[JobHandler], JobConfig]] = []
         for handler_kls in handler_classes:
             job_configs = get_config_for_handler_kls(
                 handler_kls=handler_kls,
@@ -235,18 +337,143 @@ class SteveJobs:
                 return handlers_results
 
             # we want to run handlers for all possible jobs, not just the first one
-            for job_config in job_configs:
-                logger.debug(f"Running handler: {str(handler_kls)} for {job_config}")
-                handler = handler_kls(
-                    config=self.config, job_config=job_config, event=event
-                )
-                if handler.pre_check():
-                    current_time = datetime.datetime.now().strftime(DATETIME_FORMAT)
-                    result_key = f"{job_config.type.value}-{current_time}"
-                    handlers_results[result_key] = handler.run_n_clean()
+            jobs_to_run.extend((handler_kls, job_config) for job_config in job_configs)
+
+        results: Iterable[Optional[Tuple[str, HandlerResults]]]
+        if self.config.fan_out_handlers:
+            results = (
+                self.schedule_handler(handler_kls, job_config, event)
+                for handler_kls, job_config in jobs_to_run
+            )
+        elif self.config.handler_concurrency > 1 and len(jobs_to_run) > 1:
+            results = self.run_handlers_concurrently(event, jobs_to_run)
+        else:
+            results = (
+                self.run_handler(handler_kls, job_config, event, self.config)
+                for handler_kls, job_config in jobs_to_run
+            )
+
+        for result in results:
+            if result:
+                result_key, handler_results = result
+                handlers_results[result_key] = handler_results
 
         return handlers_results
 
+    @staticmethod
+    def schedule_handler(
+        handler_kls: Type[JobHandler], job_config: JobConfig, event: Event,
+    ) -> Tuple[str, HandlerResults]:
+        """
+        Send a task running just the one handler for the one job config.
+
+        The task restores the event from its data (see `Event.from_dict`)
+        instead of parsing the original message again,
+        the job config is referenced by its index in the package config.
+        """
+        job_config_index = event.package_config.jobs.index(job_config)
+        async_result = celery_app.send_task(
+            name="task.steve_jobs.process_handler",
+            kwargs={
+                "event": event.to_dict(),
+                "event_type": type(event).__name__,
+                "handler_name": handler_kls.__name__,
+                "job_config_index": job_config_index,
+            },
+        )
+        logger.debug(
+            f"Handler {handler_kls.__name__} for {job_config} "
+            f"scheduled as task {async_result.id}."
+        )
+        current_time = datetime.datetime.now().strftime(DATETIME_FORMAT)
+        result_key = f"{job_config.type.value}-{current_time}"
+        return (
+            result_key,
+            HandlerResults(
+                success=True,
+                details={
+                    "msg": f"Handler {handler_kls.__name__} scheduled.",
+                    "task_id": async_result.id,
+                },
+            ),
+        )
+
+    @staticmethod
+    def run_handler(
+        handler_kls: Type[JobHandler],
+        job_config: JobConfig,
+        event: Event,
+        config: ServiceConfig,
+    ) -> Optional[Tuple[str, HandlerResults]]:
+        """
+        Run the handler if the pre-check passes.
+
+        :return: (result key, results of the handler)
+                 or None when the handler was skipped
+        """
+        logger.debug(f"Running handler: {str(handler_kls)} for {job_config}")
+        handler = handler_kls(config=config, job_config=job_config, event=event)
+        if not handler.pre_check():
+            return None
+        current_time = datetime.datetime.now().strftime(DATETIME_FORMAT)
+        result_key = f"{job_config.type.value}-{current_time}"
+        return result_key, handler.run_n_clean()
+
+    def run_handlers_concurrently(
+        self, event: Event, jobs_to_run: List[Tuple[Type[JobHandler], JobConfig]]
+    ) -> List[Optional[Tuple[str, HandlerResults]]]:
+        """
+        Run the handlers in a bounded thread pool.
+
+        The handlers do not depend on each other's data,
+        but they share the event: each of them gets its own copy of it,
+        see `isolate_event`.
+        Each handler works in its own workspace, see `Handler.needs_workspace`.
+
+        :return: results in the order of `jobs_to_run`
+        """
+        logger.info(
+            f"Running {len(jobs_to_run)} handlers "
+            f"with concurrency {self.config.handler_concurrency}."
+        )
+        with ThreadPoolExecutor(
+            max_workers=self.config.handler_concurrency
+        ) as executor:
+            futures = [
+                executor.submit(
+                    self._run_handler_in_isolation, handler_kls, job_config, event
+                )
+                for handler_kls, job_config in jobs_to_run
+            ]
+            return [future.result() for future in futures]
+
+    def _run_handler_in_isolation(
+        self, handler_kls: Type[JobHandler], job_config: JobConfig, event: Event
+    ) -> Optional[Tuple[str, HandlerResults]]:
+        event = self.isolate_event(event)
+        try:
+            return self.run_handler(handler_kls, job_config, event, self.config)
+        finally:
+            remove_sa_session()
+
+    @staticmethod
+    def isolate_event(event: Event) -> Event:
+        """
+        Copy the event for a handler running in its own thread.
+
+        The event is restored from its data in the handler's thread:
+        SQLAlchemy objects (db_trigger, the Copr build) are bound to a session
+        of one thread and are loaded again in the session of the handler's thread,
+        the forge projects are not shared either.
+        Only the package config (plain data) is copied over
+        so that it is not fetched again for each handler.
+        """
+        isolated = type(event).from_dict(event.to_dict())
+        package_config = getattr(event, "_package_config", None)
+        if package_config:
+            setattr(isolated, "_package_config", copy.deepcopy(package_config))
+        return isolated
+
     def find_packit_command(self, comment):
         packit_command = []
         pr_comment_error_msg = ""
@@ -361,30 +588,17 @@ class SteveJobs:
             handlers_results[result_key] = handler_instance.run_n_clean()
         return handlers_results
 
-    def process_message(
-        self, event: dict, topic: str = None, source: str = None
-    ) -> Optional[dict]:
+    @staticmethod
+    def parse_event(event: dict, source: str = None) -> Optional[Event]:
         """
-        Entrypoint for message processing.
+        Parse the event and check that we want to process it.
 
-        :param event:  dict with webhook/fed-mes payload
-        :param topic:  meant to be a topic provided by messaging subsystem (fedmsg, mqqt)
+        :param event: dict with webhook/fed-mes payload
         :param source: source of message
+        :return: event object or None if we don't want to process the event
         """
-
-        if topic:
-            # let's pre-filter messages: we don't need to get debug logs from processing
-            # messages when we know beforehand that we are not interested in messages for such topic
-            topics = [
-                getattr(h, "topic", None) for h in MAP_HANDLER_TO_JOB_TYPES.keys()
-            ]
-
-            if topic not in topics:
-                logger.debug(f"{topic} not in {topics}")
-                return None
-
         event_object: Any
-        if source == "centosmsg":
+        if source == CENTOS_MESSAGE_SOURCE:
             event_object = CentosEventParser().parse_event(event)
         else:
             event_object = Parser.parse_event(event)
@@ -402,6 +616,73 @@ class SteveJobs:
             logger.info("We do not interact with private repositories!")
             return None
 
+        return event_object
+
+    def process_handler(
+        self, event: dict, event_type: str, handler_name: str, job_config_index: int,
+    ) -> Optional[dict]:
+        """
+        Entrypoint for running one handler scheduled by `process_message`.
+
+        The event was already parsed and checked by `process_message`,
+        it is restored from its data, see `Event.to_dict`.
+
+        :param event: event data
+        :param event_type: name of the event class
+        :param handler_name: name of the handler class
+        :param job_config_index: index of the job config in the package config
+        :raises EventRestoreError: when the event can't be restored
+        """
+        handler_kls = HANDLERS_BY_NAME.get(handler_name)
+        if not handler_kls:
+            logger.error(f"There is no handler {handler_name!r}.")
+            return None
+
+        event_kls = get_event_class(event_type)
+        if not event_kls:
+            logger.error(f"There is no event {event_type!r}.")
+            return None
+
+        try:
+            event_object = event_kls.from_dict(event)
+            package_config = event_object.package_config
+        except Exception as ex:
+            raise EventRestoreError(f"Failed to restore {event_type}: {ex}") from ex
+        if not package_config:
+            return None
+
+        job_config = package_config.jobs[job_config_index]
+        jobs_results: Dict[str, HandlerResults] = {}
+        result = self.run_handler(handler_kls, job_config, event_object, self.config)
+        if result:
+            result_key, handler_results = result
+            jobs_results[result_key] = handler_results
+            if not handler_results["success"]:
+                logger.error(handler_results["details"].get("msg"))
+
+        return {"jobs": jobs_results, "event": event_object.get_dict()}
+
+    def process_message(
+        self, event: dict, topic: str = None, source: str = None
+    ) -> Optional[dict]:
+        """
+        Entrypoint for message processing.
+
+        :param event:  dict with webhook/fed-mes payload
+        :param topic:  meant to be a topic provided by messaging subsystem (fedmsg, mqqt)
+        :param source: source of message
+        """
+
+        # let's pre-filter messages: we don't need to get debug logs from processing
+        # messages when we know beforehand that we are not interested in messages for such topic
+        if not TOPIC_ROUTER.is_interesting(topic=topic, source=source):
+            logger.debug(f"We are not interested in messages with topic {topic!r}.")
+            return None
+
+        event_object = self.parse_event(event=event, source=source)
+        if not event_object:
+            return None
+
         handler: Union[
             GithubAppInstallationHandler,
             TestingFarmResultsHandler,
@@ -444,6 +725,11 @@ class SteveJobs:
             jobs_results = self.process_jobs(event_object)
 
         logger.debug("All jobs finished!")
+        if isinstance(event_object, AddDbTrigger):
+            logger.debug(
+                f"DB trigger resolved {event_object.db_trigger_resolutions}x "
+                f"while processing the event."
+            )
 
         task_results = {"jobs": jobs_results, "event": event_object.get_dict()}
 
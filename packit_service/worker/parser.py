@@ -638,17 +638,18 @@ class CentosEventParser:
         :param event: contains event data
         :return: event object or None
         """
-        logger.debug(f"Parsing {event.get('topic')}")
+        topic = event.get("topic")
+        logger.debug(f"Parsing {topic}")
 
         # e.g. "topic": "git.stg.centos.org/pull-request.tag.added"
-        source, git_topic = event.get("topic").split("/")
-        event["source"] = source
-        event["git_topic"] = git_topic
-
+        source, _, git_topic = topic.rpartition("/")
         if git_topic not in self.event_mapping:
             logger.info(f"Event type {git_topic!r} is not processed.")
             return None
 
+        event["source"] = source
+        event["git_topic"] = git_topic
+
         event_object = self.event_mapping[git_topic](event)
         return event_object
 
@@ -20,12 +20,20 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import logging
-from typing import Optional
+from typing import List, Optional
 
 from packit_service.celerizer import celery_app
 from packit_service.models import TaskResultModel
+from packit_service.sentry_integration import send_to_sentry
+from packit_service.service.publisher import group_by_ordering_key
 from packit_service.worker.build.babysit import check_copr_build
-from packit_service.worker.jobs import SteveJobs
+from packit_service.worker.build.copr_build_end import process_queued_chroots
+from packit_service.worker.build.koji_babysit import (
+    KOJI_BABYSIT_MIN_INTERVAL,
+    babysit_koji_builds,
+)
+from packit_service.worker.jobs import EventRestoreError, SteveJobs, TOPIC_ROUTER
+from packit_service.worker.topic_router import CENTOS_MESSAGE_SOURCE
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +61,14 @@ def process_message(
     :param source: event source
     :return: dictionary containing task results
     """
+    # drop the messages we are not interested in as soon as possible
+    if source == CENTOS_MESSAGE_SOURCE:
+        topic_to_route = topic or event.get("topic")
+    else:
+        topic_to_route = topic
+    if not TOPIC_ROUTER.accepts(topic=topic_to_route, source=source):
+        return None
+
     task_results: dict = SteveJobs().process_message(
         event=event, topic=topic, source=source
     )
@@ -63,6 +79,80 @@ def process_message(
     return task_results
 
 
+@celery_app.task(name="task.steve_jobs.process_message_batch", bind=True)
+def process_message_batch(self, events: List[dict]) -> List[Optional[dict]]:
+    """
+    Celery task for the webhooks published at once by the web tier.
+
+    Events which need to be processed in order (e.g. of the same pull request)
+    are processed one after another, the other groups are sent
+    as separate tasks to be processed in parallel.
+
+    :param events: list of event data
+    :return: list of the results of the processed events
+    """
+    groups = group_by_ordering_key(events)
+    if len(groups) > 1:
+        for group in groups:
+            celery_app.send_task(
+                name="task.steve_jobs.process_message_batch", kwargs={"events": group},
+            )
+        return []
+
+    results = []
+    for index, event in enumerate(groups[0]):
+        try:
+            task_results: dict = SteveJobs().process_message(event=event)
+        except Exception as ex:
+            # don't block the following events
+            logger.error(f"Failed to process event {index} of the batch: {ex}")
+            send_to_sentry(ex)
+            task_results = None
+        if task_results:
+            TaskResultModel.add_task_result(
+                task_id=f"{self.request.id}-{index}", task_result_dict=task_results
+            )
+        results.append(task_results)
+    return results
+
+
+@celery_app.task(
+    name="task.steve_jobs.process_handler",
+    bind=True,
+    # the handlers are not idempotent (e.g. a Copr build is submitted),
+    # retry only when they did not start
+    autoretry_for=(EventRestoreError,),
+    retry_backoff=30,  # retry again in 30s, 60s
+    max_retries=2,
+)
+def process_handler(
+    self, event: dict, event_type: str, handler_name: str, job_config_index: int
+) -> Optional[dict]:
+    """
+    Celery task for running one handler scheduled by `process_message`.
+
+    If the event can't be restored, only this handler is retried,
+    not the whole event. Failures of the handler itself are not retried.
+
+    :param event: event data (see `Event.to_dict`)
+    :param event_type: name of the event class
+    :param handler_name: name of the handler class
+    :param job_config_index: index of the job config in the package config
+    :return: dictionary containing task results
+    """
+    task_results: dict = SteveJobs().process_handler(
+        event=event,
+        event_type=event_type,
+        handler_name=handler_name,
+        job_config_index=job_config_index,
+    )
+    if task_results:
+        TaskResultModel.add_task_result(
+            task_id=self.request.id, task_result_dict=task_results
+        )
+    return task_results
+
+
 @celery_app.task(
     bind=True,
     name="task.babysit_copr_build",
@@ -74,3 +164,18 @@ def babysit_copr_build(self, build_id: int):
     """ check status of a copr build and update it in DB """
     if not check_copr_build(build_id=build_id):
         self.retry()
+
+
+@celery_app.task(name="task.process_copr_build_completions")
+def process_copr_build_completions(build_id: int) -> Optional[dict]:
+    """ process the chroots of a copr build finished within the last window """
+    return process_queued_chroots(build_id=build_id)
+
+
+@celery_app.task(name="task.babysit_koji_build")
+def babysit_koji_build(interval: int = KOJI_BABYSIT_MIN_INTERVAL):
+    """
+    check status of all the pending koji builds and update them in DB,
+    the task schedules itself again while there are any
+    """
+    babysit_koji_builds(interval=interval)
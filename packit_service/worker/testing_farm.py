@@ -35,6 +35,7 @@ from packit.config.job_config import JobConfig
 from packit.exceptions import PackitConfigException
 from packit_service.config import ServiceConfig
 from packit_service.constants import TESTING_FARM_TRIGGER_URL
+from packit_service.http_client import get_http_session
 from packit_service.models import TFTTestRunModel, TestingFarmResult
 from packit_service.sentry_integration import send_to_sentry
 from packit_service.service.events import (
@@ -63,10 +64,8 @@ class TestingFarmJobHelper(CoprBuildJobHelper):
         job: JobConfig = None,
     ):
         super().__init__(config, package_config, project, event, job=job)
-        self.session = requests.session()
-        adapter = requests.adapters.HTTPAdapter(max_retries=5)
+        self.session = get_http_session("testing-farm")
         self.insecure = False
-        self.session.mount("https://", adapter)
         self.header: dict = {"Content-Type": "application/json"}
 
     def _trigger_payload(self, pipeline_id: str, chroot: str) -> dict:
@@ -0,0 +1,90 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Cheap pre-filtering of the messages based on their topic.
+"""
+import logging
+from collections import Counter
+from typing import Iterable, FrozenSet, Optional, Dict
+
+logger = logging.getLogger(__name__)
+
+CENTOS_MESSAGE_SOURCE = "centosmsg"
+
+
+class TopicRouter:
+    """
+    Decide whether we are interested in a message just by its topic,
+    without parsing the message (or even creating SteveJobs/sending a task).
+
+    Messages without topic (webhooks) are always accepted.
+
+    Counts accepted and dropped messages per topic
+    and logs the counters every `report_every` messages.
+    """
+
+    def __init__(
+        self,
+        fedmsg_topics: Iterable[str],
+        centos_topics: Iterable[str],
+        report_every: int = 1000,
+    ):
+        self.fedmsg_topics: FrozenSet[str] = frozenset(fedmsg_topics)
+        # topics without the instance prefix, e.g. "pull-request.new"
+        self.centos_topics: FrozenSet[str] = frozenset(centos_topics)
+        self.report_every = report_every
+        self.accepted: Counter = Counter()
+        self.dropped: Counter = Counter()
+        self.processed = 0
+
+    def is_interesting(
+        self, topic: Optional[str], source: Optional[str] = None
+    ) -> bool:
+        """
+        :param topic: topic of the message, None for webhooks
+        :param source: source of the message
+        :return: False if we are not interested in the message
+        """
+        if not topic:
+            return True
+        if source == CENTOS_MESSAGE_SOURCE:
+            # e.g. "git.stg.centos.org/pull-request.tag.added"
+            return topic.rpartition("/")[2] in self.centos_topics
+        return topic in self.fedmsg_topics
+
+    def accepts(self, topic: Optional[str], source: Optional[str] = None) -> bool:
+        """
+        Same as `is_interesting`, but the decision is counted.
+        """
+        interesting = self.is_interesting(topic=topic, source=source)
+        if topic:
+            (self.accepted if interesting else self.dropped)[topic] += 1
+            self.processed += 1
+            if self.report_every and self.processed % self.report_every == 0:
+                self.report()
+        return interesting
+
+    def get_counters(self) -> Dict[str, Dict[str, int]]:
+        return {"accepted": dict(self.accepted), "dropped": dict(self.dropped)}
+
+    def report(self):
+        logger.info(f"Messages routed by topic: {self.get_counters()}")
@@ -0,0 +1,135 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Per-job workspaces inside of the `command_handler_work_dir`.
+
+Every handler which needs the disk gets its own directory in the volume.
+Once the handler is done, the directory is renamed to the trash directory
+(which is instant) and removed in a background thread,
+so the task does not wait for the removal of the cloned repositories.
+"""
+import logging
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os import getenv
+from pathlib import Path
+from tempfile import mkdtemp
+from threading import Lock
+from typing import Optional
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+TRASH_DIR_NAME = ".trash"
+# what is older is considered to be left by a crashed task
+STALE_WORKSPACE_AGE = 24 * 60 * 60
+
+_remover: Optional[ThreadPoolExecutor] = None
+_remover_lock = Lock()
+_stale_workspaces_removed = False
+
+
+def get_remover() -> ThreadPoolExecutor:
+    global _remover
+    with _remover_lock:
+        if not _remover:
+            _remover = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="workspace-remover"
+            )
+        return _remover
+
+
+def wait_for_removals() -> None:
+    """ Block until all the trashed workspaces are removed. """
+    global _remover
+    with _remover_lock:
+        if _remover:
+            _remover.shutdown(wait=True)
+            _remover = None
+
+
+def _remove(path: Path) -> None:
+    start = time.perf_counter()
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+    logger.debug(f"{path} removed in {time.perf_counter() - start:.3f}s.")
+
+
+def empty_directory(directory: Path) -> None:
+    """ Remove the content of the directory (which can be e.g. a mounted volume). """
+    for item in directory.iterdir():
+        _remove(item)
+
+
+def create_workspace(work_dir: Path, prefix: str) -> Path:
+    return Path(mkdtemp(prefix=f"{prefix}-", dir=work_dir))
+
+
+def remove_workspace(workspace: Path) -> None:
+    """
+    Move the workspace to the trash directory and remove it in the background.
+
+    Falls back to the synchronous removal if the workspace can't be moved.
+    """
+    trash_dir = workspace.parent / TRASH_DIR_NAME
+    trashed = trash_dir / f"{workspace.name}-{uuid4().hex}"
+    try:
+        trash_dir.mkdir(exist_ok=True)
+        workspace.rename(trashed)
+    except OSError as ex:
+        logger.warning(f"Can't move {workspace} to the trash: {ex}")
+        _remove(workspace)
+        return
+    get_remover().submit(_remove, trashed)
+
+
+def remove_stale_workspaces(work_dir: Path) -> None:
+    """
+    Remove what was left in the volume by the crashed tasks.
+
+    Done once per process, the workspaces of the running tasks
+    are never that old (and the trash is safe to remove concurrently).
+    """
+    global _stale_workspaces_removed
+    if _stale_workspaces_removed:
+        return
+    _stale_workspaces_removed = True
+
+    # clean only when we are in k8s for sure
+    if not getenv("KUBERNETES_SERVICE_HOST"):
+        logger.debug("This is not a kubernetes pod, won't clean.")
+        return
+
+    threshold = time.time() - STALE_WORKSPACE_AGE
+    for item in work_dir.iterdir():
+        if item.name == TRASH_DIR_NAME:
+            for trashed in item.iterdir():
+                get_remover().submit(_remove, trashed)
+        elif item.lstat().st_mtime < threshold:
+            logger.info(f"Removing the stale {item.name!r} from the volume.")
+            remove_workspace(item)
@@ -29,6 +29,12 @@ from flexmock import flexmock
 from ogr import GithubService, GitlabService
 from packit.config import JobConfigTriggerType
 
+from packit_service import (
+    congratulations,
+    copr_build_completions,
+    copr_projects,
+    in_flight_builds,
+)
 from packit_service.config import ServiceConfig
 from packit_service.models import JobTriggerModelType
 from packit_service.service.events import (
@@ -58,6 +64,133 @@ def global_service_config():
     ServiceConfig.service_config = service_config
 
 
+class FakeRedis:
+    """
+    In-memory subset of the redis commands used by the service.
+
+    Like redis, it returns the stored values as bytes.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+        self.sorted_sets = {}
+        self.ttls = {}
+
+    @staticmethod
+    def encode(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = self.encode(value)
+        self.ttls[key] = ex
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            for data in (self.values, self.hashes, self.sorted_sets, self.ttls):
+                data.pop(key, None)
+
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[self.encode(field)] = self.encode(value)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def zadd(self, key, mapping):
+        self.sorted_sets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.sorted_sets.get(key, {}).pop(member, None)
+
+    def zscore(self, key, member):
+        return self.sorted_sets.get(key, {}).get(member)
+
+    def zremrangebyscore(self, key, min, max):
+        sorted_set = self.sorted_sets.get(key, {})
+        for member, score in list(sorted_set.items()):
+            if float(min) <= score <= float(max):
+                del sorted_set[member]
+
+    def pipeline(self, transaction=True):
+        return FakeRedisPipeline(self)
+
+
+class FakeRedisPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [
+            getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.calls
+        ]
+
+
+@pytest.fixture()
+def fake_redis():
+    return FakeRedis()
+
+
+@pytest.fixture(autouse=True)
+def in_flight_copr_builds():
+    """
+    Do not talk to redis in the tests, all the copr builds are considered ours.
+    """
+    registry = flexmock(in_flight_builds.in_flight_copr_builds)
+    registry.should_receive("add")
+    registry.should_receive("remove")
+    registry.should_receive("might_contain").and_return(True)
+    return registry
+
+
+@pytest.fixture(autouse=True)
+def known_copr_projects():
+    """
+    Do not talk to redis in the tests, no copr project is known.
+    """
+    cache = flexmock(copr_projects.known_copr_projects)
+    cache.should_receive("is_known").and_return(False)
+    cache.should_receive("add")
+    cache.should_receive("invalidate")
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def congratulated_builds():
+    """
+    Do not talk to redis in the tests, every chroot checks the PR comments.
+    """
+    builds = flexmock(congratulations.congratulated_builds)
+    builds.should_receive("claim").and_return(True)
+    builds.should_receive("release")
+    return builds
+
+
+@pytest.fixture(autouse=True)
+def queued_copr_chroots():
+    """
+    Do not talk to redis in the tests, the chroots are processed right away.
+    """
+    completions = flexmock(copr_build_completions.copr_build_completions)
+    completions.should_receive("add").and_return(None)
+    completions.should_receive("pop").and_return([])
+    return completions
+
+
 @pytest.fixture()
 def dump_http_com():
     """
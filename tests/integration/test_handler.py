@@ -31,6 +31,7 @@ from packit_service.config import ServiceConfig, PackageConfigGetter
 from packit_service.service.events import Event, TheJobTriggerType
 from packit_service.worker.handlers import JobHandler
 from packit_service.worker.handlers.github_handlers import AbstractCoprBuildHandler
+from packit_service.worker.workspace import TRASH_DIR_NAME, wait_for_removals
 
 
 @pytest.fixture()
@@ -42,15 +43,6 @@ def trick_p_s_with_k8s():
 
 def test_handler_cleanup(tmpdir, trick_p_s_with_k8s):
     t = Path(tmpdir)
-    t.joinpath("a").mkdir()
-    t.joinpath("b").write_text("a")
-    t.joinpath("c").symlink_to("b")
-    t.joinpath("d").symlink_to("a", target_is_directory=True)
-    t.joinpath("e").symlink_to("nope", target_is_directory=False)
-    t.joinpath("f").symlink_to("nopez", target_is_directory=True)
-    t.joinpath(".g").write_text("g")
-    t.joinpath(".h").symlink_to(".g", target_is_directory=False)
-
     c = ServiceConfig()
     c.command_handler_work_dir = t
     jc = JobConfig(
@@ -60,9 +52,40 @@ def test_handler_cleanup(tmpdir, trick_p_s_with_k8s):
         config=c, job_config=jc, event=Event(trigger=TheJobTriggerType.pull_request)
     )
 
+    j._prepare_workplace()
+    workspace = Path(j.config.command_handler_work_dir)
+    assert workspace.parent == t
+    assert c.command_handler_work_dir == t
+    workspace.joinpath("a").mkdir()
+    workspace.joinpath("b").write_text("a")
+    workspace.joinpath("c").symlink_to("b")
+    workspace.joinpath("d").symlink_to("a", target_is_directory=True)
+    workspace.joinpath("e").symlink_to("nope", target_is_directory=False)
+    workspace.joinpath("f").symlink_to("nopez", target_is_directory=True)
+    workspace.joinpath(".g").write_text("g")
+    workspace.joinpath(".h").symlink_to(".g", target_is_directory=False)
+
+    j._clean_workplace()
+    wait_for_removals()
+
+    assert [item.name for item in t.iterdir()] == [TRASH_DIR_NAME]
+    assert not list(t.joinpath(TRASH_DIR_NAME).iterdir())
+
+
+def test_handler_without_workspace(tmpdir):
+    t = Path(tmpdir)
+    c = ServiceConfig()
+    c.command_handler_work_dir = t
+    j = JobHandler(
+        config=c, job_config=None, event=Event(trigger=TheJobTriggerType.pull_request)
+    )
+    j.needs_workspace = False
+
+    j._prepare_workplace()
     j._clean_workplace()
 
-    assert len(list(t.iterdir())) == 0
+    assert j.config.command_handler_work_dir == t
+    assert not list(t.iterdir())
 
 
 def test_precheck(github_pr_event):
@@ -24,6 +24,7 @@ import uuid
 
 import pytest
 import requests
+from celery import Celery
 from flexmock import flexmock
 
 from ogr.abstract import CommitStatus
@@ -33,7 +34,7 @@ from packit.config import JobConfig, JobType, JobConfigTriggerType
 from packit.config.job_config import JobMetadataConfig
 from packit.config.package_config import PackageConfig
 from packit.local_project import LocalProject
-from packit_service.config import PackageConfigGetter
+from packit_service.config import PackageConfigGetter, ServiceConfig
 from packit_service.constants import TESTING_FARM_TRIGGER_URL
 from packit_service.models import (
     CoprBuildModel,
@@ -42,10 +43,15 @@ from packit_service.models import (
     JobTriggerModelType,
 )
 from packit_service.service.events import CoprBuildEvent
+from packit_service.worker.build.copr_build_end import (
+    get_chroot_events,
+    process_queued_chroots,
+)
 from packit_service.service.urls import get_copr_build_log_url_from_flask
 from packit_service.worker.build.copr_build import CoprBuildJobHelper
 from packit_service.worker.handlers import CoprBuildEndHandler
 from packit_service.worker.jobs import SteveJobs
+from packit_service.worker.parser import Parser
 from packit_service.worker.reporting import StatusReporter
 from packit_service.worker.testing_farm import TestingFarmJobHelper
 from tests.conftest import copr_build_model
@@ -177,6 +183,137 @@ def test_copr_build_end(
     steve.process_message(copr_build_end)
 
 
+def test_copr_build_end_already_congratulated(
+    copr_build_end, pc_build_pr, copr_build_pr, congratulated_builds
+):
+    steve = SteveJobs()
+    flexmock(GithubProject).should_receive("is_private").and_return(False)
+    pc_build_pr.notifications.pull_request.successful_build = True
+    flexmock(CoprBuildEvent).should_receive("get_package_config").and_return(
+        pc_build_pr
+    )
+    # another chroot of the build has already checked the comments
+    congratulated_builds.should_receive("claim").and_return(False)
+    flexmock(GithubProject).should_receive("get_pr_comments").never()
+    flexmock(GithubProject).should_receive("pr_comment").never()
+    flexmock(CoprBuildModel).should_receive("get_by_build_id").and_return(copr_build_pr)
+    copr_build_pr.should_receive("set_status").with_args("success")
+    copr_build_pr.should_receive("set_end_time").once()
+    flexmock(requests).should_receive("get").and_return(requests.Response())
+    flexmock(requests.Response).should_receive("raise_for_status").and_return(None)
+    flexmock(StatusReporter).should_receive("report").once()
+
+    # skip testing farm
+    flexmock(CoprBuildJobHelper).should_receive("job_tests").and_return(None)
+
+    steve.process_message(copr_build_end)
+
+
+def test_copr_build_end_queued(
+    copr_build_end, pc_build_pr, copr_build_pr, queued_copr_chroots, monkeypatch
+):
+    monkeypatch.setattr(ServiceConfig.get_service_config(), "copr_build_end_window", 5)
+    steve = SteveJobs()
+    flexmock(GithubProject).should_receive("is_private").and_return(False)
+    flexmock(CoprBuildEvent).should_receive("get_package_config").and_return(
+        pc_build_pr
+    )
+    flexmock(CoprBuildModel).should_receive("get_by_build_id").and_return(copr_build_pr)
+    queued_copr_chroots.should_receive("add").with_args(
+        1044215, CHROOT, dict
+    ).and_return(True).once()
+    flexmock(Celery).should_receive("send_task").with_args(
+        "task.process_copr_build_completions",
+        kwargs={"build_id": 1044215},
+        countdown=5,
+    ).once()
+    # only the build status of the chroot is reported right away
+    flexmock(StatusReporter).should_receive("report").with_args(
+        state=CommitStatus.success,
+        description="RPMs were built successfully.",
+        url=get_copr_build_log_url_from_flask(1),
+        check_names=EXPECTED_BUILD_CHECK_NAME,
+    ).once()
+    flexmock(GithubProject).should_receive("pr_comment").never()
+    copr_build_pr.should_receive("set_status").never()
+    copr_build_pr.should_receive("set_end_time").never()
+
+    steve.process_message(copr_build_end)
+
+
+def test_process_queued_chroots(copr_build_end, copr_build_pr, queued_copr_chroots):
+    config = PackageConfig(
+        jobs=[
+            JobConfig(
+                type=JobType.copr_build,
+                trigger=JobConfigTriggerType.pull_request,
+                metadata=JobMetadataConfig(targets=["fedora-all"]),
+            ),
+            JobConfig(
+                type=JobType.tests,
+                trigger=JobConfigTriggerType.pull_request,
+                metadata=JobMetadataConfig(targets=["fedora-all"]),
+            ),
+        ]
+    )
+    flexmock(CoprBuildEvent).should_receive("get_package_config").and_return(config)
+    flexmock(GithubProject).should_receive("is_private").and_return(False)
+    flexmock(CoprBuildModel).should_receive("get_by_build_id").and_return(copr_build_pr)
+    flexmock(CoprBuildEvent).should_receive("db_trigger").and_return(
+        flexmock(job_config_trigger_type=JobConfigTriggerType.pull_request)
+    )
+    succeeded = Parser.parse_copr_event(copr_build_end).to_dict()
+    failed = {**succeeded, "chroot": "fedora-31-x86_64", "status": 2}
+    queued_copr_chroots.should_receive("pop").with_args(1044215).and_return(
+        [succeeded, failed]
+    )
+
+    flexmock(CoprBuildModel).should_receive("set_chroots_finished").with_args(
+        1044215, {CHROOT: ("success", None), "fedora-31-x86_64": ("failure", None)}
+    ).and_return({CHROOT: 1, "fedora-31-x86_64": 2}).once()
+    flexmock(StatusReporter).should_receive("report").with_args(
+        state=CommitStatus.pending,
+        description="RPMs were built successfully.",
+        url=get_copr_build_log_url_from_flask(1),
+        check_names=EXPECTED_TESTING_FARM_CHECK_NAME,
+    ).once()
+    flexmock(StatusReporter).should_receive("report").with_args(
+        state=CommitStatus.failure,
+        description="RPMs failed to be built.",
+        url=get_copr_build_log_url_from_flask(2),
+        check_names="packit-stg/testing-farm-fedora-31-x86_64",
+    ).once()
+    # one comment and one test run for the whole build
+    flexmock(CoprBuildEndHandler).should_receive(
+        "was_last_packit_comment_with_congratulation"
+    ).and_return(False).once()
+    flexmock(GithubProject).should_receive("pr_comment").once()
+    flexmock(CoprBuildEndHandler).should_receive("run_testing_farm").with_args(
+        CoprBuildJobHelper, CoprBuildEvent
+    ).once()
+
+    result = process_queued_chroots(1044215)
+
+    assert not result["success"]
+    assert result["details"]["chroots"] == ["fedora-31-x86_64"]
+
+
+def test_get_chroot_events(copr_build_end, pc_build_pr, copr_build_pr):
+    flexmock(CoprBuildEvent).should_receive("get_package_config").and_return(
+        pc_build_pr
+    )
+    flexmock(CoprBuildModel).should_receive("get_by_build_id").and_return(copr_build_pr)
+    succeeded = Parser.parse_copr_event(copr_build_end).to_dict()
+    failed = {**succeeded, "chroot": "fedora-31-x86_64", "status": 2}
+
+    first, second = get_chroot_events([succeeded, failed])
+
+    assert (first.chroot, first.status) == (CHROOT, 1)
+    assert (second.chroot, second.status) == ("fedora-31-x86_64", 2)
+    # the build-level data is shared by all the chroots of the build
+    assert second.build is first.build is copr_build_pr
+
+
 def test_copr_build_end_push(copr_build_end, pc_build_push, copr_build_branch_push):
     steve = SteveJobs()
     flexmock(GithubProject).should_receive("is_private").and_return(False)
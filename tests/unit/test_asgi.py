@@ -0,0 +1,217 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import hmac
+import json
+from hashlib import sha1
+from http import HTTPStatus
+
+import pytest
+from flexmock import flexmock
+
+from packit_service.service import asgi
+from packit_service.service.asgi import WebhookIngestion
+from packit_service.service.spool import WebhookSpool
+from tests.spellbook import DATA_DIR
+
+
+@pytest.fixture()
+def config():
+    return flexmock(
+        webhook_secret="testing-secret",
+        validate_webhooks=True,
+        webhook_spool_path=None,
+        webhook_batch_delay=0.01,
+    )
+
+
+@pytest.fixture()
+def pr_payload() -> bytes:
+    return (DATA_DIR / "webhooks" / "github" / "pr.json").read_bytes()
+
+
+def sign(payload: bytes) -> str:
+    return "sha1=" + hmac.new(b"testing-secret", payload, sha1).hexdigest()
+
+
+async def call(app, path, body=b"", headers=None, method="POST"):
+    """ Do one HTTP request to the ASGI app, return status, headers and body. """
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [
+            (key.lower().encode(), value.encode())
+            for key, value in (headers or {}).items()
+        ],
+    }
+    await app(scope, receive, send)
+    return (
+        sent[0]["status"],
+        dict(sent[0]["headers"]),
+        json.loads(sent[1]["body"]),
+    )
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def test_github_webhook_published(config, pr_payload):
+    published = []
+    app = WebhookIngestion(config=config, buffer_size=10, publish=published.append)
+
+    async def scenario():
+        response = await call(
+            app,
+            "/api/webhooks/github",
+            body=pr_payload,
+            headers={
+                "X-Hub-Signature": sign(pr_payload),
+                "X-GitHub-Event": "pull_request",
+            },
+        )
+        await app.stop()
+        return response
+
+    status, _, text = run(scenario())
+    assert status == HTTPStatus.ACCEPTED
+    assert text == "Webhook accepted. We thank you, Github."
+    assert published == [[json.loads(pr_payload)]]
+
+
+@pytest.mark.parametrize(
+    "path,method,body,headers,status",
+    [
+        pytest.param("/api/webhooks/nope", "POST", b"{}", {}, 404, id="not-found"),
+        pytest.param("/api/webhooks/github", "GET", b"", {}, 405, id="get"),
+        pytest.param("/api/webhooks/github", "POST", b"", {}, 400, id="no-json"),
+        pytest.param(
+            "/api/webhooks/github",
+            "POST",
+            b'{"zen": "z", "hook_id": 1, "hook": "h"}',
+            {},
+            200,
+            id="ping",
+        ),
+        pytest.param(
+            "/api/webhooks/github",
+            "POST",
+            b'{"action": "opened"}',
+            {"X-Hub-Signature": "sha1=abcdef"},
+            401,
+            id="bad-signature",
+        ),
+        pytest.param(
+            "/api/webhooks/github",
+            "POST",
+            b'{"action": "created"}',
+            {
+                "X-Hub-Signature": sign(b'{"action": "created"}'),
+                "X-GitHub-Event": "integration_installation",
+            },
+            202,
+            id="not-interested",
+        ),
+    ],
+)
+def test_not_published(config, path, method, body, headers, status):
+    app = WebhookIngestion(config=config, buffer_size=10, publish=None)
+
+    async def scenario():
+        response = await call(app, path, body, headers, method)
+        assert app.queue.empty()
+        await app.stop()
+        return response
+
+    response_status, _, _ = run(scenario())
+    assert response_status == status
+
+
+def test_full_buffer(config, pr_payload):
+    flexmock(asgi, ENQUEUE_TIMEOUT=0.01)
+    app = WebhookIngestion(config=config)
+    headers = {"X-Hub-Signature": sign(pr_payload), "X-GitHub-Event": "pull_request"}
+
+    async def scenario():
+        # no publisher is running, nothing leaves the buffer
+        app.queue = asyncio.Queue(maxsize=1)
+        app.queue.put_nowait({"already": "buffered"})
+        return await call(app, "/api/webhooks/github", pr_payload, headers)
+
+    status, response_headers, _ = run(scenario())
+    assert status == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response_headers[b"retry-after"] == b"1"
+
+
+def test_publish_retried(config, pr_payload):
+    flexmock(asgi, PUBLISH_RETRY_DELAY=0)
+    published = []
+
+    def publish(events):
+        if not published:
+            published.append(None)
+            raise ConnectionError("broker down")
+        published.append(events)
+
+    app = WebhookIngestion(config=config, buffer_size=10, publish=publish)
+    headers = {"X-Hub-Signature": sign(pr_payload), "X-GitHub-Event": "pull_request"}
+
+    async def scenario():
+        await call(app, "/api/webhooks/github", pr_payload, headers)
+        await app.stop()
+
+    run(scenario())
+    assert published == [None, [json.loads(pr_payload)]]
+
+
+def test_spooled_before_acknowledged(config, pr_payload, tmp_path):
+    spool = WebhookSpool(str(tmp_path / "webhooks.sqlite"))
+    published = []
+
+    def publish(events):
+        # the event is stored before the webhook is acknowledged
+        assert spool.count_unpublished() == 1
+        published.append(events)
+
+    app = WebhookIngestion(config=config, publish=publish, spool=spool)
+    headers = {"X-Hub-Signature": sign(pr_payload), "X-GitHub-Event": "pull_request"}
+
+    async def scenario():
+        response = await call(app, "/api/webhooks/github", pr_payload, headers)
+        await app.stop()
+        return response
+
+    status, _, _ = run(scenario())
+    assert status == HTTPStatus.ACCEPTED
+    assert app.queue is None
+    assert published == [[json.loads(pr_payload)]]
+    assert not spool.count_unpublished()
@@ -7,6 +7,7 @@ from packit.config.job_config import JobMetadataConfig
 from packit_service.service.events import TheJobTriggerType
 from packit_service.worker.build.copr_build import CoprBuildJobHelper
 from packit_service.worker.build.koji_build import KojiBuildJobHelper
+from packit_service.worker.git_mirror import GitMirrorCache
 
 STABLE_VERSIONS = ALIASES["fedora-stable"]
 STABLE_CHROOTS = {f"{version}-x86_64" for version in STABLE_VERSIONS}
@@ -353,3 +354,29 @@ def test_targets_for_koji_build(
 
     assert koji_build_handler.configured_build_targets == build_targets
     assert koji_build_handler.build_targets == koji_targets
+
+
+def test_clone_from_mirror_failure_empties_working_dir(tmp_path):
+    working_dir = tmp_path / "work"
+    working_dir.mkdir()
+
+    def partial_clone(url, working_dir, pr_id):
+        (working_dir / ".git").mkdir()
+        raise OSError("No space left on device")
+
+    flexmock(GitMirrorCache).should_receive("clone").replace_with(partial_clone)
+    helper = CoprBuildJobHelper(
+        config=flexmock(
+            git_mirror_cache_dir=str(tmp_path / "mirrors"),
+            git_mirror_cache_max_size=10 ** 9,
+            command_handler_work_dir=working_dir,
+        ),
+        package_config=PackageConfig(),
+        project=flexmock(get_git_urls=lambda: {"git": "https://github.com/a/b"}),
+        event=flexmock(pr_id=None),
+    )
+
+    assert helper._clone_from_mirror() is None
+    # LocalProject can clone into it
+    assert working_dir.is_dir()
+    assert not list(working_dir.iterdir())
@@ -62,6 +62,24 @@ def service_config_valid():
         "command_handler_k8s_namespace": "packit-test-sandbox",
         "admins": ["Dasher", "Dancer", "Vixen", "Comet", "Blitzen"],
         "server_name": "hub.packit.org",
+        "handler_concurrency": 4,
+        "fan_out_handlers": True,
+        "webhook_buffer_size": 200,
+        "webhook_batch_size": 50,
+        "webhook_batch_delay": 0.1,
+        "webhook_spool_path": "/var/lib/packit/webhooks.sqlite",
+        "srpm_log_max_size": 4096,
+        "srpm_cache_dir": "/var/cache/packit/srpms",
+        "srpm_cache_max_size": 1024,
+        "git_mirror_cache_dir": "/var/cache/packit/git",
+        "git_mirror_cache_max_size": 2048,
+        "sandbox_pool_size": 2,
+        "sandbox_pool_max_size": 5,
+        "local_srpm_namespaces": ["packit-service", "rpm-software-management/dnf"],
+        "local_srpm_workers": 4,
+        "local_srpm_timeout": 300,
+        "srpm_cache_url": "https://srpms.packit.dev",
+        "copr_build_end_window": 5,
     }
 
 
@@ -81,6 +99,27 @@ def test_parse_valid(service_config_valid):
     assert config.command_handler_work_dir == "/sandcastle"
     assert config.admins == {"Dasher", "Dancer", "Vixen", "Comet", "Blitzen"}
     assert config.server_name == "hub.packit.org"
+    assert config.handler_concurrency == 4
+    assert config.fan_out_handlers
+    assert config.webhook_buffer_size == 200
+    assert config.webhook_batch_size == 50
+    assert config.webhook_batch_delay == 0.1
+    assert config.webhook_spool_path == "/var/lib/packit/webhooks.sqlite"
+    assert config.srpm_log_max_size == 4096
+    assert config.srpm_cache_dir == "/var/cache/packit/srpms"
+    assert config.srpm_cache_max_size == 1024
+    assert config.git_mirror_cache_dir == "/var/cache/packit/git"
+    assert config.git_mirror_cache_max_size == 2048
+    assert config.sandbox_pool_size == 2
+    assert config.sandbox_pool_max_size == 5
+    assert config.local_srpm_namespaces == {
+        "packit-service",
+        "rpm-software-management/dnf",
+    }
+    assert config.local_srpm_workers == 4
+    assert config.local_srpm_timeout == 300
+    assert config.srpm_cache_url == "https://srpms.packit.dev"
+    assert config.copr_build_end_window == 5
 
 
 @pytest.fixture(scope="module")
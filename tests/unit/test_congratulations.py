@@ -0,0 +1,58 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from flexmock import flexmock
+
+from packit_service.congratulations import (
+    CONGRATULATED_BUILD_TTL,
+    CongratulatedBuilds,
+)
+
+
+def test_claim_once_per_build(fake_redis):
+    builds = CongratulatedBuilds(redis=fake_redis)
+
+    assert builds.claim(123)
+    assert not builds.claim(123)
+    assert not builds.claim("123")
+    assert builds.claim(124)
+    assert set(builds.redis.ttls.values()) == {CONGRATULATED_BUILD_TTL}
+
+
+def test_release(fake_redis):
+    builds = CongratulatedBuilds(redis=fake_redis)
+    builds.claim(123)
+
+    builds.release(123)
+
+    assert builds.claim(123)
+
+
+def test_redis_not_available():
+    redis = flexmock()
+    redis.should_receive("set").and_raise(ConnectionError)
+    redis.should_receive("delete").and_raise(ConnectionError)
+    builds = CongratulatedBuilds(redis=redis)
+
+    builds.release(123)
+    assert builds.claim(123)
+    assert builds.claim(123)
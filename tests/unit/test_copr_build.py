@@ -20,10 +20,13 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import json
-from typing import Union
+from copy import copy
+from pathlib import Path
+from typing import Union, Dict
 
 import pytest
 from celery import Celery
+from copr.v3 import CoprNoResultException
 from flexmock import flexmock
 from ogr.abstract import GitProject, CommitStatus
 from packit.api import PackitAPI
@@ -49,8 +52,13 @@ from packit_service.service.events import (
 )
 from packit_service.worker.build import copr_build
 from packit_service.worker.build.copr_build import CoprBuildJobHelper
+from packit_service.worker.build import local_srpm
+from packit_service.worker.build.local_srpm import LocalSRPMBuilder
+from packit_service.worker.build.srpm_cache import SRPMCache
+from packit_service.worker.handlers.github_handlers import PushCoprBuildHandler
 from packit_service.worker.parser import Parser
 from packit_service.worker.reporting import StatusReporter
+from packit_service.worker.result import HandlerResults
 from tests.spellbook import DATA_DIR
 
 
@@ -106,6 +114,10 @@ def build_helper(
     return handler
 
 
+def copr_builds_for_targets(targets, **_) -> Dict[str, CoprBuildModel]:
+    return {target: CoprBuildModel(id=1, target=target) for target in targets}
+
+
 def test_copr_build_check_names(github_pr_event):
     flexmock(AddPullRequestDbTrigger).should_receive("db_trigger").and_return(
         flexmock(job_config_trigger_type=JobConfigTriggerType.release)
@@ -135,8 +147,8 @@ def test_copr_build_check_names(github_pr_event):
     flexmock(SRPMBuildModel).should_receive("create").and_return(
         SRPMBuildModel(success=True)
     )
-    flexmock(CoprBuildModel).should_receive("get_or_create").and_return(
-        CoprBuildModel(id=1)
+    flexmock(CoprBuildModel).should_receive("create_for_targets").replace_with(
+        copr_builds_for_targets
     )
     flexmock(PullRequestGithubEvent).should_receive("db_trigger").and_return(flexmock())
 
@@ -189,8 +201,8 @@ def test_copr_build_success_set_test_check(github_pr_event):
     flexmock(SRPMBuildModel).should_receive("create").and_return(
         SRPMBuildModel(success=True)
     )
-    flexmock(CoprBuildModel).should_receive("get_or_create").and_return(
-        CoprBuildModel(id=1)
+    flexmock(CoprBuildModel).should_receive("create_for_targets").replace_with(
+        copr_builds_for_targets
     )
 
     flexmock(PackitAPI).should_receive("create_srpm").and_return("my.srpm")
@@ -241,8 +253,8 @@ def test_copr_build_for_branch(branch_push_event):
     flexmock(SRPMBuildModel).should_receive("create").and_return(
         SRPMBuildModel(success=True)
     )
-    flexmock(CoprBuildModel).should_receive("get_or_create").and_return(
-        CoprBuildModel(id=1)
+    flexmock(CoprBuildModel).should_receive("create_for_targets").replace_with(
+        copr_builds_for_targets
     )
     flexmock(PushGitHubEvent).should_receive("db_trigger").and_return(flexmock())
 
@@ -268,6 +280,40 @@ def test_copr_build_for_branch(branch_push_event):
     assert helper.run_copr_build()["success"]
 
 
+def test_push_build_clones_into_workspace(branch_push_event, tmp_path):
+    flexmock(AddBranchPushDbTrigger).should_receive("db_trigger").and_return(
+        flexmock(job_config_trigger_type=JobConfigTriggerType.commit)
+    )
+    job = JobConfig(
+        type=JobType.copr_build,
+        trigger=JobConfigTriggerType.commit,
+        metadata=JobMetadataConfig(
+            targets=["fedora-rawhide-x86_64"], owner="nobody", branch="build-branch"
+        ),
+    )
+    event = copy(branch_push_event)
+    event._package_config = PackageConfig(jobs=[job], downstream_package_name="dummy")
+    config = ServiceConfig()
+    config.command_handler_work_dir = str(tmp_path)
+    handler = PushCoprBuildHandler(config=config, job_config=job, event=event)
+    # the helper is created by the pre-check, before the handler has a workspace
+    assert handler.pre_check()
+
+    clone_dirs = []
+    flexmock(CoprBuildJobHelper).should_receive("run_copr_build").replace_with(
+        lambda: clone_dirs.append(
+            Path(handler.copr_build_helper.config.command_handler_work_dir)
+        )
+        or HandlerResults(success=True, details={})
+    ).once()
+    assert handler.run_n_clean()["success"]
+
+    # cloned into the workspace of the handler, not into the shared volume
+    assert clone_dirs[0].parent == tmp_path
+    assert clone_dirs[0].name.startswith("PushCoprBuildHandler-")
+    assert config.command_handler_work_dir == str(tmp_path)
+
+
 def test_copr_build_for_release(release_event):
     # status is set for each build-target (4x):
     #  - Building SRPM ...
@@ -296,8 +342,8 @@ def test_copr_build_for_release(release_event):
     flexmock(SRPMBuildModel).should_receive("create").and_return(
         SRPMBuildModel(success=True)
     )
-    flexmock(CoprBuildModel).should_receive("get_or_create").and_return(
-        CoprBuildModel(id=1)
+    flexmock(CoprBuildModel).should_receive("create_for_targets").replace_with(
+        copr_builds_for_targets
     )
 
     flexmock(PackitAPI).should_receive("create_srpm").and_return("my.srpm")
@@ -332,8 +378,8 @@ def test_copr_build_success(github_pr_event):
     flexmock(SRPMBuildModel).should_receive("create").and_return(
         SRPMBuildModel(success=True)
     )
-    flexmock(CoprBuildModel).should_receive("get_or_create").and_return(
-        CoprBuildModel(id=1)
+    flexmock(CoprBuildModel).should_receive("create_for_targets").replace_with(
+        copr_builds_for_targets
     )
     flexmock(PullRequestGithubEvent).should_receive("db_trigger").and_return(flexmock())
 
@@ -390,8 +436,8 @@ def test_copr_build_fails_in_packit(github_pr_event):
     flexmock(SRPMBuildModel).should_receive("create").and_return(
         SRPMBuildModel(success=False, id=2)
     )
-    flexmock(CoprBuildModel).should_receive("get_or_create").and_return(
-        CoprBuildModel(id=1)
+    flexmock(CoprBuildModel).should_receive("create_for_targets").replace_with(
+        copr_builds_for_targets
     )
     flexmock(sentry_integration).should_receive("send_to_sentry").and_return().once()
 
@@ -416,8 +462,8 @@ def test_copr_build_no_targets(github_pr_event):
     flexmock(SRPMBuildModel).should_receive("create").and_return(
         SRPMBuildModel(success=True)
     )
-    flexmock(CoprBuildModel).should_receive("get_or_create").and_return(
-        CoprBuildModel(id=1)
+    flexmock(CoprBuildModel).should_receive("create_for_targets").replace_with(
+        copr_builds_for_targets
     )
     flexmock(PullRequestGithubEvent).should_receive("db_trigger").and_return(flexmock())
 
@@ -441,3 +487,172 @@ def test_copr_build_no_targets(github_pr_event):
 
     flexmock(Celery).should_receive("send_task").once()
     assert helper.run_copr_build()["success"]
+
+
+def test_copr_build_cached_srpm(github_pr_event, tmp_path):
+    helper = build_helper(event=github_pr_event)
+    helper.config.srpm_cache_dir = str(tmp_path)
+    cached_srpm = tmp_path / "ab" / "abcdef" / "hello-0.1-1.src.rpm"
+    flexmock(SRPMCache).should_receive("get").and_return(cached_srpm).once()
+    flexmock(SRPMBuildModel).should_receive("get_by_cache_key").and_return(
+        SRPMBuildModel(id=3, success=True)
+    )
+    flexmock(PackitAPI).should_receive("create_srpm").never()
+    flexmock(SRPMBuildModel).should_receive("create").never()
+
+    helper.create_srpm_if_needed()
+
+    assert helper.srpm_path == cached_srpm
+    assert helper.srpm_model.id == 3
+
+
+def test_copr_build_srpm_stored_to_cache(github_pr_event, tmp_path):
+    helper = build_helper(event=github_pr_event)
+    helper.config.srpm_cache_dir = str(tmp_path)
+    cached_srpm = tmp_path / "ab" / "abcdef" / "my.src.rpm"
+    flexmock(SRPMCache).should_receive("get").and_return(None)
+    helper._api = flexmock(
+        create_srpm=lambda srpm_dir: "my.src.rpm",
+        up=flexmock(local_project=flexmock(working_dir=str(tmp_path))),
+    )
+    flexmock(SRPMCache).should_receive("put").and_return(cached_srpm).once()
+    flexmock(SRPMBuildModel).should_receive("create").with_args(
+        logs=str, success=True, cache_key=str
+    ).and_return(SRPMBuildModel(id=4, success=True))
+
+    helper.create_srpm_if_needed()
+
+    assert helper.srpm_path == cached_srpm
+
+
+def test_copr_build_srpm_created_locally(github_pr_event, tmp_path, monkeypatch):
+    helper = build_helper(event=github_pr_event)
+    helper.config.local_srpm_namespaces = {"the-example-namespace"}
+    helper._local_project = flexmock(working_dir=tmp_path)
+    flexmock(PackitAPI).should_receive("create_srpm").never()
+    monkeypatch.setattr(
+        local_srpm, "_builder", LocalSRPMBuilder(workers=0, timeout=1, max_log_size=1)
+    )
+    flexmock(LocalSRPMBuilder).should_receive("create_srpm").with_args(
+        working_dir=str(tmp_path),
+        package_config=helper.package_config,
+        srpm_dir=str(tmp_path),
+    ).and_return(tmp_path / "my.src.rpm", "packit logs\n").once()
+    flexmock(SRPMBuildModel).should_receive("create").with_args(
+        logs="packit logs\n", success=True, cache_key=None
+    ).and_return(SRPMBuildModel(id=5, success=True))
+
+    helper.create_srpm_if_needed()
+
+    assert helper.srpm_path == tmp_path / "my.src.rpm"
+
+
+def test_local_srpm_builder_policy(github_pr_event):
+    helper = build_helper(event=github_pr_event)
+    assert not helper._use_local_srpm_builder()
+    helper.config.local_srpm_namespaces = {"the-example-namespace"}
+    assert helper._use_local_srpm_builder()
+    helper.config.local_srpm_namespaces = {"the-example-namespace/the-example-repo"}
+    assert helper._use_local_srpm_builder()
+    helper.config.local_srpm_namespaces = {"the-example-namespace/other-repo"}
+    assert not helper._use_local_srpm_builder()
+
+
+def copr_client_creating_build():
+    build_proxy = flexmock()
+    build_proxy.should_receive("create_from_file").with_args(
+        ownername="nobody",
+        projectname="the-example-namespace-the-example-repo-342-stg",
+        path="my.srpm",
+        buildopts=dict,
+    ).and_return(flexmock(id=2))
+    return flexmock(
+        config={"copr_url": "https://copr.fedorainfracloud.org"},
+        build_proxy=build_proxy,
+    )
+
+
+def test_copr_build_known_project(github_pr_event, known_copr_projects):
+    helper = build_helper(
+        event=github_pr_event,
+        metadata=JobMetadataConfig(targets=["bright-future-x86_64"], owner="nobody"),
+    )
+    helper._srpm_path = "my.srpm"
+    flexmock(known_copr_projects).should_receive("is_known").with_args(
+        "nobody",
+        "the-example-namespace-the-example-repo-342-stg",
+        ["bright-future-x86_64"],
+    ).and_return(True)
+    flexmock(CoprHelper).should_receive("create_copr_project_if_not_exists").never()
+    flexmock(CoprHelper).should_receive("get_copr_client").and_return(
+        copr_client_creating_build()
+    )
+
+    assert helper.run_build() == (
+        2,
+        "https://copr.fedorainfracloud.org/coprs/build/2/",
+    )
+
+
+def test_copr_build_unknown_project(github_pr_event, known_copr_projects):
+    helper = build_helper(
+        event=github_pr_event,
+        metadata=JobMetadataConfig(targets=["bright-future-x86_64"], owner="nobody"),
+    )
+    helper._srpm_path = "my.srpm"
+    flexmock(CoprHelper).should_receive("create_copr_project_if_not_exists").once()
+    flexmock(known_copr_projects).should_receive("add").with_args(
+        "nobody",
+        "the-example-namespace-the-example-repo-342-stg",
+        ["bright-future-x86_64"],
+    ).once()
+    flexmock(CoprHelper).should_receive("get_copr_client").and_return(
+        copr_client_creating_build()
+    )
+
+    assert helper.run_build()[0] == 2
+
+
+def test_copr_build_known_project_invalidated(github_pr_event, known_copr_projects):
+    helper = build_helper(
+        event=github_pr_event,
+        metadata=JobMetadataConfig(targets=["bright-future-x86_64"], owner="nobody"),
+    )
+    helper._srpm_path = "my.srpm"
+    flexmock(known_copr_projects).should_receive("is_known").and_return(True)
+    flexmock(known_copr_projects).should_receive("invalidate").with_args(
+        "nobody", "the-example-namespace-the-example-repo-342-stg"
+    ).once()
+    build_proxy = flexmock()
+    build_proxy.should_receive("create_from_file").and_raise(
+        CoprNoResultException("project not found")
+    )
+    flexmock(CoprHelper).should_receive("get_copr_client").and_return(
+        flexmock(config={}, build_proxy=build_proxy)
+    )
+
+    with pytest.raises(CoprNoResultException):
+        helper.run_build()
+
+
+def test_copr_build_srpm_downloaded_by_copr(github_pr_event, tmp_path):
+    helper = build_helper(
+        event=github_pr_event,
+        metadata=JobMetadataConfig(targets=["bright-future-x86_64"], owner="nobody"),
+    )
+    helper.config.srpm_cache_dir = str(tmp_path)
+    helper.config.srpm_cache_url = "https://srpms.packit.dev"
+    helper._srpm_path = tmp_path / "ab" / "abcdef" / "my.src.rpm"
+    flexmock(CoprHelper).should_receive("create_copr_project_if_not_exists")
+    build_proxy = flexmock()
+    build_proxy.should_receive("create_from_file").never()
+    build_proxy.should_receive("create_from_url").with_args(
+        ownername="nobody",
+        projectname="the-example-namespace-the-example-repo-342-stg",
+        url="https://srpms.packit.dev/ab/abcdef/my.src.rpm",
+    ).and_return(flexmock(id=2)).once()
+    flexmock(CoprHelper).should_receive("get_copr_client").and_return(
+        flexmock(config={}, build_proxy=build_proxy)
+    )
+
+    assert helper.run_build()[0] == 2
@@ -0,0 +1,63 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from flexmock import flexmock
+
+from packit_service.copr_build_completions import (
+    COPR_BUILD_COMPLETIONS_TTL,
+    CoprBuildCompletions,
+)
+
+
+def test_first_chroot_schedules(fake_redis):
+    completions = CoprBuildCompletions(redis=fake_redis)
+
+    assert completions.add(42, "fedora-32-x86_64", {"chroot": "fedora-32-x86_64"})
+    assert (
+        completions.add(42, "fedora-31-x86_64", {"chroot": "fedora-31-x86_64"}) is False
+    )
+    assert completions.add(43, "fedora-32-x86_64", {"chroot": "fedora-32-x86_64"})
+    assert set(completions.redis.ttls.values()) == {COPR_BUILD_COMPLETIONS_TTL}
+
+
+def test_pop(fake_redis):
+    completions = CoprBuildCompletions(redis=fake_redis)
+    completions.add(42, "fedora-32-x86_64", {"chroot": "fedora-32-x86_64"})
+    completions.add(42, "fedora-31-x86_64", {"chroot": "fedora-31-x86_64"})
+    # the same message once more
+    completions.add(42, "fedora-32-x86_64", {"chroot": "fedora-32-x86_64"})
+
+    assert completions.pop(42) == [
+        {"chroot": "fedora-31-x86_64"},
+        {"chroot": "fedora-32-x86_64"},
+    ]
+    assert completions.pop(42) == []
+    # a chroot finished later schedules the processing again
+    assert completions.add(42, "fedora-rawhide-x86_64", {})
+
+
+def test_redis_not_available():
+    redis = flexmock()
+    redis.should_receive("hset").and_raise(ConnectionError)
+    completions = CoprBuildCompletions(redis=redis)
+
+    assert completions.add(42, "fedora-32-x86_64", {}) is None
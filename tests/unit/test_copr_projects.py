@@ -0,0 +1,63 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from flexmock import flexmock
+
+from packit_service.copr_projects import (
+    KNOWN_COPR_PROJECT_TTL,
+    KnownCoprProjects,
+)
+
+
+def test_known_project(fake_redis):
+    cache = KnownCoprProjects(redis=fake_redis)
+    assert not cache.is_known("packit", "hello-world", ["fedora-32-x86_64"])
+
+    cache.add("packit", "hello-world", ["fedora-32-x86_64", "fedora-31-x86_64"])
+
+    assert cache.is_known(
+        "packit", "hello-world", ["fedora-31-x86_64", "fedora-32-x86_64"]
+    )
+    assert not cache.is_known("packit", "hello-world", ["fedora-32-x86_64"])
+    assert not cache.is_known("packit", "other-project", ["fedora-32-x86_64"])
+    assert not cache.is_known("someone", "hello-world", ["fedora-32-x86_64"])
+    assert set(cache.redis.ttls.values()) == {KNOWN_COPR_PROJECT_TTL}
+
+
+def test_invalidate(fake_redis):
+    cache = KnownCoprProjects(redis=fake_redis)
+    cache.add("packit", "hello-world", ["fedora-32-x86_64"])
+
+    cache.invalidate("packit", "hello-world")
+
+    assert not cache.is_known("packit", "hello-world", ["fedora-32-x86_64"])
+
+
+def test_redis_not_available():
+    redis = flexmock()
+    redis.should_receive("get").and_raise(ConnectionError)
+    redis.should_receive("set").and_raise(ConnectionError)
+    redis.should_receive("delete").and_raise(ConnectionError)
+    cache = KnownCoprProjects(redis=redis)
+
+    cache.add("packit", "hello-world", ["fedora-32-x86_64"])
+    cache.invalidate("packit", "hello-world")
+    assert not cache.is_known("packit", "hello-world", ["fedora-32-x86_64"])
@@ -38,7 +38,12 @@ from packit_service.config import (
     ServiceConfig,
     PackageConfigGetter,
 )
-from packit_service.models import CoprBuildModel, TFTTestRunModel, PullRequestModel
+from packit_service.models import (
+    CoprBuildModel,
+    TFTTestRunModel,
+    PullRequestModel,
+    GitBranchModel,
+)
 from packit_service.service.events import (
     WhitelistStatus,
     InstallationEvent,
@@ -62,12 +67,29 @@ from packit_service.service.events import (
     PullRequestLabelPagureEvent,
     MergeRequestGitlabEvent,
     GitlabEventAction,
+    NOT_SERIALIZED_EVENT_ATTRIBUTES,
 )
 from packit_service.worker.parser import Parser, CentosEventParser
 from tests.conftest import copr_build_model
 from tests.spellbook import DATA_DIR
 
 
+def assert_event_round_trip(event_object):
+    # events are compact (`__slots__`)
+    assert not hasattr(event_object, "__dict__")
+
+    event_dict = event_object.to_dict()
+    assert json.loads(json.dumps(event_dict)) == event_dict
+
+    restored = type(event_object).from_dict(event_dict)
+    assert restored.to_dict() == event_dict
+    assert restored.created_at.timestamp() == int(event_object.created_at.timestamp())
+    restored_attributes = restored.get_attributes()
+    for key, value in event_object.get_attributes().items():
+        if key not in NOT_SERIALIZED_EVENT_ATTRIBUTES and key != "created_at":
+            assert restored_attributes[key] == value, key
+
+
 @pytest.fixture(scope="module")
 def copr_build_results_start():
     with open(DATA_DIR / "fedmsg" / "copr_build_start.json") as outfile:
@@ -459,6 +481,26 @@ class TestEvents:
 
         assert event_object.package_config
 
+    def test_db_trigger_is_resolved_once(self, github_push_branch):
+        event_object = Parser.parse_event(github_push_branch)
+
+        git_branch = GitBranchModel(name="build-branch")
+        flexmock(GitBranchModel).should_receive("get_or_create").with_args(
+            branch_name="build-branch",
+            namespace="packit-service",
+            repo_name="hello-world",
+            project_url="https://github.com/packit-service/hello-world",
+        ).and_return(git_branch).twice()
+
+        assert event_object.db_trigger == git_branch
+        assert event_object.db_trigger == git_branch
+        assert event_object.db_trigger_resolutions == 1
+        assert "_db_trigger" not in event_object.get_dict()
+
+        event_object.invalidate_db_trigger()
+        assert event_object.db_trigger == git_branch
+        assert event_object.db_trigger_resolutions == 2
+
     def test_parse_testing_farm_results(self, testing_farm_results):
         flexmock(TFTTestRunModel).should_receive("get_by_pipeline_id").and_return(
             flexmock(
@@ -715,6 +757,44 @@ class TestEvents:
         assert json.dumps(event_object.tests)
         assert json.dumps(event_object.result)
 
+    @pytest.mark.parametrize(
+        "path",
+        [
+            "webhooks/github/installation_added.json",
+            "webhooks/github/installation_created.json",
+            "webhooks/github/issue_propose_update.json",
+            "webhooks/github/pr.json",
+            "webhooks/github/pr_comment_copr_build.json",
+            "webhooks/github/push.json",
+            "webhooks/github/push_branch.json",
+            "webhooks/github/release.json",
+            "webhooks/gitlab/mr_event.json",
+            "webhooks/gitlab/mr_update_event.json",
+            "webhooks/testing_farm/results.json",
+            "webhooks/testing_farm/results_error.json",
+            "fedmsg/distgit_commit.json",
+        ],
+    )
+    def test_event_dict_round_trip(self, path):
+        with open(DATA_DIR / path) as outfile:
+            event_object = Parser.parse_event(json.load(outfile))
+
+        assert_event_round_trip(event_object)
+
+    def test_copr_build_event_dict_round_trip(
+        self, copr_build_results_end, copr_build_pr
+    ):
+        flexmock(CoprBuildModel).should_receive("get_by_build_id").and_return(
+            copr_build_pr
+        )
+        event_object = Parser.parse_event(copr_build_results_end)
+        event_dict = event_object.to_dict()
+        assert "build" not in event_dict
+
+        restored = CoprBuildEvent.from_dict(event_dict)
+        assert restored.build == copr_build_pr
+        assert restored.to_dict() == event_dict
+
 
 class TestCentOSEventParser:
     @classmethod
@@ -1033,3 +1113,18 @@ class TestCentOSEventParser:
             "https://git.stg.centos.org/source-git/packit-hello-world"
         )
         assert event_object.package_config
+
+    @pytest.mark.parametrize(
+        "path",
+        [
+            "centosmsg/pull-request.new.json",
+            "centosmsg/pull-request.updated.json",
+            "centosmsg/pull-request.comment.added.json",
+            "centosmsg/pull-request.tag.added.json",
+        ],
+    )
+    def test_event_dict_round_trip(self, path):
+        with open(DATA_DIR / path) as outfile:
+            event_object = CentosEventParser().parse_event(json.load(outfile))
+
+        assert_event_round_trip(event_object)
@@ -0,0 +1,110 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+from pathlib import Path
+
+import git
+import pytest
+
+from packit_service.worker.git_mirror import GitMirrorCache
+
+
+@pytest.fixture()
+def upstream(tmp_path):
+    repo = git.Repo.init(tmp_path / "upstream")
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "Packit")
+        config.set_value("user", "email", "packit@example.com")
+    commit(repo, "README")
+    return repo
+
+
+@pytest.fixture()
+def cache(tmp_path):
+    return GitMirrorCache(directory=str(tmp_path / "mirrors"), max_size=10 ** 9)
+
+
+def commit(repo: git.Repo, file_name: str) -> str:
+    (Path(repo.working_tree_dir) / file_name).write_text(file_name)
+    repo.index.add([file_name])
+    return repo.index.commit(f"add {file_name}").hexsha
+
+
+def test_clone_and_fetch(tmp_path, upstream, cache):
+    url = upstream.working_tree_dir
+
+    first = cache.clone(url=url, working_dir=tmp_path / "job1")
+    assert (tmp_path / "job1" / "README").read_text() == "README"
+    assert first.remote().url == url
+    assert (cache.get_mirror_path(url) / "HEAD").is_file()
+
+    new_commit = commit(upstream, "new-file")
+    second = cache.clone(url=url, working_dir=tmp_path / "job2")
+    assert second.head.commit.hexsha == new_commit
+
+
+def test_pr_ref_fetched(tmp_path, upstream, cache):
+    url = upstream.working_tree_dir
+    pr_commit = commit(upstream, "pr-file")
+    upstream.git.update_ref("refs/pull/1/head", pr_commit)
+    upstream.git.reset("--hard", "HEAD~1")
+
+    cache.clone(url=url, working_dir=tmp_path / "job", pr_id=1)
+
+    mirror = git.Repo(cache.get_mirror_path(url))
+    assert mirror.git.rev_parse("refs/pull/1/head") == pr_commit
+
+
+def test_missing_pr_ref_ignored(tmp_path, upstream, cache):
+    url = upstream.working_tree_dir
+    repo = cache.clone(url=url, working_dir=tmp_path / "job", pr_id=42)
+    assert repo.head.commit.hexsha == upstream.head.commit.hexsha
+
+
+def test_lru_eviction(tmp_path, upstream, cache):
+    url = upstream.working_tree_dir
+    other_url = str(tmp_path / "other")
+    upstream.clone(other_url)
+    cache.clone(url=url, working_dir=tmp_path / "job1")
+    cache.clone(url=other_url, working_dir=tmp_path / "job2")
+    os.utime(cache.get_mirror_path(url), (0, 0))
+
+    cache.max_size = 1
+    cache.evict()
+
+    assert not cache.get_mirror_path(url).exists()
+    # still over the quota, but the last one is removed as well
+    assert not cache.get_mirror_path(other_url).exists()
+
+
+def test_eviction_skips_locked_mirror(tmp_path, upstream, cache):
+    url = upstream.working_tree_dir
+    cache.clone(url=url, working_dir=tmp_path / "job")
+    mirror_path = cache.get_mirror_path(url)
+
+    cache.max_size = 0
+    with cache.lock(mirror_path):
+        cache.evict()
+    assert mirror_path.exists()
+
+    cache.evict()
+    assert not mirror_path.exists()
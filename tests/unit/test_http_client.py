@@ -0,0 +1,61 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from flexmock import flexmock
+from requests import Session
+
+from packit_service import http_client
+from packit_service.http_client import (
+    get_http_session,
+    close_http_sessions,
+    DEFAULT_TIMEOUT,
+)
+
+
+def test_get_http_session_is_shared():
+    close_http_sessions()
+    session = get_http_session("testing-farm")
+    assert get_http_session("testing-farm") is session
+    assert get_http_session("something-else") is not session
+
+    close_http_sessions()
+    assert not http_client._sessions
+    assert get_http_session("testing-farm") is not session
+
+
+def test_session_adapter():
+    adapter = get_http_session("testing-farm").get_adapter("https://example.com")
+    assert adapter.max_retries.total == http_client.RETRY_TOTAL
+    assert adapter._pool_maxsize == http_client.POOL_MAXSIZE
+
+
+def test_default_timeout():
+    flexmock(Session).should_receive("request").with_args(
+        "GET", "https://example.com", timeout=DEFAULT_TIMEOUT
+    ).once()
+    flexmock(Session).should_receive("request").with_args(
+        "GET", "https://example.com", timeout=5
+    ).once()
+
+    session = get_http_session("testing-farm")
+    session.request("GET", "https://example.com")
+    session.request("GET", "https://example.com", timeout=5)
@@ -0,0 +1,151 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from datetime import datetime, timedelta
+from time import time
+
+from flexmock import flexmock
+
+from packit_service.in_flight_builds import (
+    InFlightCoprBuilds,
+    IN_FLIGHT_BUILDS_KEY,
+    IN_FLIGHT_BUILDS_SYNCED_KEY,
+    IN_FLIGHT_BUILDS_TTL,
+)
+from packit_service.models import CoprBuildModel
+from packit_service.service.events import CoprBuildEvent
+
+
+def test_add_and_remove(fake_redis):
+    registry = InFlightCoprBuilds(redis=fake_redis)
+    registry.redis.set(IN_FLIGHT_BUILDS_SYNCED_KEY, 1)
+
+    registry.add(1044215, ["fedora-rawhide-x86_64", "fedora-32-x86_64"])
+    assert registry.might_contain(1044215, "fedora-rawhide-x86_64")
+    assert registry.might_contain("1044215", "fedora-32-x86_64")
+    assert not registry.might_contain(1044215, "srpm-builds")
+    assert not registry.might_contain(1, "fedora-rawhide-x86_64")
+
+    registry.remove(1044215, "fedora-rawhide-x86_64")
+    assert not registry.might_contain(1044215, "fedora-rawhide-x86_64")
+    assert registry.might_contain(1044215, "fedora-32-x86_64")
+
+
+def test_lost_builds_expire(fake_redis):
+    registry = InFlightCoprBuilds(redis=fake_redis)
+    # the end message of this build was lost a long time ago
+    registry.redis.zadd(
+        IN_FLIGHT_BUILDS_KEY,
+        {"123:fedora-32-x86_64": time() - IN_FLIGHT_BUILDS_TTL - 60},
+    )
+    registry.add(456, ["fedora-32-x86_64"])
+    flexmock(CoprBuildModel).should_receive("get_all_by_status").and_return([])
+
+    assert not registry.might_contain(123, "fedora-32-x86_64")
+    assert registry.might_contain(456, "fedora-32-x86_64")
+    assert set(registry.redis.sorted_sets[IN_FLIGHT_BUILDS_KEY]) == {
+        "456:fedora-32-x86_64"
+    }
+
+
+def test_synced_registry_is_one_lookup():
+    redis = flexmock()
+    # synced by another process
+    redis.should_receive("set").and_return(None).once()
+    redis.should_receive("zscore").and_return(None).times(2)
+    redis.should_receive("zremrangebyscore").never()
+    registry = InFlightCoprBuilds(redis=redis)
+
+    assert not registry.might_contain(123, "fedora-32-x86_64")
+    assert not registry.might_contain(456, "fedora-32-x86_64")
+
+
+def test_sync_with_database(fake_redis):
+    registry = InFlightCoprBuilds(redis=fake_redis)
+    now = datetime.utcnow()
+    flexmock(CoprBuildModel).should_receive("get_all_by_status").with_args(
+        "pending"
+    ).and_return(
+        [
+            flexmock(
+                build_id="123", target="fedora-32-x86_64", build_submitted_time=now
+            ),
+            # pending forever, we missed the end message
+            flexmock(
+                build_id="456",
+                target="fedora-32-x86_64",
+                build_submitted_time=now - timedelta(days=30),
+            ),
+        ]
+    ).once()
+
+    assert registry.might_contain(123, "fedora-32-x86_64")
+    assert not registry.might_contain(456, "fedora-32-x86_64")
+    assert not registry.might_contain(789, "fedora-32-x86_64")
+    assert set(registry.redis.sorted_sets[IN_FLIGHT_BUILDS_KEY]) == {
+        "123:fedora-32-x86_64"
+    }
+
+    # synced again once the synced flag expires
+    registry.redis.delete(IN_FLIGHT_BUILDS_SYNCED_KEY)
+    registry.next_sync_check = 0.0
+    flexmock(CoprBuildModel).should_receive("get_all_by_status").and_return([]).once()
+    assert registry.might_contain(123, "fedora-32-x86_64")
+
+
+def test_failed_sync_is_retried(fake_redis):
+    registry = InFlightCoprBuilds(redis=fake_redis)
+    flexmock(CoprBuildModel).should_receive("get_all_by_status").and_raise(
+        ConnectionError
+    ).and_return([])
+
+    # we can't say, let the database decide
+    assert registry.might_contain(123, "fedora-32-x86_64")
+    assert IN_FLIGHT_BUILDS_SYNCED_KEY not in registry.redis.values
+    assert not registry.might_contain(123, "fedora-32-x86_64")
+
+
+def test_redis_unavailable():
+    redis = flexmock()
+    redis.should_receive("set").and_raise(ConnectionError)
+    redis.should_receive("zadd").and_raise(ConnectionError)
+    registry = InFlightCoprBuilds(redis=redis)
+
+    registry.add(123, ["fedora-32-x86_64"])
+    # we can't say, let the database decide
+    assert registry.might_contain(123, "fedora-32-x86_64")
+
+
+def test_foreign_build_rejected_without_db(in_flight_copr_builds):
+    in_flight_copr_builds.should_receive("might_contain").and_return(False)
+    flexmock(CoprBuildModel).should_receive("get_by_build_id").never()
+
+    assert not CoprBuildEvent.from_build_id(
+        topic="org.fedoraproject.prod.copr.build.end",
+        build_id=123,
+        chroot="fedora-32-x86_64",
+        status=1,
+        owner="someone",
+        project_name="something",
+        pkg="foo",
+        timestamp=1583916596.0,
+    )
@@ -20,6 +20,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from itertools import product
+
 import pytest
 from flexmock import flexmock
 
@@ -39,9 +41,19 @@ from packit_service.worker.handlers.github_handlers import (
     PushCoprBuildHandler,
     ReleaseGithubKojiBuildHandler,
 )
+from packit_service.trigger_mapping import (
+    is_trigger_matching_job_config,
+    are_job_types_same,
+)
+from packit_service.worker.handlers.abstract import (
+    MAP_EVENT_TRIGGER_TO_HANDLERS,
+    MAP_HANDLER_TO_JOB_TYPES,
+    MAP_REQUIRED_JOB_TO_HANDLERS,
+)
 from packit_service.worker.jobs import (
     get_handlers_for_event,
     get_config_for_handler_kls,
+    HANDLER_TOPICS,
 )
 
 
@@ -677,3 +689,140 @@ def test_get_config_for_handler_kls(handler_kls, event, jobs, result_job_config)
         handler_kls=handler_kls, event=event, package_config=flexmock(jobs=jobs),
     )
     assert job_config == result_job_config
+
+
+def _matching_handlers_by_loops(event, package_config):
+    """
+    The straightforward implementation the dispatch plan has to be equivalent to.
+    """
+    handlers = set()
+    for job in package_config.jobs:
+        if (
+            event.db_trigger and event.db_trigger.job_config_trigger_type == job.trigger
+        ) or is_trigger_matching_job_config(trigger=event.trigger, job_config=job):
+            for pos_handler in MAP_EVENT_TRIGGER_TO_HANDLERS.get(event.trigger, set()):
+                if job.type in MAP_HANDLER_TO_JOB_TYPES.get(pos_handler, set()):
+                    handlers.add(pos_handler)
+        for pos_handler in MAP_REQUIRED_JOB_TO_HANDLERS.get(job.type, set()):
+            if event.trigger in pos_handler.triggers:
+                handlers.add(pos_handler)
+    return handlers
+
+
+def _matching_configs_by_loops(handler_kls, event, package_config):
+    """
+    The straightforward implementation the dispatch plan has to be equivalent to.
+    """
+    jobs_that_can_be_triggered = [
+        job
+        for job in package_config.jobs
+        if (
+            event.db_trigger and event.db_trigger.job_config_trigger_type == job.trigger
+        )
+        or is_trigger_matching_job_config(trigger=event.trigger, job_config=job)
+    ]
+    matching_jobs = []
+    for job in jobs_that_can_be_triggered:
+        if (
+            any(
+                are_job_types_same(job.type, type)
+                for type in MAP_HANDLER_TO_JOB_TYPES.get(handler_kls, set())
+            )
+            and job not in matching_jobs
+        ):
+            matching_jobs.append(job)
+    if matching_jobs:
+        return matching_jobs
+    for job in jobs_that_can_be_triggered:
+        for pos_handler in MAP_REQUIRED_JOB_TO_HANDLERS.get(job.type, set()):
+            for trigger in pos_handler.triggers:
+                if (
+                    is_trigger_matching_job_config(trigger=trigger, job_config=job)
+                    and job not in matching_jobs
+                ):
+                    matching_jobs.append(job)
+    return matching_jobs
+
+
+DISPATCH_JOB_TYPES = [
+    JobType.build,
+    JobType.copr_build,
+    JobType.tests,
+    JobType.production_build,
+    JobType.propose_downstream,
+]
+DISPATCH_JOB_TRIGGERS = [
+    JobConfigTriggerType.pull_request,
+    JobConfigTriggerType.commit,
+    JobConfigTriggerType.release,
+]
+DISPATCH_JOB_SETS = [
+    [],
+    *[
+        [JobConfig(type=job_type, trigger=job_trigger)]
+        for job_type, job_trigger in product(DISPATCH_JOB_TYPES, DISPATCH_JOB_TRIGGERS)
+    ],
+    [
+        JobConfig(type=JobType.tests, trigger=JobConfigTriggerType.pull_request),
+        JobConfig(type=JobType.copr_build, trigger=JobConfigTriggerType.commit),
+        JobConfig(type=JobType.build, trigger=JobConfigTriggerType.pull_request),
+    ],
+    [
+        JobConfig(type=JobType.copr_build, trigger=JobConfigTriggerType.pull_request),
+        JobConfig(type=JobType.copr_build, trigger=JobConfigTriggerType.pull_request),
+        JobConfig(type=JobType.production_build, trigger=JobConfigTriggerType.release),
+        JobConfig(
+            type=JobType.propose_downstream, trigger=JobConfigTriggerType.release
+        ),
+    ],
+]
+
+
+@pytest.mark.parametrize("trigger", list(TheJobTriggerType))
+@pytest.mark.parametrize("db_trigger_type", [None, *DISPATCH_JOB_TRIGGERS])
+def test_dispatch_plan_matches_loops(trigger, db_trigger_type):
+    db_trigger = (
+        flexmock(job_config_trigger_type=db_trigger_type) if db_trigger_type else None
+    )
+    for jobs in DISPATCH_JOB_SETS:
+        event = flexmock(trigger=trigger, db_trigger=db_trigger)
+        package_config = flexmock(jobs=jobs)
+
+        handlers = get_handlers_for_event(event=event, package_config=package_config)
+        assert handlers == _matching_handlers_by_loops(event, package_config)
+
+        for handler_kls in MAP_HANDLER_TO_JOB_TYPES.keys():
+            assert get_config_for_handler_kls(
+                handler_kls=handler_kls, event=event, package_config=package_config
+            ) == _matching_configs_by_loops(handler_kls, event, package_config)
+
+
+def test_dispatch_plan_returns_configs_of_the_given_package_config():
+    event = flexmock(
+        trigger=TheJobTriggerType.pull_request,
+        db_trigger=flexmock(job_config_trigger_type=JobConfigTriggerType.pull_request),
+    )
+    first = JobConfig(
+        type=JobType.copr_build,
+        trigger=JobConfigTriggerType.pull_request,
+        metadata=JobMetadataConfig(targets=["fedora-31"]),
+    )
+    second = JobConfig(
+        type=JobType.copr_build,
+        trigger=JobConfigTriggerType.pull_request,
+        metadata=JobMetadataConfig(targets=["fedora-32"]),
+    )
+    # the same job types and triggers => the same (cached) plan
+    assert get_config_for_handler_kls(
+        PullRequestCoprBuildHandler, event, flexmock(jobs=[first])
+    ) == [first]
+    assert get_config_for_handler_kls(
+        PullRequestCoprBuildHandler, event, flexmock(jobs=[second])
+    ) == [second]
+
+
+def test_handler_topics():
+    assert HANDLER_TOPICS == {
+        h.topic for h in MAP_HANDLER_TO_JOB_TYPES.keys() if getattr(h, "topic", None)
+    }
+    assert "org.fedoraproject.prod.copr.build.end" in HANDLER_TOPICS
@@ -0,0 +1,249 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import threading
+from datetime import datetime
+from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+
+import pytest
+from flexmock import flexmock
+from ogr.abstract import CommitStatus
+
+from packit_service.models import KojiBuildModel
+from packit_service.worker.build import koji_babysit
+from packit_service.worker.build.koji_babysit import (
+    KOJI_BABYSIT_MAX_INTERVAL,
+    KOJI_BABYSIT_MIN_INTERVAL,
+    KOJI_TASK_CLOSED,
+    KOJI_TASK_FAILED,
+    KOJI_TASK_FREE,
+    KOJI_TASK_OPEN,
+    KojiHubError,
+    KojiTaskPoller,
+    babysit_koji_builds,
+    check_pending_koji_builds,
+    get_next_interval,
+)
+
+
+class KojiHubRequestHandler(SimpleXMLRPCRequestHandler):
+    rpc_paths = ("/kojihub",)
+
+
+class FakeKojiHub:
+    """ Implements `multiCall` of `getTaskInfo` the way the koji hub does. """
+
+    def __init__(self):
+        self.tasks = {}
+        self.multicalls = []
+        self.server = SimpleXMLRPCServer(
+            ("127.0.0.1", 0),
+            requestHandler=KojiHubRequestHandler,
+            logRequests=False,
+            allow_none=True,
+        )
+        self.server.register_function(self.multiCall, "multiCall")
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/kojihub"
+
+    def multiCall(self, calls):
+        self.multicalls.append(calls)
+        results = []
+        for call in calls:
+            task_id = call["params"][0]
+            if call["methodName"] != "getTaskInfo" or task_id not in self.tasks:
+                results.append({"faultCode": 1000, "faultString": "No such task"})
+            else:
+                results.append([self.tasks[task_id]])
+        return results
+
+    def set_state(self, task_id: int, state: int, **times):
+        self.tasks[task_id] = {"id": task_id, "state": state, **times}
+
+
+@pytest.fixture()
+def koji_hub():
+    hub = FakeKojiHub()
+    hub.thread.start()
+    yield hub
+    hub.server.shutdown()
+    hub.server.server_close()
+
+
+@pytest.fixture()
+def schedule(monkeypatch):
+    schedule = flexmock(acquire=lambda countdown: True, extend=lambda countdown: None)
+    schedule.should_receive("release")
+    monkeypatch.setattr(koji_babysit, "koji_babysitter_schedule", schedule)
+    return schedule
+
+
+def koji_build(id_: int, task_id: str, status: str = "pending") -> KojiBuildModel:
+    build = KojiBuildModel(id=id_, build_id=task_id, status=status, target="rawhide")
+    flexmock(build).should_receive("set_status").replace_with(
+        lambda status: setattr(build, "status", status)
+    )
+    flexmock(build).should_receive("set_start_time").replace_with(
+        lambda start_time: setattr(build, "build_start_time", start_time)
+    )
+    flexmock(build).should_receive("set_end_time").replace_with(
+        lambda end_time: setattr(build, "build_finished_time", end_time)
+    )
+    return build
+
+
+def pending_builds(*builds):
+    flexmock(KojiBuildModel).should_receive("get_all_by_status").replace_with(
+        lambda status: [b for b in builds if b.status == status]
+    )
+
+
+def test_poller_batches(koji_hub):
+    for task_id in range(1, 6):
+        koji_hub.set_state(task_id, KOJI_TASK_OPEN)
+
+    infos = KojiTaskPoller(hub_url=koji_hub.url, batch_size=2).get_task_infos(
+        [1, 2, 3, 4, 5, 42]
+    )
+
+    assert [len(calls) for calls in koji_hub.multicalls] == [2, 2, 2]
+    assert infos[1] == {"id": 1, "state": KOJI_TASK_OPEN}
+    assert infos[42] is None
+
+
+def test_poller_hub_down():
+    poller = KojiTaskPoller(hub_url="http://127.0.0.1:1/kojihub")
+    with pytest.raises(KojiHubError):
+        poller.get_task_infos([1])
+
+
+def test_check_pending_builds(koji_hub):
+    free, running, done, failed = (
+        koji_build(1, "11"),
+        koji_build(2, "12"),
+        koji_build(3, "13", status="running"),
+        koji_build(4, "14", status="running"),
+    )
+    pending_builds(free, running, done, failed)
+    koji_hub.set_state(11, KOJI_TASK_FREE)
+    koji_hub.set_state(12, KOJI_TASK_OPEN, start_ts=1590000000.0)
+    koji_hub.set_state(
+        13, KOJI_TASK_CLOSED, start_ts=1590000000.0, completion_ts=1590003600.0
+    )
+    koji_hub.set_state(14, KOJI_TASK_FAILED, completion_ts=1590003600.0)
+
+    reported = []
+    flexmock(koji_babysit).should_receive("report_koji_build_status").replace_with(
+        lambda build, state, description: reported.append((build.id, state))
+    )
+
+    pending, changed = check_pending_koji_builds(KojiTaskPoller(koji_hub.url))
+
+    assert (pending, changed) == (2, True)
+    assert len(koji_hub.multicalls) == 1
+    assert [b.status for b in (free, running, done, failed)] == [
+        "pending",
+        "running",
+        "success",
+        "failure",
+    ]
+    assert reported == [
+        (2, CommitStatus.pending),
+        (3, CommitStatus.success),
+        (4, CommitStatus.failure),
+    ]
+    assert running.build_start_time == datetime(2020, 5, 20, 18, 40)
+    assert done.build_finished_time == datetime(2020, 5, 20, 19, 40)
+
+
+def test_check_pending_builds_unchanged(koji_hub):
+    build = koji_build(1, "11", status="running")
+    pending_builds(build)
+    koji_hub.set_state(11, KOJI_TASK_OPEN)
+    flexmock(koji_babysit).should_receive("report_koji_build_status").never()
+
+    assert check_pending_koji_builds(KojiTaskPoller(koji_hub.url)) == (1, False)
+
+
+def test_check_pending_builds_without_task(koji_hub):
+    build = koji_build(1, "None")
+    pending_builds(build)
+
+    assert check_pending_koji_builds(KojiTaskPoller(koji_hub.url)) == (0, False)
+    assert build.status == "error"
+    assert not koji_hub.multicalls
+
+
+@pytest.mark.parametrize(
+    "interval,changed,expected",
+    [
+        (KOJI_BABYSIT_MIN_INTERVAL, False, 2 * KOJI_BABYSIT_MIN_INTERVAL),
+        (KOJI_BABYSIT_MAX_INTERVAL, False, KOJI_BABYSIT_MAX_INTERVAL),
+        (KOJI_BABYSIT_MAX_INTERVAL, True, KOJI_BABYSIT_MIN_INTERVAL),
+    ],
+)
+def test_get_next_interval(interval, changed, expected):
+    assert get_next_interval(interval, changed) == expected
+
+
+def test_babysit_reschedules(koji_hub, schedule):
+    build = koji_build(1, "11", status="running")
+    pending_builds(build)
+    koji_hub.set_state(11, KOJI_TASK_OPEN)
+    flexmock(koji_babysit).should_receive("send_babysit_task").with_args(
+        2 * KOJI_BABYSIT_MIN_INTERVAL
+    ).once()
+
+    assert babysit_koji_builds(
+        KOJI_BABYSIT_MIN_INTERVAL, poller=KojiTaskPoller(koji_hub.url)
+    ) == (2 * KOJI_BABYSIT_MIN_INTERVAL)
+
+
+def test_babysit_backs_off_when_hub_is_down(schedule):
+    pending_builds(koji_build(1, "11"))
+    flexmock(koji_babysit).should_receive("send_babysit_task").with_args(
+        KOJI_BABYSIT_MAX_INTERVAL
+    ).once()
+
+    assert (
+        babysit_koji_builds(
+            KOJI_BABYSIT_MAX_INTERVAL,
+            poller=KojiTaskPoller(hub_url="http://127.0.0.1:1/kojihub"),
+        )
+        == KOJI_BABYSIT_MAX_INTERVAL
+    )
+
+
+def test_babysit_stops_when_done(koji_hub, schedule):
+    build = koji_build(1, "11", status="running")
+    pending_builds(build)
+    koji_hub.set_state(11, KOJI_TASK_CLOSED)
+    flexmock(koji_babysit).should_receive("report_koji_build_status").once()
+    flexmock(koji_babysit).should_receive("send_babysit_task").never()
+    schedule.should_receive("release").once()
+
+    assert babysit_koji_builds(poller=KojiTaskPoller(koji_hub.url)) is None
+    assert build.status == "success"
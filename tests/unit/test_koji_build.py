@@ -140,6 +140,7 @@ def test_koji_build_check_names(github_pr_event):
     )
 
     flexmock(PackitAPI).should_receive("init_kerberos_ticket").once()
+    flexmock(koji_build).should_receive("schedule_koji_babysitter").once()
 
     assert helper.run_koji_build()["success"]
 
@@ -272,6 +273,7 @@ def test_koji_build_with_multiple_targets(github_pr_event):
         "Created task: 43429339\n"
         "Task info: https://koji.fedoraproject.org/koji/taskinfo?taskID=43429339\n"
     )
+    flexmock(koji_build).should_receive("schedule_koji_babysitter").once()
 
     assert helper.run_koji_build()["success"]
 
@@ -0,0 +1,151 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+from flexmock import flexmock
+
+from packit.api import PackitAPI
+from packit.config import PackageConfig
+from packit_service.worker.build.local_srpm import (
+    LocalSRPMBuildError,
+    LocalSRPMBuildTimeout,
+    LocalSRPMBuilder,
+    build_srpm,
+)
+
+# speaks the protocol of the worker, behaves according to the working dir
+FAKE_WORKER = textwrap.dedent(
+    """
+    import os, pickle, subprocess, sys, time
+
+    while True:
+        try:
+            request = pickle.load(sys.stdin.buffer)
+        except EOFError:
+            break
+        working_dir = request["working_dir"]
+        if working_dir == "slow":
+            time.sleep(60)
+        if working_dir.endswith(".pid"):
+            # e.g. rpmbuild started by the build
+            child = subprocess.Popen(["sleep", "60"])
+            with open(working_dir, "w") as pid_file:
+                pid_file.write(str(child.pid))
+            time.sleep(60)
+        if working_dir == "crash":
+            sys.exit(1)
+        if working_dir == "broken":
+            response = {"error": "no spec file", "logs": "failed"}
+        else:
+            response = {
+                "srpm_path": f"{request['srpm_dir']}/{os.getpid()}.src.rpm",
+                "logs": "built",
+            }
+        pickle.dump(response, sys.stdout.buffer)
+        sys.stdout.flush()
+    """
+)
+
+
+@pytest.fixture()
+def builder():
+    builder = LocalSRPMBuilder(
+        workers=1,
+        timeout=2,
+        max_log_size=1024,
+        worker_command=[sys.executable, "-c", FAKE_WORKER],
+    )
+    yield builder
+    builder.close()
+
+
+def create_srpm(builder: LocalSRPMBuilder, working_dir: str):
+    return builder.create_srpm(
+        working_dir=working_dir, package_config=PackageConfig(), srpm_dir="/srpms"
+    )
+
+
+def test_create_srpm(builder):
+    srpm_path, logs = create_srpm(builder, "project")
+    assert srpm_path.parent == Path("/srpms")
+    assert logs == "built"
+    # the worker is reused
+    assert create_srpm(builder, "project")[0] == srpm_path
+
+
+def test_create_srpm_failure(builder):
+    with pytest.raises(LocalSRPMBuildError) as ex:
+        create_srpm(builder, "broken")
+    assert str(ex.value) == "no spec file"
+    assert ex.value.logs == "failed"
+
+
+def test_create_srpm_timeout(builder):
+    srpm_path, _ = create_srpm(builder, "project")
+    with pytest.raises(LocalSRPMBuildTimeout):
+        create_srpm(builder, "slow")
+    # replaced by a new worker
+    new_srpm_path, _ = create_srpm(builder, "project")
+    assert new_srpm_path != srpm_path
+
+
+def is_running(pid: int) -> bool:
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except FileNotFoundError:
+        return False
+    # not a zombie
+    return stat.rsplit(")", 1)[1].split()[0] != "Z"
+
+
+def test_create_srpm_timeout_kills_children(builder, tmp_path):
+    pid_file = tmp_path / "child.pid"
+    with pytest.raises(LocalSRPMBuildTimeout):
+        create_srpm(builder, str(pid_file))
+
+    assert not is_running(int(pid_file.read_text()))
+
+
+def test_create_srpm_worker_died(builder):
+    with pytest.raises(LocalSRPMBuildError):
+        create_srpm(builder, "crash")
+    assert create_srpm(builder, "project")[1] == "built"
+
+
+def test_build_srpm(tmp_path):
+    flexmock(PackitAPI).should_receive("create_srpm").with_args(
+        srpm_dir=str(tmp_path)
+    ).replace_with(lambda srpm_dir: Path(srpm_dir) / "my.src.rpm")
+
+    response = build_srpm(
+        {
+            "working_dir": str(tmp_path),
+            "package_config": PackageConfig(),
+            "srpm_dir": str(tmp_path),
+            "max_log_size": 1024,
+        }
+    )
+
+    assert response["srpm_path"] == str(tmp_path / "my.src.rpm")
@@ -0,0 +1,75 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+import threading
+
+import pytest
+
+from packit_service.worker.build.log_capture import BoundedLogCapture
+
+
+@pytest.fixture()
+def capture():
+    capture = BoundedLogCapture(max_size=100)
+    capture.setFormatter(logging.Formatter("%(message)s"))
+    logger = logging.getLogger("packit.test_log_capture")
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(capture)
+    yield capture
+    logger.removeHandler(capture)
+
+
+def test_short_logs_kept(capture):
+    logging.getLogger("packit.test_log_capture").debug("hello")
+    capture.write("world\n")
+    assert capture.get_logs() == "hello\nworld\n"
+    assert not capture.truncated
+
+
+def test_head_and_tail_kept(capture):
+    capture.write("H" * 25)
+    for _ in range(100):
+        capture.write("x" * 10)
+    capture.write("T" * 75)
+
+    logs = capture.get_logs()
+    assert logs.startswith("H" * 25 + "\n[... 1000 characters were truncated ...]\n")
+    assert logs.endswith("T" * 75)
+    assert capture.truncated == 1000
+
+
+def test_huge_chunk(capture):
+    capture.write("a" * 10_000 + "END")
+    logs = capture.get_logs()
+    assert logs.startswith("a" * 25 + "\n[... ")
+    assert logs.endswith("a" * 72 + "END")
+    assert capture.truncated == 10_003 - 100
+
+
+def test_other_threads_ignored(capture):
+    logger = logging.getLogger("packit.test_log_capture")
+    thread = threading.Thread(target=logger.info, args=("from other thread",))
+    thread.start()
+    thread.join()
+    logger.info("from our thread")
+
+    assert capture.get_logs() == "from our thread\n"
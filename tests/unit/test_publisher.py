@@ -0,0 +1,208 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import time
+
+import pytest
+from celery import Celery
+from flexmock import flexmock
+
+from packit_service.service import publisher as publisher_module
+from packit_service.service.publisher import (
+    BatchPublisher,
+    get_ordering_key,
+    group_by_ordering_key,
+)
+from packit_service.service.spool import WebhookSpool
+from packit_service.worker.jobs import SteveJobs
+from packit_service.worker.tasks import process_message_batch
+from tests.spellbook import DATA_DIR
+
+
+def pr_comment(number: int, body: str) -> dict:
+    return {
+        "action": "created",
+        "issue": {"number": number},
+        "comment": {"body": body},
+        "repository": {"full_name": "packit-service/hello-world"},
+    }
+
+
+@pytest.mark.parametrize(
+    "path,key",
+    [
+        ("webhooks/github/pr.json", "github:packit-service/packit#342"),
+        (
+            "webhooks/github/pr_comment_copr_build.json",
+            "github:packit-service/hello-world#9",
+        ),
+        ("webhooks/gitlab/mr_event.json", "gitlab:testing-packit/hello-there!1"),
+        ("webhooks/github/installation_created.json", None),
+    ],
+)
+def test_get_ordering_key(path, key):
+    assert get_ordering_key(json.loads((DATA_DIR / path).read_text())) == key
+
+
+def test_group_by_ordering_key():
+    first, second = pr_comment(1, "/packit build"), pr_comment(1, "/packit test")
+    other = pr_comment(2, "/packit build")
+    independent = {"installation": {"id": 1}}
+    assert group_by_ordering_key([first, other, independent, independent, second]) == [
+        [first, second],
+        [other],
+        [independent],
+        [independent],
+    ]
+
+
+def test_publish_right_away():
+    published = []
+    publisher = BatchPublisher(batch_size=1, publish=published.append)
+    publisher.submit({"a": 1})
+    publisher.submit({"b": 2})
+    assert published == [[{"a": 1}], [{"b": 2}]]
+
+
+def test_publish_batch_on_size():
+    published = []
+    publisher = BatchPublisher(batch_size=3, batch_delay=60, publish=published.append)
+    for i in range(3):
+        publisher.submit({"i": i})
+
+    for _ in range(100):
+        if published:
+            break
+        time.sleep(0.01)
+    assert published == [[{"i": 0}, {"i": 1}, {"i": 2}]]
+
+
+def test_publish_batch_on_delay():
+    published = []
+    publisher = BatchPublisher(
+        batch_size=100, batch_delay=0.01, publish=published.append
+    )
+    publisher.submit({"i": 0})
+    publisher.submit({"i": 1})
+
+    for _ in range(100):
+        if published:
+            break
+        time.sleep(0.01)
+    assert published == [[{"i": 0}, {"i": 1}]]
+
+
+def test_spool(tmp_path):
+    spool = WebhookSpool(str(tmp_path / "webhooks.sqlite"))
+    published = []
+
+    def publish(events):
+        if not published:
+            published.append(None)
+            raise ConnectionError("broker is down")
+        published.append(events)
+
+    publisher = BatchPublisher(batch_size=10, spool=spool, publish=publish)
+    flexmock(publisher).should_receive("_start_thread")
+    publisher.submit({"i": 0})
+    with pytest.raises(ConnectionError):
+        publisher.flush()
+    assert spool.count_unpublished() == 1
+
+    publisher.submit({"i": 1})
+    publisher.flush()
+    assert published == [None, [{"i": 0}, {"i": 1}]]
+    assert not spool.count_unpublished()
+
+
+def test_spool_drained_in_background(tmp_path):
+    spool = WebhookSpool(str(tmp_path / "webhooks.sqlite"))
+    published = []
+    publisher = BatchPublisher(
+        batch_size=100, batch_delay=0.01, spool=spool, publish=published.append
+    )
+    publisher.submit({"i": 0})
+    publisher.submit({"i": 1})
+
+    for _ in range(100):
+        if published:
+            break
+        time.sleep(0.01)
+    assert published == [[{"i": 0}, {"i": 1}]]
+
+
+def test_publish_error_without_spool():
+    def publish(events):
+        raise ConnectionError("broker is down")
+
+    publisher = BatchPublisher(batch_size=1, publish=publish)
+    with pytest.raises(ConnectionError):
+        publisher.submit({"i": 0})
+
+
+def test_publish_error_in_background(monkeypatch):
+    monkeypatch.setattr(publisher_module, "PUBLISH_RETRY_DELAY", 0.01)
+    published = []
+
+    def publish(events):
+        if not published:
+            published.append(None)
+            raise ConnectionError("broker is down")
+        published.append(events)
+
+    publisher = BatchPublisher(batch_size=2, batch_delay=0.01, publish=publish)
+    for i in range(3):
+        publisher.submit({"i": i})
+
+    for _ in range(100):
+        if len(published) == 3:
+            break
+        time.sleep(0.01)
+    # nothing is lost and the order is kept
+    assert published == [None, [{"i": 0}, {"i": 1}], [{"i": 2}]]
+    assert not publisher.events
+    assert publisher._thread.is_alive()
+
+
+def test_process_message_batch_split():
+    first, other = pr_comment(1, "/packit build"), pr_comment(2, "/packit build")
+    flexmock(Celery).should_receive("send_task").with_args(
+        name="task.steve_jobs.process_message_batch", kwargs={"events": [first]}
+    ).once()
+    flexmock(Celery).should_receive("send_task").with_args(
+        name="task.steve_jobs.process_message_batch", kwargs={"events": [other]}
+    ).once()
+    flexmock(SteveJobs).should_receive("process_message").never()
+
+    assert process_message_batch([first, other]) == []
+
+
+def test_process_message_batch_in_order():
+    first, second = pr_comment(1, "/packit build"), pr_comment(1, "/packit test")
+    flexmock(SteveJobs).should_receive("process_message").with_args(
+        event=first
+    ).and_raise(Exception("something went wrong")).ordered()
+    flexmock(SteveJobs).should_receive("process_message").with_args(
+        event=second
+    ).and_return(None).ordered()
+
+    assert process_message_batch([first, second]) == [None, None]
@@ -0,0 +1,369 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import subprocess
+import threading
+
+import pytest
+from celery.signals import worker_process_shutdown
+from flexmock import flexmock
+from kubernetes.client import (
+    V1ObjectMeta,
+    V1PersistentVolumeClaimVolumeSource,
+    V1Pod,
+    V1PodSpec,
+    V1Volume,
+)
+from kubernetes.client.rest import ApiException
+from sandcastle.api import Sandcastle
+
+from packit_service.config import ServiceConfig
+from packit_service.worker.build import sandbox_pool
+from packit_service.worker.build.sandbox_pool import (
+    POOL_PID_LABEL,
+    POOL_WORKER_LABEL,
+    PooledSandcastleCommandHandler,
+    SandboxPool,
+    SandcastleBackend,
+    get_sandbox_pool,
+)
+
+
+class FakeKubernetes:
+    """ Keeps the pods in memory instead of the cluster. """
+
+    def __init__(self, fail_reset: bool = False):
+        self.fail_reset = fail_reset
+        self.pods = {}
+        self.created = 0
+        self.resets = 0
+        self.lock = threading.Lock()
+
+    def create(self):
+        with self.lock:
+            self.created += 1
+            name = f"sandbox-{self.created}"
+            self.pods[name] = flexmock(name=name, mapped_dir=flexmock(local_dir=None))
+        return self.pods[name]
+
+    def reset(self, pod):
+        self.resets += 1
+        if self.fail_reset:
+            raise RuntimeError("exec failed")
+
+    def delete(self, pod):
+        del self.pods[pod.name]
+
+
+def wait_for_maintenance(pool: SandboxPool):
+    # the tasks of the single maintenance thread are processed in order
+    pool._maintenance.submit(lambda: None).result()
+
+
+def test_warm_pool():
+    kube = FakeKubernetes()
+    pool = SandboxPool(backend=kube, min_size=2, max_size=4)
+    pool.replenish()
+    wait_for_maintenance(pool)
+    assert len(kube.pods) == 2
+
+    with pool.lease() as first:
+        assert first.name in kube.pods
+    wait_for_maintenance(pool)
+
+    assert kube.resets == 1
+    assert len(kube.pods) == 2
+    assert pool.get_stats()["hits"] == 1
+    assert pool.get_stats()["hit_rate"] == 1.0
+
+    pool.close()
+    assert not kube.pods
+
+
+def test_lease_from_empty_pool():
+    kube = FakeKubernetes()
+    pool = SandboxPool(backend=kube, min_size=1, max_size=1)
+
+    with pool.lease() as sandbox:
+        assert sandbox.name == "sandbox-1"
+    wait_for_maintenance(pool)
+
+    stats = pool.get_stats()
+    assert stats["leases"] == 1
+    assert stats["hits"] == 0
+    assert stats["hit_rate"] == 0.0
+    # returned to the pool
+    assert stats["idle"] == 1
+    assert len(kube.pods) == 1
+
+
+def test_failed_sandbox_is_recycled():
+    kube = FakeKubernetes()
+    pool = SandboxPool(backend=kube, min_size=1, max_size=1)
+    pool.replenish()
+    wait_for_maintenance(pool)
+
+    with pytest.raises(RuntimeError):
+        with pool.lease() as sandbox:
+            raise RuntimeError("command failed")
+    wait_for_maintenance(pool)
+
+    assert sandbox.name not in kube.pods
+    assert kube.resets == 0
+    # replaced by a new one
+    assert list(kube.pods) == ["sandbox-2"]
+
+
+def test_sandbox_recycled_after_failed_reset():
+    kube = FakeKubernetes(fail_reset=True)
+    pool = SandboxPool(backend=kube, min_size=1, max_size=1)
+
+    with pool.lease():
+        pass
+    wait_for_maintenance(pool)
+
+    assert list(kube.pods) == ["sandbox-2"]
+
+
+def test_sandcastle_reset():
+    backend = SandcastleBackend(
+        image_reference="sandcastle", k8s_namespace_name="ns", path="/sandcastle"
+    )
+    mapped_dir = flexmock(local_dir="/tmp/project", path="/sandcastle")
+    commands = []
+
+    def exec(command):
+        # the script is run directly, not from the mapped dir it empties
+        assert sandcastle.mapped_dir is None
+        commands.append(command)
+
+    sandcastle = flexmock(mapped_dir=mapped_dir, exec=exec)
+    backend.reset(sandcastle)
+
+    assert sandcastle.mapped_dir is mapped_dir
+    [(shell, option, script)] = commands
+    assert (shell, option) == ("bash", "-c")
+    # the pod is leased to other projects, nothing of this lease can survive:
+    # the processes are killed, the working dir, $HOME and tmp dirs are emptied
+    assert "kill -9 $others" in script
+    assert 'for dir in "/sandcastle" "$HOME" "/tmp" "/var/tmp"; do' in script
+    # and the reset fails (the pod is deleted) if something survived
+    assert "survived the reset" in script
+    assert "is not empty after the reset" in script
+
+
+def test_failed_sandcastle_reset():
+    backend = SandcastleBackend(image_reference="sandcastle", k8s_namespace_name="ns")
+    mapped_dir = flexmock(local_dir=None)
+    sandcastle = flexmock(mapped_dir=mapped_dir)
+    sandcastle.should_receive("exec").and_raise(RuntimeError("processes survived"))
+
+    with pytest.raises(RuntimeError):
+        backend.reset(sandcastle)
+    assert sandcastle.mapped_dir is mapped_dir
+
+
+def test_sandbox_recycled_after_max_leases():
+    kube = FakeKubernetes()
+    pool = SandboxPool(backend=kube, min_size=1, max_size=1, max_leases=2)
+
+    for _ in range(3):
+        with pool.lease():
+            pass
+        wait_for_maintenance(pool)
+
+    assert kube.created == 2
+    assert list(kube.pods) == ["sandbox-2"]
+
+
+def test_scaling_with_queue_depth():
+    kube = FakeKubernetes()
+    queue_depth = 10
+    pool = SandboxPool(
+        backend=kube, min_size=1, max_size=4, get_queue_depth=lambda: queue_depth
+    )
+    pool.replenish()
+    wait_for_maintenance(pool)
+    assert len(kube.pods) == 4
+
+    # the queue is empty, the pool shrinks back when the pods are returned
+    queue_depth = 0
+    for _ in range(4):
+        with pool.lease():
+            pass
+        wait_for_maintenance(pool)
+    assert len(kube.pods) == 1
+
+
+def test_queue_depth_failure():
+    def get_queue_depth():
+        raise ConnectionError("redis is down")
+
+    pool = SandboxPool(
+        backend=FakeKubernetes(),
+        min_size=2,
+        max_size=4,
+        get_queue_depth=get_queue_depth,
+    )
+    assert pool.get_target_size() == 2
+
+
+def test_pool_disabled():
+    assert get_sandbox_pool(ServiceConfig(sandbox_pool_size=0)) is None
+
+
+def test_get_sandbox_pool(monkeypatch):
+    monkeypatch.setattr(sandbox_pool, "_pools", {})
+    flexmock(SandcastleBackend).should_receive("delete_orphans").once()
+    flexmock(SandboxPool).should_receive("replenish").once()
+    config = ServiceConfig(sandbox_pool_size=2, sandbox_pool_max_size=3)
+
+    pool = get_sandbox_pool(config)
+
+    assert pool is get_sandbox_pool(config)
+    assert (pool.min_size, pool.max_size) == (2, 3)
+
+
+def test_pools_closed_when_worker_process_exits(monkeypatch):
+    kube = FakeKubernetes()
+    pool = SandboxPool(backend=kube, min_size=2, max_size=2)
+    pool.replenish()
+    wait_for_maintenance(pool)
+    monkeypatch.setattr(sandbox_pool, "_pools", {"sandcastle": pool})
+
+    worker_process_shutdown.send(sender=None, pid=os.getpid(), exitcode=0)
+
+    assert not kube.pods
+    assert not sandbox_pool._pools
+
+
+def get_pod(name: str, pid: int, claim: str) -> V1Pod:
+    return V1Pod(
+        metadata=V1ObjectMeta(
+            name=name,
+            labels={POOL_WORKER_LABEL: "packit-worker-0", POOL_PID_LABEL: str(pid)},
+        ),
+        spec=V1PodSpec(
+            containers=[],
+            volumes=[
+                V1Volume(name="secrets"),
+                V1Volume(
+                    name="sandcastle",
+                    persistent_volume_claim=V1PersistentVolumeClaimVolumeSource(
+                        claim_name=claim
+                    ),
+                ),
+            ],
+        ),
+    )
+
+
+def test_delete_orphans():
+    exited = subprocess.Popen(["true"])
+    exited.wait()
+    flexmock(sandbox_pool).should_receive("get_worker_name").and_return(
+        "packit-worker-0"
+    )
+    api = flexmock()
+    api.should_receive("list_namespaced_pod").with_args(
+        "ns", label_selector=f"{POOL_WORKER_LABEL}=packit-worker-0"
+    ).and_return(
+        flexmock(
+            items=[
+                get_pod("alive", os.getpid(), "alive-claim"),
+                get_pod("orphan", exited.pid, "orphan-claim"),
+                get_pod("gone", exited.pid, "gone-claim"),
+            ]
+        )
+    )
+    api.should_receive("delete_namespaced_pod").with_args(
+        "alive", "ns", body=object
+    ).never()
+    api.should_receive("delete_namespaced_pod").with_args(
+        "orphan", "ns", body=object
+    ).once()
+    # deleted by another process in the meantime
+    api.should_receive("delete_namespaced_pod").with_args(
+        "gone", "ns", body=object
+    ).and_raise(ApiException(status=404)).once()
+    api.should_receive("delete_namespaced_persistent_volume_claim").with_args(
+        "orphan-claim", "ns", body=object
+    ).once()
+    flexmock(Sandcastle).should_receive("get_api_client").and_return(api)
+
+    SandcastleBackend(
+        image_reference="sandcastle", k8s_namespace_name="ns"
+    ).delete_orphans()
+
+
+def test_sandcastle_pods_are_labeled():
+    flexmock(sandbox_pool).should_receive("get_worker_name").and_return(
+        "packit-worker-0"
+    )
+    api = flexmock()
+    api.should_receive("create_namespaced_persistent_volume_claim")
+    flexmock(Sandcastle).should_receive("get_api_client").and_return(api)
+    flexmock(Sandcastle).should_receive("is_pod_already_deployed").and_return(False)
+    manifests = []
+    flexmock(Sandcastle).should_receive("create_pod").replace_with(manifests.append)
+    flexmock(Sandcastle).should_receive("get_pod").and_return(
+        flexmock(status=flexmock(phase="Running"))
+    )
+    flexmock(Sandcastle).should_receive("get_logs").and_return("")
+
+    SandcastleBackend(image_reference="sandcastle", k8s_namespace_name="ns").create()
+
+    assert manifests[0]["metadata"]["labels"] == {
+        POOL_WORKER_LABEL: "packit-worker-0",
+        POOL_PID_LABEL: str(os.getpid()),
+    }
+
+
+def test_pooled_command_handler():
+    kube = FakeKubernetes()
+    pool = SandboxPool(backend=kube, min_size=1, max_size=1)
+    flexmock(sandbox_pool).should_receive("get_sandbox_pool").and_return(pool)
+    handler = PooledSandcastleCommandHandler(
+        local_project=flexmock(working_dir="/sandcastle/job"), config=flexmock()
+    )
+    flexmock(kube).should_receive("create").replace_with(
+        lambda: flexmock(
+            name="sandbox-1",
+            mapped_dir=flexmock(local_dir=None),
+            exec=lambda command: "output",
+        )
+    )
+
+    assert handler.run_command(["make", "srpm"]) == "output"
+    assert pool.get_stats()["leases"] == 1
+
+
+def test_pooled_command_handler_fallback():
+    flexmock(sandbox_pool).should_receive("get_sandbox_pool").and_return(None)
+    flexmock(sandbox_pool.SandcastleCommandHandler).should_receive(
+        "run_command"
+    ).and_return("output").once()
+    handler = PooledSandcastleCommandHandler(
+        local_project=flexmock(working_dir="/sandcastle/job"), config=flexmock()
+    )
+
+    assert handler.run_command(["make", "srpm"]) == "output"
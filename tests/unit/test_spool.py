@@ -0,0 +1,112 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from packit_service.service.spool import WebhookSpool
+
+
+@pytest.fixture()
+def spool(tmp_path):
+    return WebhookSpool(str(tmp_path / "webhooks.sqlite"))
+
+
+def test_drain_in_order(spool):
+    for i in range(5):
+        spool.append({"i": i})
+
+    published = []
+    assert spool.drain(published.append, limit=3) == 3
+    assert spool.drain(published.append, limit=3) == 2
+    assert spool.drain(published.append, limit=3) == 0
+    assert published == [[{"i": 0}, {"i": 1}, {"i": 2}], [{"i": 3}, {"i": 4}]]
+
+
+def test_drain_failure_keeps_events(spool):
+    spool.append({"i": 0})
+
+    def publish(events):
+        raise ConnectionError("broker is down")
+
+    with pytest.raises(ConnectionError):
+        spool.drain(publish, limit=10)
+    assert spool.count_unpublished() == 1
+
+    published = []
+    assert spool.drain(published.append, limit=10) == 1
+    assert published == [[{"i": 0}]]
+
+
+def test_not_locked_while_publishing(spool):
+    # the spool is shared by several processes
+    other = WebhookSpool(spool.path)
+    spool.append({"i": 0})
+    published = []
+
+    def publish(events):
+        # the broker is slow, the other processes keep accepting the webhooks
+        start = time.monotonic()
+        other.append({"i": 1})
+        assert time.monotonic() - start < 1
+        # and they don't publish the events claimed by us
+        assert other.drain(published.append, limit=10) == 0
+        published.append(events)
+
+    assert spool.drain(publish, limit=10) == 1
+    assert other.drain(published.append, limit=10) == 1
+    assert published == [[{"i": 0}], [{"i": 1}]]
+
+
+def test_get_events(spool):
+    spool.append({"i": 0})
+    spool.drain(lambda events: None, limit=10)
+    spool.append({"i": 1})
+
+    events = list(spool.get_events())
+    assert [event for _, _, event in events] == [{"i": 0}, {"i": 1}]
+    assert all(isinstance(received_at, datetime) for _, received_at, _ in events)
+
+    future = datetime.now() + timedelta(hours=1)
+    assert not list(spool.get_events(since=future))
+    assert len(list(spool.get_events(until=future))) == 2
+
+
+def test_get_summary(spool):
+    assert spool.get_summary() == (0, None, None)
+
+    spool.append({"i": 0})
+    spool.append({"i": 1})
+    count, oldest, newest = spool.get_summary()
+    assert count == 2
+    assert oldest <= newest <= datetime.now()
+
+
+def test_purge_only_published(spool):
+    spool.append({"i": 0})
+    spool.drain(lambda events: None, limit=10)
+    spool.append({"i": 1})
+
+    assert spool.purge(older_than=time.time() + 1) == 1
+    assert [event for _, _, event in spool.get_events()] == [{"i": 1}]
+    assert spool.count_unpublished() == 1
@@ -0,0 +1,128 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+
+from flexmock import flexmock
+from packit.actions import ActionName
+from packit.config import PackageConfig
+
+from packit_service.worker.build.srpm_cache import SRPMCache, get_srpm_cache_key
+
+SHA = "528b803be6f93e19ca4130bf4976f2800a3004c4"
+PROJECT_URL = "https://github.com/packit-service/hello-world"
+
+
+def test_cache_key():
+    config = PackageConfig(
+        specfile_path="hello.spec", actions={ActionName.post_upstream_clone: "make"}
+    )
+    key = get_srpm_cache_key(PROJECT_URL, SHA, config)
+    assert key == get_srpm_cache_key(
+        PROJECT_URL,
+        SHA,
+        PackageConfig(
+            specfile_path="hello.spec",
+            actions={ActionName.post_upstream_clone: "make"},
+        ),
+    )
+    assert key != get_srpm_cache_key(PROJECT_URL, "0" * 40, config)
+    assert key != get_srpm_cache_key(
+        PROJECT_URL, SHA, PackageConfig(specfile_path="other.spec")
+    )
+
+
+def test_put_and_get(tmp_path):
+    srpm = tmp_path / "hello-0.1-1.src.rpm"
+    srpm.write_bytes(b"srpm")
+    cache = SRPMCache(directory=str(tmp_path / "cache"), max_size=1024)
+
+    assert not cache.get("abcdef")
+    cached = cache.put("abcdef", srpm)
+    assert cached == tmp_path / "cache" / "ab" / "abcdef" / "hello-0.1-1.src.rpm"
+    assert cached.read_bytes() == b"srpm"
+    assert cache.get("abcdef") == cached
+
+    # the second put of the same key keeps the first SRPM
+    assert cache.put("abcdef", srpm) == cached
+
+
+def test_lru_eviction(tmp_path):
+    srpm = tmp_path / "hello-0.1-1.src.rpm"
+    srpm.write_bytes(b"x" * 400)
+    cache = SRPMCache(directory=str(tmp_path / "cache"), max_size=1000)
+
+    cache.put("aaaa", srpm)
+    cache.put("bbbb", srpm)
+    # make "aaaa" the oldest one, then use "bbbb"
+    os.utime(tmp_path / "cache" / "aa" / "aaaa", (0, 0))
+    cache.put("cccc", srpm)
+
+    assert not cache.get("aaaa")
+    assert cache.get("bbbb")
+    assert cache.get("cccc")
+
+
+def test_recently_used_not_evicted(tmp_path):
+    srpm = tmp_path / "hello-0.1-1.src.rpm"
+    srpm.write_bytes(b"x" * 400)
+    cache = SRPMCache(directory=str(tmp_path / "cache"), max_size=500)
+
+    cache.put("aaaa", srpm)
+    os.utime(tmp_path / "cache" / "aa" / "aaaa", (0, 0))
+    cache.put("bbbb", srpm)
+    # another worker can be using "bbbb" just now
+    cache.put("cccc", srpm)
+
+    assert not cache.get("aaaa")
+    assert cache.get("bbbb")
+    assert cache.get("cccc")
+
+
+def test_eviction_skips_removed_entries(tmp_path):
+    srpm = tmp_path / "hello-0.1-1.src.rpm"
+    srpm.write_bytes(b"x" * 400)
+    cache = SRPMCache(directory=str(tmp_path / "cache"), max_size=500)
+    cache.put("aaaa", srpm)
+    cache.put("bbbb", srpm)
+    os.utime(tmp_path / "cache" / "aa" / "aaaa", (0, 0))
+
+    # removed by another worker during the scan
+    removed = tmp_path / "cache" / "cc" / "cccc"
+    glob = cache.directory.glob
+    cache.directory = flexmock(glob=lambda pattern: [removed, *glob(pattern)])
+    cache.evict()
+
+    assert not (tmp_path / "cache" / "aa" / "aaaa").exists()
+    assert (tmp_path / "cache" / "bb" / "bbbb").exists()
+
+
+def test_get_url(tmp_path):
+    cache = SRPMCache(directory=str(tmp_path / "cache"), max_size=10 ** 6)
+    srpm = tmp_path / "hello-0.1-1.src.rpm"
+    srpm.write_bytes(b"srpm")
+    cached = cache.put("abcdef", srpm)
+
+    assert (
+        cache.get_url(cached, base_url="https://srpms.packit.dev/")
+        == "https://srpms.packit.dev/ab/abcdef/hello-0.1-1.src.rpm"
+    )
+    assert cache.get_url(srpm, base_url="https://srpms.packit.dev") is None
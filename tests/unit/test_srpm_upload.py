@@ -0,0 +1,167 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import logging
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from copr.v3 import Client, CoprRequestException
+from flexmock import flexmock
+
+from packit_service.worker.build import srpm_upload
+from packit_service.worker.build.srpm_upload import UploadProgress, upload_srpm
+
+
+class CoprUploadStub(BaseHTTPRequestHandler):
+    """
+    Drops the connection for the first `failures` uploads
+    and times out the next `timeouts` ones.
+    """
+
+    failures = 0
+    timeouts = 0
+    requests = 0
+    uploads = []
+
+    def do_POST(self):
+        CoprUploadStub.requests += 1
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if CoprUploadStub.failures:
+            CoprUploadStub.failures -= 1
+            # the network went away in the middle of the upload
+            self.connection.shutdown(socket.SHUT_RDWR)
+            self.close_connection = True
+            return
+        if CoprUploadStub.timeouts:
+            CoprUploadStub.timeouts -= 1
+            # the proxy in front of Copr gave up waiting, not a JSON response
+            self.send_error(504, "Gateway Timeout")
+            return
+        if b"please-reject" in body:
+            self.send_json(400, {"error": "Not a valid SRPM."})
+            return
+        CoprUploadStub.uploads.append(body)
+        self.send_json(200, {"id": 42, "ownername": "packit", "projectname": "hello"})
+
+    def send_json(self, status: int, data: dict):
+        response = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture()
+def copr_stub(monkeypatch):
+    monkeypatch.setattr(srpm_upload, "UPLOAD_BACKOFF", 0)
+    CoprUploadStub.failures = 0
+    CoprUploadStub.timeouts = 0
+    CoprUploadStub.requests = 0
+    CoprUploadStub.uploads = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CoprUploadStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield Client(
+        {
+            "copr_url": f"http://127.0.0.1:{server.server_address[1]}",
+            "login": "login",
+            "token": "token",
+            "username": "packit",
+        }
+    )
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture()
+def srpm(tmp_path):
+    srpm = tmp_path / "hello-0.1-1.src.rpm"
+    # large enough to be sent in more chunks
+    srpm.write_bytes(b"srpm" * 2 ** 20)
+    return srpm
+
+
+def test_upload(copr_stub, srpm):
+    build = upload_srpm(copr_stub.build_proxy, "packit", "hello", srpm)
+
+    assert build.id == 42
+    assert len(CoprUploadStub.uploads) == 1
+    assert srpm.read_bytes() in CoprUploadStub.uploads[0]
+
+
+def test_upload_retried(copr_stub, srpm):
+    CoprUploadStub.failures = 2
+
+    build = upload_srpm(copr_stub.build_proxy, "packit", "hello", srpm)
+
+    assert build.id == 42
+    assert CoprUploadStub.requests == 3
+    assert len(CoprUploadStub.uploads) == 1
+    assert srpm.read_bytes() in CoprUploadStub.uploads[0]
+
+
+def test_upload_retried_after_gateway_timeout(copr_stub, srpm):
+    CoprUploadStub.timeouts = 1
+
+    build = upload_srpm(copr_stub.build_proxy, "packit", "hello", srpm)
+
+    assert build.id == 42
+    assert CoprUploadStub.requests == 2
+    assert len(CoprUploadStub.uploads) == 1
+
+
+def test_upload_gives_up(copr_stub, srpm):
+    CoprUploadStub.failures = srpm_upload.UPLOAD_ATTEMPTS
+
+    with pytest.raises(Exception):
+        upload_srpm(copr_stub.build_proxy, "packit", "hello", srpm)
+    assert not CoprUploadStub.uploads
+    assert CoprUploadStub.requests == srpm_upload.UPLOAD_ATTEMPTS
+
+
+def test_rejected_upload_not_retried(copr_stub, tmp_path):
+    srpm = tmp_path / "broken.src.rpm"
+    srpm.write_bytes(b"please-reject")
+    CoprUploadStub.failures = 0
+
+    with pytest.raises(CoprRequestException):
+        upload_srpm(copr_stub.build_proxy, "packit", "hello", srpm)
+    assert CoprUploadStub.requests == 1
+
+
+def test_upload_progress(caplog):
+    progress = UploadProgress("hello-0.1-1.src.rpm")
+    with caplog.at_level(logging.DEBUG, logger=srpm_upload.__name__):
+        for bytes_read in (0, 50, 150, 999, 1000):
+            progress(flexmock(bytes_read=bytes_read, len=1000))
+
+    assert [record.getMessage() for record in caplog.records] == [
+        "Uploading hello-0.1-1.src.rpm: 10% (150/1000 B).",
+        "Uploading hello-0.1-1.src.rpm: 90% (999/1000 B).",
+        "Uploading hello-0.1-1.src.rpm: 100% (1000/1000 B).",
+    ]
@@ -23,22 +23,29 @@
 """
 Let's test that Steve's as awesome as we think he is.
 """
-from json import dumps
+from json import dumps, load, loads
 
 import pytest
+from celery import Celery
 from flexmock import flexmock
 from github import Github
 
 from ogr.services.github import GithubProject
 from packit.api import PackitAPI
-from packit.config import JobConfigTriggerType
+from packit.config import JobConfigTriggerType, PackageConfig
 from packit.local_project import LocalProject
 from packit_service.config import ServiceConfig
 from packit_service.constants import SANDCASTLE_WORK_DIR
+from packit_service.models import CoprBuildModel, ProjectReleaseModel
 from packit_service.service.db_triggers import AddReleaseDbTrigger
-from packit_service.worker.jobs import SteveJobs
+from packit_service.service.events import ReleaseEvent
+from packit_service.worker.build.copr_build import CoprBuildJobHelper
+from packit_service.worker.jobs import EventRestoreError, SteveJobs
+from packit_service.worker.parser import Parser
+from packit_service.worker.result import HandlerResults
 from packit_service.worker.whitelist import Whitelist
-from tests.spellbook import first_dict_value
+from packit_service.worker.workspace import TRASH_DIR_NAME, wait_for_removals
+from tests.spellbook import DATA_DIR, first_dict_value
 
 
 @pytest.mark.parametrize(
@@ -90,3 +97,249 @@ def test_process_message(event):
     assert "propose_downstream" in next(iter(results["jobs"]))
     assert j["success"]
     assert results["event"]["trigger"] == "release"
+
+
+def test_process_message_resolves_db_trigger_once():
+    event = {
+        "action": "published",
+        "release": {"tag_name": "1.2.3"},
+        "repository": {
+            "name": "bar",
+            "html_url": "https://github.com/foo/bar",
+            "owner": {"login": "foo"},
+        },
+    }
+    packit_yaml = {
+        "specfile_path": "bar.spec",
+        "synced_files": [],
+        "jobs": [
+            {"trigger": "release", "job": "propose_downstream"},
+            {"trigger": "release", "job": "copr_build"},
+        ],
+    }
+
+    flexmock(Github, get_repo=lambda full_name_or_id: None)
+    flexmock(
+        GithubProject,
+        get_file_content=lambda path, ref: dumps(packit_yaml),
+        full_repo_name="foo/bar",
+        get_files=lambda ref, filter_regex: [],
+        get_sha_from_tag=lambda tag_name: "12345",
+        get_web_url=lambda: "https://github.com/the-namespace/the-repo",
+        is_private=lambda: False,
+    )
+    flexmock(LocalProject, refresh_the_arguments=lambda: None)
+    config = ServiceConfig()
+    config.command_handler_work_dir = SANDCASTLE_WORK_DIR
+    flexmock(ServiceConfig).should_receive("get_service_config").and_return(config)
+    flexmock(PackitAPI).should_receive("sync_release").and_return()
+    flexmock(CoprBuildJobHelper).should_receive("run_copr_build").and_return(
+        HandlerResults(success=True, details={})
+    )
+    # both the handler lookup and the job-config lookup need the trigger
+    flexmock(ProjectReleaseModel).should_receive("get_or_create").and_return(
+        flexmock(job_config_trigger_type=JobConfigTriggerType.release)
+    ).once()
+    flexmock(Whitelist, check_and_report=True)
+
+    results = SteveJobs().process_message(event)
+    assert all(result["success"] for result in results["jobs"].values())
+
+
+def test_process_message_concurrently(tmp_path):
+    event = {
+        "action": "published",
+        "release": {"tag_name": "1.2.3"},
+        "repository": {
+            "name": "bar",
+            "html_url": "https://github.com/foo/bar",
+            "owner": {"login": "foo"},
+        },
+    }
+    packit_yaml = {
+        "specfile_path": "bar.spec",
+        "synced_files": [],
+        "jobs": [
+            {"trigger": "release", "job": "propose_downstream"},
+            {"trigger": "release", "job": "copr_build"},
+        ],
+    }
+
+    flexmock(Github, get_repo=lambda full_name_or_id: None)
+    flexmock(
+        GithubProject,
+        get_file_content=lambda path, ref: dumps(packit_yaml),
+        full_repo_name="foo/bar",
+        get_files=lambda ref, filter_regex: [],
+        get_sha_from_tag=lambda tag_name: "12345",
+        get_web_url=lambda: "https://github.com/the-namespace/the-repo",
+        is_private=lambda: False,
+    )
+    flexmock(LocalProject, refresh_the_arguments=lambda: None)
+    config = ServiceConfig(handler_concurrency=2)
+    config.command_handler_work_dir = str(tmp_path)
+    flexmock(ServiceConfig).should_receive("get_service_config").and_return(config)
+    flexmock(PackitAPI).should_receive("sync_release").and_return().once()
+    flexmock(CoprBuildJobHelper).should_receive("run_copr_build").and_return(
+        HandlerResults(success=True, details={})
+    ).once()
+    flexmock(ProjectReleaseModel).should_receive("get_or_create").and_return(
+        flexmock(job_config_trigger_type=JobConfigTriggerType.release)
+    )
+    flexmock(Whitelist, check_and_report=True)
+
+    results = SteveJobs().process_message(event)
+    assert len(results["jobs"]) == 2
+    assert all(result["success"] for result in results["jobs"].values())
+    # the workspaces of the handlers are removed
+    wait_for_removals()
+    assert [item.name for item in tmp_path.iterdir()] == [TRASH_DIR_NAME]
+    assert not list((tmp_path / TRASH_DIR_NAME).iterdir())
+
+
+def test_isolate_event_reloads_the_copr_build(copr_build_pr):
+    with open(DATA_DIR / "fedmsg" / "copr_build_end.json") as outfile:
+        message = load(outfile)
+    build_of_the_thread = flexmock()
+    flexmock(CoprBuildModel).should_receive("get_by_build_id").and_return(
+        copr_build_pr
+    ).and_return(build_of_the_thread)
+    event = Parser.parse_event(message)
+    package_config = PackageConfig(specfile_path="bar.spec")
+    event._package_config = package_config
+
+    isolated = SteveJobs.isolate_event(event)
+    assert event.build is copr_build_pr
+    assert isolated.build is build_of_the_thread
+    assert isolated.to_dict() == event.to_dict()
+    # the package config is copied, the forge project is fetched again
+    assert isolated._package_config == package_config
+    assert isolated._package_config is not package_config
+    assert isolated._project is None
+
+
+@pytest.fixture()
+def release_event_with_two_jobs():
+    event = {
+        "action": "published",
+        "release": {"tag_name": "1.2.3"},
+        "repository": {
+            "name": "bar",
+            "html_url": "https://github.com/foo/bar",
+            "owner": {"login": "foo"},
+        },
+    }
+    packit_yaml = {
+        "specfile_path": "bar.spec",
+        "synced_files": [],
+        "jobs": [
+            {"trigger": "release", "job": "propose_downstream"},
+            {"trigger": "release", "job": "copr_build"},
+        ],
+    }
+    flexmock(Github, get_repo=lambda full_name_or_id: None)
+    flexmock(
+        GithubProject,
+        get_file_content=lambda path, ref: dumps(packit_yaml),
+        full_repo_name="foo/bar",
+        get_files=lambda ref, filter_regex: [],
+        get_sha_from_tag=lambda tag_name: "12345",
+        get_web_url=lambda: "https://github.com/the-namespace/the-repo",
+        is_private=lambda: False,
+    )
+    flexmock(LocalProject, refresh_the_arguments=lambda: None)
+    flexmock(ProjectReleaseModel).should_receive("get_or_create").and_return(
+        flexmock(job_config_trigger_type=JobConfigTriggerType.release)
+    )
+    flexmock(Whitelist, check_and_report=True)
+    return event
+
+
+def test_process_message_fan_out(release_event_with_two_jobs):
+    config = ServiceConfig(fan_out_handlers=True)
+    config.command_handler_work_dir = SANDCASTLE_WORK_DIR
+    flexmock(ServiceConfig).should_receive("get_service_config").and_return(config)
+    flexmock(PackitAPI).should_receive("sync_release").never()
+    flexmock(CoprBuildJobHelper).should_receive("run_copr_build").never()
+    sent_tasks = []
+    flexmock(Celery).should_receive("send_task").replace_with(
+        lambda name, kwargs: sent_tasks.append((name, kwargs))
+        or flexmock(id=str(len(sent_tasks)))
+    ).twice()
+
+    results = SteveJobs().process_message(release_event_with_two_jobs)
+    assert {result["details"]["task_id"] for result in results["jobs"].values()} == {
+        "1",
+        "2",
+    }
+    assert {name for name, _ in sent_tasks} == {"task.steve_jobs.process_handler"}
+    assert {
+        (kwargs["event_type"], kwargs["handler_name"], kwargs["job_config_index"])
+        for _, kwargs in sent_tasks
+    } == {
+        ("ReleaseEvent", "ProposeDownstreamHandler", 0),
+        ("ReleaseEvent", "ReleaseCoprBuildHandler", 1),
+    }
+    # the event is sent as its data, not as the original message
+    for _, kwargs in sent_tasks:
+        assert loads(dumps(kwargs["event"])) == kwargs["event"]
+        assert kwargs["event"]["tag_name"] == "1.2.3"
+
+
+def test_process_handler(release_event_with_two_jobs):
+    config = ServiceConfig(fan_out_handlers=True)
+    config.command_handler_work_dir = SANDCASTLE_WORK_DIR
+    flexmock(ServiceConfig).should_receive("get_service_config").and_return(config)
+    flexmock(PackitAPI).should_receive("sync_release").never()
+    flexmock(CoprBuildJobHelper).should_receive("run_copr_build").and_return(
+        HandlerResults(success=True, details={})
+    ).once()
+    flexmock(Celery).should_receive("send_task").never()
+
+    event = Parser.parse_event(release_event_with_two_jobs).to_dict()
+    flexmock(Parser).should_receive("parse_event").never()
+
+    results = SteveJobs().process_handler(
+        event=event,
+        event_type="ReleaseEvent",
+        handler_name="ReleaseCoprBuildHandler",
+        job_config_index=1,
+    )
+    assert "copr_build" in next(iter(results["jobs"]))
+    assert first_dict_value(results["jobs"])["success"]
+
+
+def test_process_handler_event_not_restored(release_event_with_two_jobs):
+    event = Parser.parse_event(release_event_with_two_jobs).to_dict()
+    flexmock(ReleaseEvent).should_receive("get_package_config").and_raise(
+        ConnectionError("GitHub is down")
+    )
+    flexmock(CoprBuildJobHelper).should_receive("run_copr_build").never()
+
+    # the handler did not start, the task is retried
+    with pytest.raises(EventRestoreError):
+        SteveJobs().process_handler(
+            event=event,
+            event_type="ReleaseEvent",
+            handler_name="ReleaseCoprBuildHandler",
+            job_config_index=1,
+        )
+
+
+def test_process_handler_failure_not_retried(release_event_with_two_jobs):
+    config = ServiceConfig(fan_out_handlers=True)
+    config.command_handler_work_dir = SANDCASTLE_WORK_DIR
+    flexmock(ServiceConfig).should_receive("get_service_config").and_return(config)
+    # e.g. reporting the status after the build was submitted
+    flexmock(CoprBuildJobHelper).should_receive("run_copr_build").and_raise(
+        ConnectionError("GitHub is down")
+    ).once()
+    event = Parser.parse_event(release_event_with_two_jobs).to_dict()
+
+    with pytest.raises(ConnectionError):
+        SteveJobs().process_handler(
+            event=event,
+            event_type="ReleaseEvent",
+            handler_name="ReleaseCoprBuildHandler",
+            job_config_index=1,
+        )
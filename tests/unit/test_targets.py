@@ -0,0 +1,104 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import pytest
+from flexmock import flexmock
+from packit.config import aliases
+
+from packit_service.worker.build import targets
+from packit_service.worker.build.targets import (
+    KojiTargetsCache,
+    get_build_targets,
+    get_koji_targets,
+)
+
+
+class FakeKoji:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def list_targets(self):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_koji_targets_fetched_once():
+    koji = FakeKoji(["rawhide", "f32"])
+    cache = KojiTargetsCache(fetch=koji.list_targets)
+
+    assert cache.get() == ["rawhide", "f32"]
+    assert cache.get() == ["rawhide", "f32"]
+    assert koji.calls == 1
+
+
+def test_koji_targets_first_fetch_fails():
+    cache = KojiTargetsCache(fetch=FakeKoji(RuntimeError("koji is down")).list_targets)
+
+    with pytest.raises(RuntimeError):
+        cache.get()
+
+
+def test_koji_targets_refreshed_in_background():
+    koji = FakeKoji(["rawhide"], ["rawhide", "f33"])
+    cache = KojiTargetsCache(refresh_interval=0, fetch=koji.list_targets)
+
+    assert cache.get() == ["rawhide"]
+    # stale, the old list is returned while the new one is being fetched
+    assert cache.get() == ["rawhide"]
+    cache._refresh_thread.join()
+    assert koji.calls == 2
+    assert cache._targets == ["rawhide", "f33"]
+
+
+def test_koji_targets_refresh_fails():
+    koji = FakeKoji(["rawhide"], RuntimeError("koji is down"))
+    cache = KojiTargetsCache(refresh_interval=0, fetch=koji.list_targets)
+
+    cache.get()
+    cache.get()
+    cache._refresh_thread.join()
+    assert cache._targets == ["rawhide"]
+
+
+def test_alias_expansion_memoized():
+    targets._get_build_targets.cache_clear()
+    targets._get_koji_targets.cache_clear()
+    flexmock(aliases).should_receive("get_build_targets").with_args(
+        "fedora-31", "fedora-rawhide", default=None
+    ).and_return({"fedora-31-x86_64", "fedora-rawhide-x86_64"}).once()
+    flexmock(aliases).should_receive("get_koji_targets").with_args(
+        "fedora-stable", default="fedora-stable"
+    ).and_return({"f31", "f32"}).once()
+
+    for names in (("fedora-31", "fedora-rawhide"), ("fedora-rawhide", "fedora-31")):
+        assert get_build_targets(*names, default=None) == {
+            "fedora-31-x86_64",
+            "fedora-rawhide-x86_64",
+        }
+    assert get_koji_targets("fedora-stable") == {"f31", "f32"}
+    # callers get their own copy
+    get_koji_targets("fedora-stable").add("f33")
+    assert get_koji_targets("fedora-stable") == {"f31", "f32"}
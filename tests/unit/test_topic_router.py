@@ -0,0 +1,97 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import pytest
+
+from packit_service.worker.jobs import TOPIC_ROUTER
+from packit_service.worker.topic_router import TopicRouter
+
+
+@pytest.fixture()
+def router():
+    return TopicRouter(
+        fedmsg_topics=["org.fedoraproject.prod.copr.build.end"],
+        centos_topics=["pull-request.new"],
+    )
+
+
+@pytest.mark.parametrize(
+    "topic,source,interesting",
+    [
+        pytest.param(None, None, True, id="webhook"),
+        pytest.param(
+            "org.fedoraproject.prod.copr.build.end", None, True, id="fedmsg-handled"
+        ),
+        pytest.param(
+            "org.fedoraproject.prod.bodhi.update.comment",
+            None,
+            False,
+            id="fedmsg-not-handled",
+        ),
+        pytest.param(
+            "git.stg.centos.org/pull-request.new",
+            "centosmsg",
+            True,
+            id="centos-handled",
+        ),
+        pytest.param(
+            "git.stg.centos.org/pull-request.closed",
+            "centosmsg",
+            False,
+            id="centos-not-handled",
+        ),
+        pytest.param(
+            "pull-request.new", None, False, id="centos-topic-from-other-source"
+        ),
+    ],
+)
+def test_is_interesting(router, topic, source, interesting):
+    assert router.is_interesting(topic=topic, source=source) == interesting
+    assert not router.processed
+
+
+def test_accepts_counts(router):
+    assert router.accepts("org.fedoraproject.prod.copr.build.end")
+    assert router.accepts("org.fedoraproject.prod.copr.build.end")
+    assert not router.accepts("org.fedoraproject.prod.buildsys.tag")
+    assert router.accepts(None)
+
+    assert router.processed == 3
+    assert router.get_counters() == {
+        "accepted": {"org.fedoraproject.prod.copr.build.end": 2},
+        "dropped": {"org.fedoraproject.prod.buildsys.tag": 1},
+    }
+
+
+def test_service_router():
+    for topic in (
+        "org.fedoraproject.prod.git.receive",
+        "org.fedoraproject.prod.copr.build.end",
+        "org.fedoraproject.prod.copr.build.start",
+    ):
+        assert TOPIC_ROUTER.is_interesting(topic)
+    assert TOPIC_ROUTER.is_interesting(
+        "git.centos.org/pull-request.tag.added", source="centosmsg"
+    )
+    assert not TOPIC_ROUTER.is_interesting(
+        "org.fedoraproject.prod.bodhi.update.request"
+    )
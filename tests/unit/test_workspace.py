@@ -0,0 +1,109 @@
+# MIT License
+#
+# Copyright (c) 2018-2019 Red Hat, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+
+import pytest
+from flexmock import flexmock
+
+from packit_service.worker import workspace
+from packit_service.worker.workspace import (
+    TRASH_DIR_NAME,
+    create_workspace,
+    remove_stale_workspaces,
+    remove_workspace,
+    wait_for_removals,
+)
+
+
+@pytest.fixture()
+def in_k8s(monkeypatch):
+    monkeypatch.setenv("KUBERNETES_SERVICE_HOST", "YEAH")
+    monkeypatch.setattr(workspace, "_stale_workspaces_removed", False)
+
+
+def test_create_and_remove_workspace(tmp_path):
+    first = create_workspace(tmp_path, prefix="handler")
+    second = create_workspace(tmp_path, prefix="handler")
+    assert first != second
+    assert first.parent == tmp_path
+    assert first.name.startswith("handler-")
+    (first / "repo").mkdir()
+    (first / "repo" / "file").write_text("content")
+
+    remove_workspace(first)
+    # moved away immediately
+    assert not first.exists()
+    wait_for_removals()
+
+    assert sorted(item.name for item in tmp_path.iterdir()) == sorted(
+        [TRASH_DIR_NAME, second.name]
+    )
+    assert not list((tmp_path / TRASH_DIR_NAME).iterdir())
+
+
+def test_remove_workspace_fallback(tmp_path):
+    path = create_workspace(tmp_path, prefix="handler")
+    flexmock(type(path)).should_receive("rename").and_raise(OSError("EXDEV"))
+
+    remove_workspace(path)
+
+    assert not path.exists()
+
+
+def test_remove_stale_workspaces(tmp_path, in_k8s):
+    stale = create_workspace(tmp_path, prefix="handler")
+    os.utime(stale, (0, 0))
+    stale_file = tmp_path / "file"
+    stale_file.write_text("content")
+    os.utime(stale_file, (0, 0))
+    running = create_workspace(tmp_path, prefix="handler")
+    trashed = tmp_path / TRASH_DIR_NAME / "leftover"
+    trashed.mkdir(parents=True)
+
+    remove_stale_workspaces(tmp_path)
+    wait_for_removals()
+
+    assert sorted(item.name for item in tmp_path.iterdir()) == sorted(
+        [TRASH_DIR_NAME, running.name]
+    )
+    assert not list((tmp_path / TRASH_DIR_NAME).iterdir())
+
+
+def test_remove_stale_workspaces_once(tmp_path, in_k8s):
+    remove_stale_workspaces(tmp_path)
+    stale = create_workspace(tmp_path, prefix="handler")
+    os.utime(stale, (0, 0))
+
+    remove_stale_workspaces(tmp_path)
+
+    assert stale.exists()
+
+
+def test_remove_stale_workspaces_not_in_k8s(tmp_path, monkeypatch):
+    monkeypatch.delenv("KUBERNETES_SERVICE_HOST", raising=False)
+    monkeypatch.setattr(workspace, "_stale_workspaces_removed", False)
+    stale = create_workspace(tmp_path, prefix="handler")
+    os.utime(stale, (0, 0))
+
+    remove_stale_workspaces(tmp_path)
+
+    assert stale.exists()
@@ -132,6 +132,27 @@ def test_copr_build_set_status(clean_before_and_after, a_copr_build_for_pr):
     assert b.status == "awesome"
 
 
+def test_copr_build_set_chroots_finished(clean_before_and_after, multiple_copr_builds):
+    end_time = datetime(2020, 5, 20, 18, 40)
+    builds = CoprBuildModel.set_chroots_finished(
+        SampleValues.build_id,
+        {
+            SampleValues.target: ("failure", end_time),
+            SampleValues.different_target: ("success", end_time),
+        },
+    )
+
+    # the first one was already finished
+    assert list(builds) == [SampleValues.different_target]
+    b = CoprBuildModel.get_by_build_id(
+        SampleValues.build_id, SampleValues.different_target
+    )
+    assert b.status == "success"
+    assert b.build_finished_time == end_time
+    b = CoprBuildModel.get_by_build_id(SampleValues.build_id, SampleValues.target)
+    assert b.status == "success"
+
+
 def test_copr_build_set_build_logs_url(clean_before_and_after, a_copr_build_for_pr):
     url = "https://copr.fp.o/logs/12456/build.log"
     a_copr_build_for_pr.set_build_logs_url(url)
@@ -284,6 +305,33 @@ def test_get_by_build_id(clean_before_and_after, multiple_copr_builds):
     assert build_c.project_name == "different-project-name"
 
 
+def test_create_copr_builds_for_targets(
+    clean_before_and_after, a_copr_build_for_pr, srpm_build_model, pr_model
+):
+    builds = CoprBuildModel.create_for_targets(
+        build_id=SampleValues.build_id,
+        targets=SampleValues.chroots,
+        commit_sha=SampleValues.commit_sha,
+        project_name=SampleValues.project,
+        owner=SampleValues.owner,
+        web_url=SampleValues.copr_web_url,
+        status=SampleValues.status_pending,
+        srpm_build=srpm_build_model,
+        trigger_model=pr_model,
+    )
+    assert set(builds.keys()) == set(SampleValues.chroots)
+    # the existing entry is reused
+    assert builds[SampleValues.target].id == a_copr_build_for_pr.id
+
+    new_build = builds[SampleValues.different_target]
+    assert new_build.id
+    assert new_build.owner == SampleValues.owner
+    assert new_build.srpm_build.logs == SampleValues.srpm_logs
+    assert new_build.job_trigger.get_trigger_object() == pr_model
+    assert new_build.build_submitted_time
+    assert len(list(CoprBuildModel.get_all_by_build_id(SampleValues.build_id))) == 2
+
+
 def test_multiple_pr_models(clean_before_and_after):
     pr1 = PullRequestModel.get_or_create(
         pr_id=1,